@@ -61,9 +61,19 @@ from .crud import saves_relations, ABSENT
 # Reusable query objects (so that you don't have to initialize them over and over again)
 from mongosql.util import Reusable
 # selectinquery() relationship loader that supports custom queries
-from mongosql.util import selectinquery
+from mongosql.util import selectinquery, get_related_total
+from mongosql.util import recursivequery
+from mongosql.util import aggregatequery
+# rawjsonload() column loader that passes JSON columns through as text
+from mongosql.util import rawjsonload, RawJSON
+# selectinload_col() column loader that loads heavy columns with a separate query
+from mongosql.util import selectinload_col
+# partialload() column loader for JSON sub-paths and array slices
+from mongosql.util import partialload
 # `Query` object wrapper that is able to query and count() at the same time
-from mongosql.util import CountingQuery
+from mongosql.util import CountingQuery, ConcurrentCountingQuery
+# Count cache for CountingQuery, shared across pages
+from mongosql.util import CountCache
 # Settings objects for MongoQuery and StrictCrudHelper
 from mongosql.util import MongoQuerySettingsDict, StrictCrudHelperSettingsDict
 
@@ -3,6 +3,7 @@ from itertools import chain, repeat
 from copy import copy
 
 from sqlalchemy import inspect, TypeDecorator
+from sqlalchemy import Text, LargeBinary, JSON
 from sqlalchemy import Column
 from sqlalchemy.dialects import postgresql as pg
 from sqlalchemy.ext.associationproxy import AssociationProxy
@@ -348,6 +349,9 @@ class ColumnsBag(_ColumnLikeAttrsBagBase):
         self._json_column_names =  frozenset(name
                                              for name, col in self._columns.items()
                                              if _is_column_json(col))
+        self._heavy_column_names = frozenset(name
+                                             for name, col in self._columns.items()
+                                             if _is_column_heavy(col))
 
     def aliased(self, aliased_class: AliasedClass):
         return DictOfAliasedColumns.aliased_attrs(
@@ -364,6 +368,11 @@ class ColumnsBag(_ColumnLikeAttrsBagBase):
         column_name = get_plain_column_name(name)
         return column_name in self._json_column_names
 
+    @property
+    def heavy_names(self) -> FrozenSet[str]:
+        """ Names of columns whose types are likely to hold a lot of data: TEXT, BYTEA, JSON """
+        return self._heavy_column_names
+
 
 class HybridPropertiesBag(ColumnsBag):
     """ Contains hybrid properties of a model """
@@ -817,6 +826,11 @@ def _is_column_json(col: MapperProperty) -> bool:
     return isinstance(_get_column_type(col), (pg.JSON, pg.JSONB))
 
 
+def _is_column_heavy(col: MapperProperty) -> bool:
+    """ Is the column of a type that may hold a lot of data? """
+    return isinstance(_get_column_type(col), (Text, LargeBinary, JSON))
+
+
 def _is_relationship_array(rel: RelationshipProperty) -> bool:
     """ Is the relationship an array relationship? """
     return rel.property.uselist
@@ -1,15 +1,16 @@
 from enum import Enum
 from functools import reduce
 
+from mongosql import exc
 from ..util.method_decorator import method_decorator
-from ..util import load_many_instance_dicts, EntityDictWrapper
+from ..util import load_many_instance_dicts, EntityDictWrapper, CountingQuery
 from ..util import model_primary_key_columns_and_names, entity_dict_has_primary_key
 
 from ..query import MongoQuery
 from ..util.history_proxy import ModelHistoryProxy
 from .crudhelper import CrudHelper, StrictCrudHelper
 
-from typing import Iterable, Mapping, Set, Union, Tuple, Callable, List
+from typing import Iterable, Iterator, Mapping, Set, Union, Tuple, Callable, List
 from sqlalchemy.orm import Query, Session, object_session
 
 
@@ -52,6 +53,11 @@ class CrudViewMixin:
     #: Remember that every time you use ensure_loaded() on a relationship, you disable filtering for it!
     ensure_loaded = ()
 
+    #: Give _method_list_result__groups() read-only CompactRow mappings instead of dicts: no dict for every row.
+    #: CompactRow has `__json__()`, but plain JSON encoders can't serialize it: use one that supports `__json__()`
+    #: (e.g. flask_jsontools.DynamicJSONEncoder), or convert rows with dict(row)
+    compact_group_rows = False
+
     def __init__(self):
         #: The MongoQuery for this request, if it was indeed initialized by _mquery()
         self.__mongoquery = None  # type: MongoQuery
@@ -142,15 +148,18 @@ class CrudViewMixin:
 
             NOTE: Be careful! This methods does not always return a list of entities!
             It can actually return:
-            1. A scalar value: in case of a 'count' query
+            1. A scalar value: in case of a 'count' or an 'exists' query
+               (or a dict of counts, in case of a 'facets' query)
             2. A list of dicts: in case of an 'aggregate' or a 'group' query
             3. A list or entities: otherwise
 
             Please use the following MongoQuery methods to tell what's going on:
-            MongoQuery.result_contains_entities(), MongoQuery.result_is_scalar(), MongoQuery.result_is_tuples()
+            MongoQuery.result_contains_entities(), MongoQuery.result_is_scalar(), MongoQuery.result_is_tuples(),
+            MongoQuery.result_is_facets()
 
             Or, else, override the following sub-methods:
-            _method_list_result__entities(), _method_list_result__groups(), _method_list_result__count()
+            _method_list_result__entities(), _method_list_result__groups(), _method_list_result__count(),
+            _method_list_result__exists(), _method_list_result__facets()
 
             :param query_obj: Query Object
             :param filter: Additional filter() criteria
@@ -167,12 +176,25 @@ class CrudViewMixin:
 
     def _method_list_result_handler(self, query: Query) -> Union[int, Iterable[object], Iterable[Tuple]]:
         """ Handle the results from method_list() """
+        # Handle: Query Object has exists
+        if not self._mongoquery.handler_exists.is_input_empty():
+            return self._method_list_result__exists(query.scalar())
+
+        # Handle: Query Object has facets
+        if self._mongoquery.result_is_facets():
+            return self._method_list_result__facets(self._mongoquery.collect_facets(query))
+
         # Handle: Query Object has count
         if self._mongoquery.result_is_scalar():
-            return self._method_list_result__count(query.scalar())
+            return self._method_list_result__count(self._mongoquery.collect_count(query))
 
         # Handle: Query Object has group_by and yields tuples
         if self._mongoquery.result_is_tuples():
+            # Read-only mappings that share one key schema: no dict for every row
+            if self.compact_group_rows:
+                return self._method_list_result__groups(
+                    self._mongoquery.compact_rows(query))  # return a generator
+
             # zip() column names together with the values,
             # and make it into a dict
             return self._method_list_result__groups(
@@ -186,14 +208,78 @@ class CrudViewMixin:
         """ Handle _method_list() result when it's a list of entities """
         return list(entities)  # because it may be an iterable
 
-    def _method_list_result__groups(self, dicts: Iterable[dict]) -> Iterable[dict]:
-        """ Handle _method_list() result when it's a list of dicts: the one you get from GROUP BY """
+    def _method_list_result__groups(self, dicts: Iterable[Mapping]) -> Iterable[Mapping]:
+        """ Handle _method_list() result when it's a list of dicts: the one you get from GROUP BY
+
+            With `compact_group_rows`, these are read-only CompactRow mappings; use dict(row) if you need to modify one.
+        """
         return dicts
 
     def _method_list_result__count(self, n: int) -> int:
         """ Handle _method_list() result when it's an integer number: the one you get from COUNT() """
         return n
 
+    def _method_list_result__exists(self, exists: bool) -> bool:
+        """ Handle _method_list() result when it's a boolean: the one you get from EXISTS() """
+        return exists
+
+    def _method_list_result__facets(self, facets: Mapping[str, Union[int, list]]) -> Mapping[str, Union[int, list]]:
+        """ Handle _method_list() result when it's a dict of facet counts: {name: count | [{value, count}, ...]} """
+        return facets
+
+    def _method_list_stream_json(self, key: str, *filter, with_count: bool = False, **filter_by) -> Iterator[bytes]:
+        """ (CRUD method) Fetch a list of entities and stream them as JSON: as in LIST, but for big results
+
+            Unlike _method_list(), results are never loaded as a whole: rows are plucked with the MongoQuery
+            projection and encoded as they come, and the response is an iterator of JSON bytes chunks:
+
+                return flask.Response(self._method_list_stream_json('users'), mimetype='application/json')
+
+            NOTE: the _method_list_result__*() hooks are not used here: rows go straight to the JSON encoder.
+
+            :param key: The key to put the list of results into
+            :param filter: Additional filter() criteria
+            :param with_count: Include the total count into the output: {"count": N, "<key>": [...]}
+            :param filter_by: Additional filter_by() criteria
+            :raises exc.InvalidQueryError: Query Object errors made by the user
+        """
+        self._current_crud_method = CRUD_METHOD.LIST
+
+        # Query
+        query = self._mquery(self._get_query_object(), *filter, **filter_by)
+
+        # Count
+        if with_count and not self._mongoquery.result_is_scalar() and not self._mongoquery.result_is_facets():
+            query = CountingQuery(query)
+
+        # Done
+        return self._mongoquery.stream_json(key, query)
+
+    def _method_list_columnar(self, *filter, **filter_by) -> Mapping[str, list]:
+        """ (CRUD method) Fetch a list of groups as columns: as in LIST, but for charts
+
+            This only works with 'aggregate' and 'group' queries: every key gets a list of values.
+
+                GET /articles/
+                {'aggregate': {'uid': 'uid', 'n': {'$sum': 1}}, 'group': ['uid']}
+                #-> {'uid': [1, 2, 3], 'n': [3, 2, 1]}
+
+            :param filter: Additional filter() criteria
+            :param filter_by: Additional filter_by() criteria
+            :raises exc.InvalidQueryError: Query Object errors made by the user, or the query has no 'aggregate'
+        """
+        self._current_crud_method = CRUD_METHOD.LIST
+
+        # Query
+        query = self._mquery(self._get_query_object(), *filter, **filter_by)
+
+        # Only tuples can be made into columns
+        if not self._mongoquery.get_tuple_keys():
+            raise exc.InvalidQueryError('Columnar results are only available for the `aggregate` operation')
+
+        # Done
+        return self._mongoquery.columnar(query)
+
     def _method_create(self, entity_dict: dict) -> object:
         """ (CRUD method) Create a new entity: as in CREATE
 
@@ -28,8 +28,12 @@ It is an object with the following properties:
 * `joinf`: [Filtering Join Operation](#filtering-join-operation) loads related models with filtering
 * `aggregate`: [Aggregate Operation](#aggregate-operation) lets you calculate statistics
 * `group`: [Group Operation](#group-operation) determines how to group rows while doing aggregation
+* `having`: [Having Operation](#having-operation) filters the results of aggregation
 * `skip`, `limit`: [Rows slicing](#slice-operation): paginates the results
 * `count`: [Counting rows](#count-operation) counts the number of rows without producing results
+* `exists`: [Existence](#exists-operation) tells whether there are any rows at all
+* `facets`: [Facets](#facets-operation) counts rows by several criteria at once
+* `sample`: [Sample](#sample-operation) only looks at a random part of the table
 
 An example Query Object is:
 
@@ -66,10 +70,16 @@ from .joinf import MongoFilteringJoin
 from .filter import MongoFilter, \
     FilterExpressionBase, FilterBooleanExpression, FilterColumnExpression, FilterRelatedColumnExpression
 from .aggregate import MongoAggregate, \
-    AggregateExpressionBase, AggregateLabelledColumn, AggregateColumnOperator, AggregateBooleanCount
+    AggregateExpressionBase, AggregateLabelledColumn, AggregateColumnOperator, AggregatePercentile, AggregateBooleanCount, \
+    AggregateBucket
+from .bucket import BucketExpressionBase, DateTruncExpression, WidthBucketExpression
 from .aggregate import MongoAggregateInsecure
+from .having import MongoHaving
 from .limit import MongoLimit
 from .count import MongoCount
+from .exists import MongoExists
+from .facets import MongoFacets
+from .sample import MongoSample
 
 # TODO: implement update operations on a model in MongoDB-style
 # TODO: document MongoHandler classes
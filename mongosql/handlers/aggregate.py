@@ -52,10 +52,20 @@ The *expression* can be:
     * `{ $max: operand }` - largest value
     * `{ $avg: operand }` - average value
     * `{ $sum: operand }` - sum of values
+    * `{ $stddev: operand }` - standard deviation (sample)
+    * `{ $countDistinct: operand }` - the number of distinct values
+    * `{ $approxCountDistinct: operand }` - the approximate number of distinct values.
+        Uses HyperLogLog when the `hll` PostgreSQL extension is installed and the `aggregate_hll` setting is on;
+        otherwise, it's the same as `$countDistinct`. Combine it with [`sample`](#sample-operation) to make it cheap.
+    * `{ $median: operand }` - the median value: `percentile_cont(0.5)`
+    * `{ $percentile: [operand, fraction] }` - the value below which `fraction` of values fall:
+        `percentile_cont(fraction)`, interpolated. Use `[operand, fraction, 'disc']` for `percentile_disc()`,
+        which gives an actual value.
 
     The *operand* can be:
 
-    * Column name: to apply the aggregation function to a column
+    * Column name: to apply the aggregation function to a column.
+        This is the only operand that statistical operators (`$stddev` and below) accept.
 
         Example:
 
@@ -92,6 +102,25 @@ The *expression* can be:
         }
         ```
 
+* Bucketing expressions: see [bucketing expressions](mongosql/handlers/bucket.py)
+
+    * `{ $dateTrunc: [column, unit] }` - the date, truncated to the `unit`: e.g. 'day'
+    * `{ $dateTrunc: [column, unit, timezone] }` - the same, in a time zone
+    * `{ $bucket: [column, low, high, count] }` - the number of the bucket the value falls into
+
+    Example:
+
+    ```javascript
+    // The number of users in every 10-year age range
+    aggregate: {
+        ages: { $bucket: ['age', 0, 100, 10] },
+        n: { $sum: 1 },
+    },
+    group: [ { $bucket: ['age', 0, 100, 10] } ],
+    ```
+
+    Just like column names, they can only be used with columns that have aggregation enabled.
+
 Note that aggregation often makes sense only when used together with the [Group Operation](#group-operation).
 """
 
@@ -99,10 +128,11 @@ from copy import copy
 
 from sqlalchemy import Integer, Float
 
-from sqlalchemy.sql.expression import cast
+from sqlalchemy.sql.expression import cast, distinct
 from sqlalchemy.sql.functions import func
 
 from .base import MongoQueryHandlerBase
+from .bucket import is_bucket_expression, parse_bucket_expression
 from ..bag import CombinedBag, FakeBag
 from ..exc import InvalidQueryError, DisabledError, InvalidColumnError
 
@@ -168,9 +198,12 @@ class AggregateColumnOperator(AggregateExpressionBase):
     def __repr__(self):
         return '{} {}'.format(self.operator, self.column_name)
 
+    #: Operators that do not need numbers
+    NON_NUMERIC_OPERATORS = frozenset(('$countDistinct', '$approxCountDistinct'))
+
     def compile(self):
         # Json column?
-        if self.is_column_json:
+        if self.is_column_json and self.operator not in self.NON_NUMERIC_OPERATORS:
             # PostgreSQL always returns text values from it, and for aggregation we usually need numbers :)
             column = cast(self.column, Float)
         else:
@@ -186,11 +219,47 @@ class AggregateColumnOperator(AggregateExpressionBase):
             stmt = func.avg(column)
         elif self.operator == '$sum':
             stmt = func.sum(column)
+        elif self.operator == '$stddev':
+            stmt = func.stddev_samp(column)
+        elif self.operator == '$countDistinct':
+            stmt = func.count(distinct(column))
+        elif self.operator == '$approxCountDistinct':
+            # HyperLogLog: see https://github.com/citusdata/postgresql-hll
+            stmt = cast(func.hll_cardinality(func.hll_add_agg(func.hll_hash_any(column))), Integer)
         else:
             raise InvalidQueryError('Aggregate: unsupported operator "{}"'.format(self.operator))
         return self.labeled_expression(stmt)
 
 
+class AggregatePercentile(AggregateColumnOperator):
+    """ Represents a percentile of a column
+
+        The following cases are handled here:
+        { median_age: { $median: 'age' }}
+        { p90_age: { $percentile: ['age', 0.9] }}
+        { p90_age: { $percentile: ['age', 0.9, 'disc'] }}
+        operator=$percentile, column_name='age', column=User.age, fraction=0.9, discrete=True, label='p90_age'
+    """
+
+    __slots__ = ('fraction', 'discrete',)
+
+    def __init__(self, label, operator, column_name, column, is_column_json, fraction, discrete=False):
+        super(AggregatePercentile, self).__init__(label, operator, column_name, column, is_column_json)
+        self.fraction = fraction
+        self.discrete = discrete
+
+    def __repr__(self):
+        return '{} {} {}'.format(self.operator, self.fraction, self.column_name)
+
+    def compile(self):
+        # Discrete values can be of any type; interpolated ones have to be numbers
+        column = cast(self.column, Float) if self.is_column_json and not self.discrete else self.column
+
+        # percentile_cont(0.9) WITHIN GROUP (ORDER BY column)
+        percentile = func.percentile_disc if self.discrete else func.percentile_cont
+        return self.labeled_expression(percentile(self.fraction).within_group(column))
+
+
 class AggregateBooleanCount(AggregateExpressionBase):
     """ Represents an aggregation over a boolean expression: count the number of positives
 
@@ -231,6 +300,30 @@ class AggregateBooleanCount(AggregateExpressionBase):
         # Done
         return self.labeled_expression(stmt)
 
+class AggregateBucket(AggregateExpressionBase):
+    """ Represents a bucketing expression
+
+        The following case is handled here:
+        { day: { $dateTrunc: ['ctime', 'day'] }}
+        bucket=DateTruncExpression, label='day'
+    """
+
+    __slots__ = ('bucket',)
+
+    def __init__(self, label, bucket):
+        """ Init a bucketing expression
+
+        :type bucket: mongosql.handlers.bucket.BucketExpressionBase
+        """
+        super(AggregateBucket, self).__init__(label)
+        self.bucket = bucket
+
+    def __repr__(self):
+        return '{!r} -> {}'.format(self.bucket, self.label)
+
+    def compile(self):
+        return self.labeled_expression(self.bucket.compile())
+
 # endregion
 
 
@@ -257,6 +350,9 @@ class MongoAggregate(MongoQueryHandlerBase):
             * { $avg: operand } - AVG
             * { $sum: operand } - SUM. Can also be applied to `1` (to count columns),
                 and to a boolean expression as an object
+            * { $stddev: column }, { $countDistinct: column }, { $approxCountDistinct: column },
+              { $median: column }, { $percentile: [column, fraction, 'cont'|'disc'] } - statistics
+            * { $dateTrunc: [column, unit] }, { $bucket: [column, low, high, count] } - bucketing expressions
 
         An operand can be:
 
@@ -268,7 +364,8 @@ class MongoAggregate(MongoQueryHandlerBase):
 
     query_object_section_name = 'aggregate'
 
-    def __init__(self, model, bags, aggregate_columns=(), aggregate_labels=False, legacy_fields=None):
+    def __init__(self, model, bags, aggregate_columns=(), aggregate_labels=False, aggregate_hll=False,
+                 legacy_fields=None):
         """ Init aggregation
 
         :param model: Model
@@ -276,6 +373,8 @@ class MongoAggregate(MongoQueryHandlerBase):
         :type aggregate_columns: list[str]
         :param aggregate_labels: whether labelling columns is enabled
         :type aggregate_labels: bool
+        :param aggregate_hll: whether the `hll` extension is available for $approxCountDistinct
+        :type aggregate_hll: bool
         """
         # Legacy fields
         self.legacy_fields = frozenset(legacy_fields or ())
@@ -287,6 +386,9 @@ class MongoAggregate(MongoQueryHandlerBase):
         self.aggregate_columns = set(aggregate_columns or ())
         self.aggregate_labels = aggregate_labels
 
+        # Config
+        self.aggregate_hll = aggregate_hll
+
         # On input
         self.agg_spec = None
 
@@ -335,6 +437,9 @@ class MongoAggregate(MongoQueryHandlerBase):
         # Done
         return column
 
+    def _is_column_json(self, column_name):
+        return column_name in self.bags.columns and self.bags.columns.is_column_json(column_name)
+
     def input(self, agg_spec):
         super(MongoAggregate, self).input(agg_spec)
 
@@ -352,7 +457,9 @@ class MongoAggregate(MongoQueryHandlerBase):
     # You can override them, if necessary
     _LABELLED_COLUMN_CLS = AggregateLabelledColumn
     _COLUMN_OPERATOR_CLS = AggregateColumnOperator
+    _PERCENTILE_CLS = AggregatePercentile
     _BOOLEAN_COUNT_CLS = AggregateBooleanCount
+    _BUCKET_CLS = AggregateBucket
 
     def _parse_input(self, input):
         agg_spec = {}
@@ -386,6 +493,12 @@ class MongoAggregate(MongoQueryHandlerBase):
                 raise InvalidQueryError('Aggregate: expression for "{}" can only contain a single aggregation operator'
                                         .format(comp_field_label))
 
+            # Bucketing expression: { $dateTrunc: [column, unit] }
+            if is_bucket_expression(comp_expression):
+                bucket = parse_bucket_expression(comp_expression, self._get_column_securely, self._is_column_json)
+                agg_spec[comp_field_label] = self._BUCKET_CLS(comp_field_label, bucket)
+                continue
+
             # Okay, the dict { $max: expression } has just one value
             agg_operator, expression = comp_expression.copy().popitem()
 
@@ -395,7 +508,13 @@ class MongoAggregate(MongoQueryHandlerBase):
             #  1) 1: special case for $sum
             #  2) string: reference to a column. E.g. min(age)
             #  3) dict: a boolean expression. E.g. { $sum: { age: { $gt: 18 } } } }
-            if isinstance(expression, int) and agg_operator == '$sum':
+            #  4) list: an operator with arguments. E.g. { $percentile: ['age', 0.9] }
+            if agg_operator in self._PERCENTILE_OPERATORS:
+                # 4) percentiles
+                operator_obj = self._parse_percentile(comp_field_label, agg_operator, expression)
+                if operator_obj is None:
+                    continue
+            elif isinstance(expression, int) and agg_operator == '$sum':
                 # 1) special case for { $sum: 1 }
                 operator_obj = self._BOOLEAN_COUNT_CLS(comp_field_label, int(expression))
             elif isinstance(expression, str):
@@ -404,10 +523,13 @@ class MongoAggregate(MongoQueryHandlerBase):
                 if column_name in self.supported_bags.bag('legacy'):
                     continue
                 column = self._get_column_securely(column_name)
-                is_column_json = column_name in self.bags.columns and self.bags.columns.is_column_json(column_name)
+                is_column_json = self._is_column_json(column_name)
+                # No HyperLogLog: count them all
+                if agg_operator == '$approxCountDistinct' and not self.aggregate_hll:
+                    agg_operator = '$countDistinct'
                 operator_obj = self._COLUMN_OPERATOR_CLS(comp_field_label, agg_operator,
                                                          column_name, column, is_column_json)
-            elif isinstance(expression, dict):
+            elif isinstance(expression, dict) and agg_operator not in self._COLUMN_ONLY_OPERATORS:
                 # 3) Boolean expression: use MongoFilter
                 # Use a copy of a handler because we reuse it.
                 bool_expression = copy(self._mongofilter).input(expression)
@@ -420,6 +542,39 @@ class MongoAggregate(MongoQueryHandlerBase):
 
         return agg_spec
 
+    #: Operators that only accept a column name
+    _COLUMN_ONLY_OPERATORS = frozenset(('$stddev', '$countDistinct', '$approxCountDistinct', '$median', '$percentile'))
+
+    #: Operators that make a percentile
+    _PERCENTILE_OPERATORS = frozenset(('$median', '$percentile'))
+
+    def _parse_percentile(self, label, operator, expression):
+        """ Parse { $median: column } or { $percentile: [column, fraction, 'cont'|'disc'] }
+
+            :return: AggregatePercentile, or None for legacy columns
+        """
+        # $median: column
+        if operator == '$median':
+            expression = [expression, 0.5]
+
+        # $percentile: [column, fraction, method]
+        if not isinstance(expression, (list, tuple)) or len(expression) not in (2, 3) \
+                or not isinstance(expression[0], str):
+            raise InvalidQueryError('Aggregate: {} expects a column name, or [column, fraction, "cont"|"disc"]'
+                                    .format(operator))
+        column_name, fraction, *method = expression
+        if not isinstance(fraction, (int, float)) or isinstance(fraction, bool) or not 0 <= fraction <= 1:
+            raise InvalidQueryError('Aggregate: {} fraction must be a number between 0 and 1'.format(operator))
+        if method not in ([], ['cont'], ['disc']):
+            raise InvalidQueryError('Aggregate: {} method must be either "cont" or "disc"'.format(operator))
+
+        # Column
+        if column_name in self.supported_bags.bag('legacy'):
+            return None
+        column = self._get_column_securely(column_name)
+        return self._PERCENTILE_CLS(label, operator, column_name, column, self._is_column_json(column_name),
+                                    fraction, method == ['disc'])
+
     def compile_statements(self):
         """ Create a list of selectable statements from aggregation spec
         :rtype: list[sqlalchemy.sql.elements.ColumnElement]
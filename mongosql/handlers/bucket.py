@@ -0,0 +1,190 @@
+""" Bucketing expressions: put values into buckets, for time series and histograms
+
+These expressions can be used wherever a value is computed from a column:
+
+* in [Aggregate Operation](#aggregate-operation): `aggregate: { day: { $dateTrunc: ['created', 'day'] } }`
+* in [Group Operation](#group-operation): `group: [ { $dateTrunc: ['created', 'day'] } ]`
+* in [Sort Operation](#sort-operation): `sort: [ { $dateTrunc: ['created', 'day'] } ]` (ascending)
+
+Operators:
+
+* `{ $dateTrunc: [column, unit] }`: truncate a date to the unit: `date_trunc(unit, column)`.
+    Units: `microseconds`, `milliseconds`, `second`, `minute`, `hour`, `day`, `week`, `month`, `quarter`, `year`,
+    `decade`, `century`, `millennium`.
+* `{ $dateTrunc: [column, unit, timezone] }`: truncate in a time zone: `date_trunc(unit, column, timezone)`.
+    A day in 'Europe/Moscow' starts at 21:00 UTC. PostgreSQL 12+.
+* `{ $bucket: [column, low, high, count] }`: split the range `low .. high` into `count` equal buckets,
+    and give the number of the bucket the value falls into: `width_bucket(column, low, high, count)`.
+    Values below `low` go to bucket `0`, values at or above `high` go to bucket `count + 1`.
+
+`$dateTrunc` only works with date and timestamp columns, and `$bucket` only works with numeric columns.
+Values taken from JSON columns are cast to the right type.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import Float, DateTime
+from sqlalchemy.sql.expression import cast
+from sqlalchemy.sql.functions import func
+
+from ..exc import InvalidQueryError
+
+
+class BucketExpressionBase:
+    """ An expression that puts the value of a column into a bucket """
+
+    __slots__ = ('expression', 'column_name', 'column', 'arguments', 'is_column_json')
+
+    #: The operator this class implements
+    operator = None
+
+    #: Python types of the columns this operator works with (see validate_column()), and what to call them in errors
+    column_python_types = None
+    column_type_name = None
+
+    def __init__(self, expression, column_name, column, arguments, is_column_json=False):
+        """ Init a bucketing expression
+
+        :param expression: The original expression: { $operator: [column_name, ...] }
+        :param column_name: Name of the column
+        :param column: The column
+        :param arguments: The arguments that follow the column name
+        :param is_column_json: Is the column (or its dot-notation part) taken from a JSON column?
+        """
+        self.expression = expression
+        self.column_name = column_name
+        self.column = column
+        self.arguments = arguments
+        self.is_column_json = is_column_json
+
+    def __repr__(self):
+        return '{}({})'.format(self.operator, self.column_name)
+
+    @classmethod
+    def validate_arguments(cls, args):
+        """ Validate the arguments that follow the column name
+
+        :raises InvalidQueryError
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def validate_column(cls, column_name, column, is_column_json):
+        """ Validate the type of the column: the database would fail with an error of its own
+
+        JSON values are cast to the right type; columns of unknown types are let through.
+
+        :raises InvalidQueryError
+        """
+        if cls.column_python_types is None or is_column_json:
+            return
+
+        try:
+            python_type = column.type.python_type
+        except (AttributeError, NotImplementedError):
+            return
+
+        if not issubclass(python_type, cls.column_python_types):
+            raise InvalidQueryError('{}: column "{}" is not {}'.format(cls.operator, column_name, cls.column_type_name))
+
+    def compile(self):
+        """ Compile this expression into SqlAlchemy """
+        raise NotImplementedError
+
+
+class DateTruncExpression(BucketExpressionBase):
+    """ Truncate a date: { $dateTrunc: [column, unit] } or { $dateTrunc: [column, unit, timezone] } """
+
+    __slots__ = ()
+
+    operator = '$dateTrunc'
+
+    # date_trunc() works with timestamps and intervals. Dates are cast to timestamps; times are not supported.
+    column_python_types = (date, timedelta)  # datetime is a date, too
+    column_type_name = 'a date or a timestamp'
+
+    #: Units that date_trunc() supports
+    UNITS = frozenset(('microseconds', 'milliseconds', 'second', 'minute', 'hour', 'day', 'week',
+                       'month', 'quarter', 'year', 'decade', 'century', 'millennium'))
+
+    @classmethod
+    def validate_arguments(cls, args):
+        if len(args) not in (1, 2):
+            raise InvalidQueryError('$dateTrunc: expects [column, unit] or [column, unit, timezone]')
+        if args[0] not in cls.UNITS:
+            raise InvalidQueryError('$dateTrunc: unsupported unit "{}"'.format(args[0]))
+        if len(args) == 2 and not isinstance(args[1], str):
+            raise InvalidQueryError('$dateTrunc: timezone must be a string')
+
+    def compile(self):
+        # JSON values come as text
+        column = cast(self.column, DateTime) if self.is_column_json else self.column
+
+        # date_trunc(unit, column [, timezone])
+        unit, *timezone = self.arguments
+        return func.date_trunc(unit, column, *timezone)
+
+
+class WidthBucketExpression(BucketExpressionBase):
+    """ Number the bucket a value falls into: { $bucket: [column, low, high, count] } """
+
+    __slots__ = ()
+
+    operator = '$bucket'
+
+    column_python_types = (int, float, Decimal)
+    column_type_name = 'a number'
+
+    @classmethod
+    def validate_arguments(cls, args):
+        if len(args) != 3:
+            raise InvalidQueryError('$bucket: expects [column, low, high, count]')
+        low, high, count = args
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (low, high)) or low == high:
+            raise InvalidQueryError('$bucket: `low` and `high` must be two different numbers')
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            raise InvalidQueryError('$bucket: `count` must be a positive integer')
+
+    def compile(self):
+        # JSON values come as text
+        column = cast(self.column, Float) if self.is_column_json else self.column
+        low, high, count = self.arguments
+        return func.width_bucket(column, low, high, count)
+
+
+#: Bucketing operators: {operator: class}
+BUCKET_OPERATORS = {
+    DateTruncExpression.operator: DateTruncExpression,
+    WidthBucketExpression.operator: WidthBucketExpression,
+}
+
+
+def is_bucket_expression(value) -> bool:
+    """ Is the value a bucketing expression: { $operator: [...] } """
+    return isinstance(value, dict) and len(value) == 1 and next(iter(value)) in BUCKET_OPERATORS
+
+
+def parse_bucket_expression(expression: dict, get_column, is_column_json) -> BucketExpressionBase:
+    """ Parse a bucketing expression
+
+    :param expression: { $operator: [column_name, ...] }
+    :param get_column: A callable that gives a column by name; it's also where the column is validated
+    :param is_column_json: A callable that tells whether a column name refers to a JSON column
+    :raises InvalidQueryError: Invalid syntax, or a column of the wrong type
+    :raises InvalidColumnError: Invalid column (raised by `get_column`)
+    """
+    operator, args = next(iter(expression.items()))
+    cls = BUCKET_OPERATORS[operator]
+
+    # Validate
+    if not isinstance(args, (list, tuple)) or not args or not isinstance(args[0], str):
+        raise InvalidQueryError('{}: argument must be a list that starts with a column name'.format(operator))
+    column_name, *arguments = args
+    cls.validate_arguments(arguments)
+    column = get_column(column_name)
+    column_is_json = is_column_json(column_name)
+    cls.validate_column(column_name, column, column_is_json)
+
+    # Done
+    return cls(expression, column_name, column, arguments, column_is_json)
@@ -14,16 +14,43 @@ $.get('/api/user?query=' + JSON.stringify({
 
 The `1` is the *on* switch. Replace it with `0` to stop counting.
 
+Exact counts over large tables are slow. When a rough number is good enough, ask for an estimate:
+
+```javascript
+$.get('/api/user?query=' + JSON.stringify({
+    count: {approx: true},
+}))
+```
+
+This is the PostgreSQL planner's estimate (see `EXPLAIN`): table statistics, scaled by the selectivity of the filter.
+It never looks at the rows themselves.
+
+When all you need to know is whether there are more than N rows (think: "1,000+"), cap the count:
+
+```javascript
+$.get('/api/user?query=' + JSON.stringify({
+    count: {max: 1000},
+}))
+```
+
+This only counts up to N+1 rows: you get the exact count when it's up to N, and N+1 when there are more.
+
+The `count_max` and `count_approx_threshold` settings enforce these on every count.
+
+NOTE: MongoQuery.end() always gives a Query that counts the rows: exact, or capped.
+The estimate is made by MongoQuery.collect_count(), which the CRUD helpers use.
+
 NOTE: In MongoSQL 2.0, there is a way to get both the list of items, *and* their count *simultaneously*.
 This would have way better performance than two separate queries.
 Please have a look: [CountingQuery](#countingqueryquery) and [MongoQuery.end_count()](#mongoqueryend_count---countingquery).
 """
 
-from sqlalchemy import func
+from sqlalchemy import func, literal_column
 from sqlalchemy import exc as sa_exc
 
 from .base import MongoQueryHandlerBase
 from ..exc import InvalidQueryError, InvalidColumnError, InvalidRelationError
+from ..util.count_estimate import EstimatedCountQuery
 
 
 class MongoCount(MongoQueryHandlerBase):
@@ -31,20 +58,39 @@ class MongoCount(MongoQueryHandlerBase):
 
         Just give it:
         * count=True
+        * count={approx: true}  for the planner's estimate
+        * count={max: N}        for a count capped at N+1
     """
 
     query_object_section_name = 'count'
 
-    def __init__(self, model, bags):
+    def __init__(self, model, bags, count_max=None, count_approx_threshold=None, count_cache=None):
         """ Init a count
 
         :param model: Sqlalchemy model to work with
         :param bags: Model bags
+        :param count_max: The maximum number of rows to count.
+            The user can never go any higher than that, and this value is forced onto every count.
+        :param count_approx_threshold: Give the planner's estimate instead of an exact count
+            when the estimate is at least this large.
+        :param count_cache: A CountCache for MongoQuery.end_count(): to reuse the count across pages
+        :type count_cache: mongosql.util.CountCache
         """
         super(MongoCount, self).__init__(model, bags)
 
+        # Config
+        self.count_max = count_max
+        self.count_approx_threshold = count_approx_threshold
+        self.count_cache = count_cache
+        assert self.count_max is None or self.count_max > 0
+
         # On input
         self.count = None
+        self.approx = False
+        self.max_count = None
+
+        # On alter_query()
+        self._counted_query = None
 
     def input_prepare_query_object(self, query_object):
         # When we count, we don't care about certain things
@@ -66,9 +112,27 @@ class MongoCount(MongoQueryHandlerBase):
 
     def input(self, count=None):
         super(MongoCount, self).input(count)
-        if not isinstance(count, (int, bool, NoneType)):
+
+        # {approx: true, max: N}
+        if isinstance(count, dict):
+            approx = count.get('approx', False)
+            max_count = count.get('max', None)
+            if not set(count) <= {'approx', 'max'}:
+                raise InvalidQueryError('Count: unsupported keys: {}'.format(', '.join(set(count) - {'approx', 'max'})))
+            if not isinstance(approx, bool):
+                raise InvalidQueryError('Count: `approx` must be either true or false')
+            if max_count is not None and (not isinstance(max_count, int) or isinstance(max_count, bool) or max_count <= 0):
+                raise InvalidQueryError('Count: `max` must be a positive integer')
+            self.approx = approx
+            self.max_count = max_count
+            count = True
+        elif not isinstance(count, (int, bool, NoneType)):
             raise InvalidQueryError('Count must be either true or false. Or at least a 1, or a 0')
 
+        # Settings override the input
+        if self.count_max is not None:
+            self.max_count = min(self.max_count or self.count_max, self.count_max)
+
         # Done
         self.count = count
         return self
@@ -83,34 +147,68 @@ class MongoCount(MongoQueryHandlerBase):
     compile_statements = NotImplemented
 
     def alter_query(self, query, as_relation=None):
-        """ Apply offset() and limit() to the query """
+        """ Make it into a COUNT query: exact, or capped """
         if self.count:
-            # Previously, we used to do counts like this:
-            # >>> query = query.with_entities(func.count())
-            # However, when there's no WHERE clause set on a Query, it's left without any reference to the target table.
-            # In this case, SqlAlchemy will actually generate a query without a FROM clause, which gives a wrong count!
-            # Therefore, we have to make sure that there will always be a FROM clause.
-            #
-            # Normally, we just do the following:
-            # >>> query = query.select_from(self.model)
-            # This is supposed to indicate which table to select from.
-            # However, it can only be applied when there's no FROM nor ORDER BY clauses present.
-            #
-            # But wait a second... didn't we just assume that there would be no FROM clause?
-            # Have a look at this ugly duckling:
-            # >>> Query(User).filter_by().select_from(User)
-            # This filter_by() would actually create an EMPTY condition, which will break select_from()'s assertions!
-            # This is reported to SqlAlchemy:
-            # https://github.com/sqlalchemy/sqlalchemy/issues/4606
-            # And (is fixed in version x.x.x | is not going to be fixed)
-            #
-            # Therefore, we'll try to do it the nice way ; and if it fails, we'll have to do something else.
+            # Remember the query that is counted: estimates are made for it. See collect()
+            self._counted_query = query
+            return self._count_query(query)
+
+        return query
+
+    def _count_query(self, query):
+        """ Make a query that counts the rows: exactly, or up to `self.max_count + 1` """
+        # Previously, we used to do counts like this:
+        # >>> query = query.with_entities(func.count())
+        # However, when there's no WHERE clause set on a Query, it's left without any reference to the target table.
+        # In this case, SqlAlchemy will actually generate a query without a FROM clause, which gives a wrong count!
+        # Therefore, we have to make sure that there will always be a FROM clause.
+        #
+        # Normally, we just do the following:
+        # >>> query = query.select_from(self.model)
+        # This is supposed to indicate which table to select from.
+        # However, it can only be applied when there's no FROM nor ORDER BY clauses present.
+        #
+        # But wait a second... didn't we just assume that there would be no FROM clause?
+        # Have a look at this ugly duckling:
+        # >>> Query(User).filter_by().select_from(User)
+        # This filter_by() would actually create an EMPTY condition, which will break select_from()'s assertions!
+        # This is reported to SqlAlchemy:
+        # https://github.com/sqlalchemy/sqlalchemy/issues/4606
+        # And (is fixed in version x.x.x | is not going to be fixed)
+        #
+        # Therefore, we'll try to do it the nice way ; and if it fails, we'll have to do something else.
+
+        # Capped: SELECT count(*) FROM (SELECT 1 FROM ... LIMIT N+1)
+        if self.max_count is not None:
             try:
-                query = query.with_entities(func.count()).select_from(self.model)
+                query = query.with_entities(literal_column('1')).select_from(self.model)
             except sa_exc.InvalidRequestError:
-                query = query.from_self(func.count())
+                pass  # keep the columns
+            return query.limit(self.max_count + 1).from_self(func.count())
 
-        return query
+        # Exact
+        try:
+            return query.with_entities(func.count()).select_from(self.model)
+        except sa_exc.InvalidRequestError:
+            return query.from_self(func.count())
+
+    def collect(self, count_query) -> int:
+        """ Get the count: execute the count query, or give the planner's estimate
+
+            The estimate is used with `count: {approx: true}`, and with the `count_approx_threshold` setting.
+            end() always gives a Query that counts the rows; estimates are only made here.
+            When this handler is not counting (e.g. with `exists`), the query is just executed.
+
+            :param count_query: The query that end() has given. Its Session is used.
+        """
+        if self.count and (self.approx or self.count_approx_threshold is not None):
+            counted_query = self._counted_query.with_session(count_query.session)
+            if self.approx:
+                return EstimatedCountQuery(counted_query, max_count=self.max_count).scalar()
+            else:
+                return EstimatedCountQuery(counted_query, count_query,
+                                           threshold=self.count_approx_threshold, max_count=self.max_count).scalar()
+        return count_query.scalar()
 
 
 NoneType = type(None)
@@ -0,0 +1,101 @@
+"""
+### Exists Operation
+Exists corresponds to the `SELECT EXISTS (SELECT 1 ... LIMIT 1)` SQL query.
+
+Tell whether any rows match the query: `true` or `false`. Nothing else.
+
+Example:
+
+```javascript
+$.get('/api/user?query=' + JSON.stringify({
+    filter: {age: {$gte: 18}},
+    exists: 1,
+}))
+```
+
+Unlike `count`, it does not go through the whole set of matching rows: it stops at the first one.
+Use it when all you need to know is whether there's anything at all: e.g. to enable a button.
+
+The `1` is the *on* switch. Replace it with `0` to turn it off.
+"""
+
+from sqlalchemy.orm import Query
+
+from .base import MongoQueryHandlerBase
+from ..exc import InvalidQueryError
+
+
+class MongoExists(MongoQueryHandlerBase):
+    """ MongoDB exists query
+
+        Just give it:
+        * exists=True
+    """
+
+    query_object_section_name = 'exists'
+
+    def __init__(self, model, bags):
+        """ Init an exists
+
+        :param model: Sqlalchemy model to work with
+        :param bags: Model bags
+        """
+        super(MongoExists, self).__init__(model, bags)
+
+        # On input
+        self.exists = None
+
+    def input_prepare_query_object(self, query_object):
+        # When we test for existence, we don't care about certain things
+        if query_object.get('exists', False):
+            # Sorting, projections, skips & limits: nothing of that matters
+            query_object.pop('sort', None)
+            query_object.pop('project', None)
+            query_object.pop('skip', None)
+            query_object.pop('limit', None)
+            # Remove all join, but not joinf (as it may filter)
+            query_object.pop('join', None)
+            # Can't count and test for existence at the same time
+            if query_object.get('count', False):
+                raise InvalidQueryError('Cannot combine `count` and `exists`')
+
+        return query_object
+
+    def input(self, exists=None):
+        super(MongoExists, self).input(exists)
+        if not isinstance(exists, (int, bool, NoneType)):
+            raise InvalidQueryError('Exists must be either true or false. Or at least a 1, or a 0')
+
+        # Done
+        self.exists = exists
+        return self
+
+    def _get_supported_bags(self):
+        return None  # not used by this class
+
+    # Not Implemented for this Query Object handler
+    compile_columns = NotImplemented
+    compile_options = NotImplemented
+    compile_statement = NotImplemented
+    compile_statements = NotImplemented
+
+    def alter_query(self, query, as_relation=None):
+        """ Make it into an EXISTS query """
+        if self.exists:
+            return self.exists_query(query)
+        return query
+
+    def exists_query(self, query: Query) -> Query:
+        """ Make a query that tells whether the given query has any rows
+
+            SELECT EXISTS (SELECT 1 FROM ... WHERE ... LIMIT 1)
+        """
+        # Stop at the first row.
+        # Query.exists() selects no columns, and no eager loads
+        query = query.limit(1)
+
+        # EXISTS
+        return Query([query.exists()], session=query.session)
+
+
+NoneType = type(None)
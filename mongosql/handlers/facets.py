@@ -0,0 +1,250 @@
+"""
+### Facets Operation
+Facets are the counts that search pages show next to the results: how many items there are per category,
+how many are in stock, how many fall into every price range.
+
+Instead of making one `count` request per facet value, ask for all of them at once:
+
+```javascript
+$.get('/api/article?query=' + JSON.stringify({
+    filter: { published: true },
+    facets: {
+        // Filter facets: the number of rows that match the criteria
+        total: {},
+        cheap: { price: { $lt: 10 } },
+        recent: { date: { $gte: '2019-01-01' } },
+        // Group-key facets: the number of rows per every value of the column
+        by_category: 'category_id',
+    },
+}))
+```
+
+The result is an object with a count for every filter facet, and a list of `{value, count}` for every group-key facet,
+most popular values first:
+
+```javascript
+{
+    total: 127,
+    cheap: 12,
+    recent: 40,
+    by_category: [ {value: 3, count: 100}, {value: 1, count: 27} ],
+}
+```
+
+All facets are counted in a single scan over the filtered rows: filter facets become
+`count(*) FILTER (WHERE ...)`, and group-key facets become `GROUP BY GROUPING SETS (...)`. PostgreSQL only.
+
+Filter facets use the [Filter Operation](#filter-operation) syntax, and follow its settings.
+Group-key facets reveal the values of a column, so, just like aggregation, they have to be enabled on the back-end
+for every column: see the `facets_columns` setting.
+
+`sort`, `project`, `join`, `skip` and `limit` are ignored: they do not affect the counts.
+"""
+
+from copy import copy
+
+from sqlalchemy import func, tuple_
+
+from .base import MongoQueryHandlerBase
+from ..bag import CombinedBag
+from ..exc import InvalidQueryError, DisabledError, InvalidColumnError
+
+
+class MongoFacets(MongoQueryHandlerBase):
+    """ Facet counts: several counts made with one query
+
+        Syntax:
+
+            { facet-name: filter-criteria | column-name }
+
+        * filter criteria: MongoFilter syntax. Counts the rows that match it. `{}` counts all rows.
+        * column name: counts the rows per every value of the column.
+            Only columns listed in `facets_columns` can be used.
+
+        WARNING: group-key facets expose the values of a column!
+    """
+
+    query_object_section_name = 'facets'
+
+    def __init__(self, model, bags, facets_columns=()):
+        """ Init facets
+
+        :param model: Sqlalchemy model to work with
+        :param bags: Model bags
+        :param facets_columns: list of columns that group-key facets can be counted for
+        :type facets_columns: list[str]
+        """
+        super(MongoFacets, self).__init__(model, bags)
+
+        # Security
+        self.facets_columns = set(facets_columns or ())
+
+        # On input
+        #: Filter facets: {name: MongoFilter}
+        self.filter_facets = None
+        #: Group-key facets: {name: column name}
+        self.group_facets = None
+
+        # Validation
+        self.validate_properties(self.facets_columns, where='facets:facets_columns')
+
+        # We expect a mongoquery here
+        self._mongofilter = None
+
+    def with_mongoquery(self, mongoquery):
+        super(MongoFacets, self).with_mongoquery(mongoquery)
+        self._mongofilter = copy(mongoquery.handler_filter)
+        return self
+
+    def _get_supported_bags(self):
+        return CombinedBag(
+            col=self.bags.columns,
+            hybrid=self.bags.hybrid_properties,
+        )
+
+    def input_prepare_query_object(self, query_object):
+        # When we count facets, we don't care about certain things
+        if query_object.get('facets', None):
+            # Sorting, projections, skips & limits: nothing of that matters
+            query_object.pop('sort', None)
+            query_object.pop('project', None)
+            query_object.pop('skip', None)
+            query_object.pop('limit', None)
+            # Remove all join, but not joinf (as it may filter)
+            query_object.pop('join', None)
+            # Facets make their own SELECT
+            for name in ('aggregate', 'group', 'count', 'exists'):
+                if query_object.get(name, None):
+                    raise InvalidQueryError('Cannot combine `facets` and `{}`'.format(name))
+
+        return query_object
+
+    def input(self, facets):
+        super(MongoFacets, self).input(facets)
+
+        # Validate
+        if not facets:
+            facets = {}
+        if not isinstance(facets, dict):
+            raise InvalidQueryError('Facets: argument must be an object')
+
+        # Parse
+        self.filter_facets = {}
+        self.group_facets = {}
+        for name, facet in facets.items():
+            # dict: filter criteria. Use a copy of a handler because we reuse it.
+            if isinstance(facet, dict):
+                self.filter_facets[name] = copy(self._mongofilter).input(facet)
+            # str: column name
+            elif isinstance(facet, str):
+                self._get_column_securely(facet)
+                self.group_facets[name] = facet
+            else:
+                raise InvalidQueryError('Facets: facet "{}" should be either a column name, or an object'
+                                        .format(name))
+        return self
+
+    def _get_column_securely(self, column_name):
+        """ Get a column. Securely. Respect self.facets_columns """
+        try:
+            bag_name, bag, column = self.supported_bags[column_name]
+        except KeyError:
+            raise InvalidColumnError(self.bags.model_name, column_name, 'facets')
+
+        if column_name not in self.facets_columns:
+            raise DisabledError('Facets: facets are disabled for column "{}.{}"'
+                                .format(self.bags.model_name, column_name))
+        return column
+
+    def _get_group_column_names(self):
+        """ Get the names of columns to group by: one grouping set per column """
+        return list(dict.fromkeys(self.group_facets.values()))
+
+    def compile_columns(self):
+        """ Get the columns to select
+
+            1. `grouping(column)` for every group-key column: tells which grouping set a row belongs to
+            2. The group-key columns themselves
+            3. `count(*)` of every grouping set
+            4. `count(*) FILTER (WHERE ...)` for every filter facet
+        """
+        group_columns = [self.supported_bags.get(name) for name in self._get_group_column_names()]
+        return [
+            *(func.grouping(column) for column in group_columns),
+            *group_columns,
+            func.count(),
+            *(func.count().filter(mongofilter.compile_statement()) if mongofilter.expressions else func.count()
+              for mongofilter in self.filter_facets.values()),
+        ]
+
+    def compile_statement(self):
+        """ Get the GROUPING SETS clause, or None if there are no group-key facets
+
+            The empty grouping set `()` is only needed when there are filter facets: it's the row that has their counts.
+        """
+        if not self.group_facets:
+            return None
+
+        grouping_sets = [tuple_(self.supported_bags.get(name)) for name in self._get_group_column_names()]
+        if self.filter_facets:
+            grouping_sets.insert(0, tuple_())
+        return func.grouping_sets(*grouping_sets)
+
+    # Not Implemented for this Query Object handler
+    compile_options = NotImplemented
+    compile_statements = NotImplemented
+
+    def alter_query(self, query, as_relation=None):
+        if self.is_input_empty():
+            return query  # short-circuit
+
+        query = query.with_entities(*self.compile_columns())
+
+        # See MongoAggregate.alter_query(): no model criteria means no FROM clause
+        if query.whereclause is None:
+            query = query.select_from(self.model)
+
+        # Group-key facets
+        grouping_sets = self.compile_statement()
+        if grouping_sets is not None:
+            query = query.group_by(grouping_sets)
+
+        return query
+
+    def collect(self, rows):
+        """ Collect the results of a facets query into {name: count | [{value, count}, ...]}
+
+            :param rows: The rows that the query gives
+            :rtype: dict
+        """
+        group_column_names = self._get_group_column_names()
+        n_groups = len(group_column_names)
+
+        # Collect: {column name: [{value, count}, ...]}, and the filter facets' counts
+        group_counts = {name: [] for name in group_column_names}
+        filter_counts = None
+        for row in rows:
+            groupings = row[:n_groups]
+            values = row[n_groups:n_groups*2]
+            count = row[n_groups*2]
+
+            # The empty grouping set (or no GROUP BY at all): the row with the filter facets' counts
+            if all(groupings):
+                filter_counts = row[n_groups*2 + 1:]
+                continue
+
+            # A group-key value: the grouping set where grouping() is 0
+            for name, grouping, value in zip(group_column_names, groupings, values):
+                if not grouping:
+                    group_counts[name].append({'value': value, 'count': count})
+                    break
+
+        # Most popular values first
+        for counts in group_counts.values():
+            counts.sort(key=lambda c: c['count'], reverse=True)
+
+        # Done
+        return {
+            **dict(zip(self.filter_facets, filter_counts or [0] * len(self.filter_facets))),
+            **{name: group_counts[column_name] for name, column_name in self.group_facets.items()},
+        }
@@ -69,15 +69,71 @@ The Group Operator, as you have seen, receives an array of column names.
     { group: 'a+ b- c' }
     ```
 
+* Bucketing expressions
+
+    In array syntax, an item can also be a [bucketing expression](mongosql/handlers/bucket.py):
+    to group rows by day, week, month, or by numeric ranges.
+
+    Example:
+
+    ```javascript
+    {
+        aggregate: {
+            day: { $dateTrunc: ['ctime', 'day', 'Europe/Moscow'] },
+            n: { $sum: 1 },
+        },
+        group: [ { $dateTrunc: ['ctime', 'day', 'Europe/Moscow'] } ],
+        sort: [ { $dateTrunc: ['ctime', 'day', 'Europe/Moscow'] } ],
+    }
+    ```
+
+#### Subtotals: ROLLUP, CUBE, GROUPING SETS
+Reports often need totals at several levels: per country and city, per country, and the grand total.
+Instead of making one query per level, get all of them in one go:
+
+* `{ rollup: ['country', 'city'] }`: `GROUP BY ROLLUP(country, city)`:
+    groups by (country, city), then (country), then gives the grand total.
+* `{ cube: ['country', 'city'] }`: `GROUP BY CUBE(country, city)`:
+    every combination: (country, city), (country), (city), and the grand total.
+* `{ sets: [['country', 'city'], ['country'], []] }`: `GROUP BY GROUPING SETS(...)`: exactly the levels you list.
+    `[]` is the grand total.
+
+Columns that a row is not grouped by come as `null`. To tell these apart from actual `null` values,
+every row gets one more value: `grouping`. It is a bit mask: one bit per column, the first column being the
+highest bit; the bit is `1` when the row is not grouped by that column (see PostgreSQL `GROUPING()`).
+With `{rollup: ['country', 'city']}`, it's `0` for (country, city) rows, `1` for country subtotals,
+and `3` for the grand total.
+
+Use `{ rollup: [...], grouping: 'level' }` to give it a different name.
+
+Example:
+
+```javascript
+$.get('/api/sale?query=' + JSON.stringify({
+    aggregate: {
+        country: 'country',
+        city: 'city',
+        total: { $sum: 'amount' },
+    },
+    group: { rollup: ['country', 'city'] },
+}))
+```
+
 """
 
+from collections import OrderedDict
+
+from sqlalchemy import func, tuple_
+
 from .sort import MongoSort
+from ..exc import InvalidQueryError
 
 
 class MongoGroup(MongoSort):
     """ MongoDB-style grouping
 
         It has the same syntax as MongoSort, so we just reuse the code.
+        On top of that, it supports subtotals: {rollup: [...]}, {cube: [...]}, {sets: [[...], ...]}
 
         See :cls:MongoSort
     """
@@ -92,31 +148,111 @@ class MongoGroup(MongoSort):
         super(MongoSort, self).__init__(model, bags)  # yes, call the base; not the parent
 
         # On input
-        #: OderedDict() of a group spec: {key: +1|-1}
+        #: OderedDict() of a group spec: {key: +1|-1}. With `grouping`: all the columns involved.
         self.group_spec = None
+        #: Subtotals: None, 'rollup', 'cube', or 'sets'
+        self.grouping = None
+        #: The list of column names for every grouping set (with grouping='sets'), or of the one list to roll up
+        self.grouping_sets = None
+        #: The name of the grouping indicator value
+        self.grouping_label = self.DEFAULT_GROUPING_LABEL
+
+    #: Subtotals that `group` supports: {name: function}
+    GROUPING_FUNCTIONS = {
+        'rollup': func.rollup,
+        'cube': func.cube,
+        'sets': func.grouping_sets,
+    }
+
+    #: The default name of the grouping indicator value
+    DEFAULT_GROUPING_LABEL = 'grouping'
 
     def input(self, group_spec):
         super(MongoSort, self).input(group_spec)  # call base; not the parent
-        self.group_spec = self._input(group_spec)
+
+        # Subtotals: {rollup: [...]}, {cube: [...]}, {sets: [[...], ...]}
+        if isinstance(group_spec, dict) and set(group_spec) & set(self.GROUPING_FUNCTIONS):
+            self.group_spec = self._input_grouping(group_spec)
+        else:
+            self.group_spec = self._input(group_spec)
         return self
 
+    def _input_grouping(self, spec):
+        """ Input subtotals: {rollup|cube|sets: [...], grouping: 'label'} """
+        spec = spec.copy()
+        self.grouping_label = spec.pop('grouping', self.DEFAULT_GROUPING_LABEL)
+        if not isinstance(self.grouping_label, str):
+            raise InvalidQueryError('group: `grouping` must be a string')
+        if len(spec) != 1:
+            raise InvalidQueryError('group: can only have one of {}'.format(', '.join(self.GROUPING_FUNCTIONS)))
+        self.grouping, columns = spec.popitem()
+
+        # Grouping sets: a list of lists.
+        # Rollup and cube: a list; let's just say it's a single set
+        if self.grouping == 'sets':
+            if not isinstance(columns, (list, tuple)):
+                raise InvalidQueryError('group: `sets` must be a list of lists of columns')
+            self.grouping_sets = [list(self._input(grouping_set or [])) for grouping_set in columns]
+        else:
+            self.grouping_sets = [list(self._input(columns))]
+
+        # All the columns involved
+        return OrderedDict((name, +1)
+                           for grouping_set in self.grouping_sets
+                           for name in grouping_set)
+
     def compile_columns(self):
         return [
-            self.supported_bags.get(name).desc() if d == -1 else self.supported_bags.get(name)
+            self._compile_key(name).desc() if d == -1 else self._compile_key(name)
             for name, d in self.group_spec.items()
         ]
 
+    def compile_statement(self):
+        """ Compile subtotals: ROLLUP(...), CUBE(...), or GROUPING SETS(...) """
+        grouping_function = self.GROUPING_FUNCTIONS[self.grouping]
+        if self.grouping == 'sets':
+            return grouping_function(*(tuple_(*(self._compile_key(name) for name in grouping_set))
+                                       for grouping_set in self.grouping_sets))
+        else:
+            return grouping_function(*(self._compile_key(name) for name in self.grouping_sets[0]))
+
+    def compile_grouping_indicator(self):
+        """ Compile the grouping indicator: GROUPING(...), a bit mask of columns that a row is not grouped by """
+        return func.grouping(*(self._compile_key(name) for name in self.group_spec)).label(self.grouping_label)
+
     # Not Implemented for this Query Object handler
     compile_options = NotImplemented
-    compile_statement = NotImplemented
     compile_statements = NotImplemented
 
     def alter_query(self, query, as_relation=None):
         if not self.group_spec:
             return query  # short-circuit
 
+        # Subtotals
+        if self.grouping:
+            return query.group_by(self.compile_statement()) \
+                        .add_columns(self.compile_grouping_indicator())
+
         return query.group_by(*self.compile_columns())
 
     def get_final_input_value(self):
-        return [f'{name}{"-" if d == -1 else ""}'
+        # Subtotals
+        if self.grouping:
+            grouping_sets = [[self._final_key(name) for name in grouping_set]
+                             for grouping_set in self.grouping_sets]
+            ret = {self.grouping: grouping_sets if self.grouping == 'sets' else grouping_sets[0]}
+            if self.grouping_label != self.DEFAULT_GROUPING_LABEL:
+                ret['grouping'] = self.grouping_label
+            return ret
+
+        return [self._final_key(name, d)
                 for name, d in self.group_spec.items()]
+
+    # Extra features
+
+    @property
+    def projection(self):
+        """ Get a projection-like dict of the values that grouping adds to every row: the grouping indicator """
+        if not self.grouping:
+            return {}
+        return {self.grouping_label: 1}
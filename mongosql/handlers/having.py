@@ -0,0 +1,84 @@
+"""
+### Having Operation
+Having corresponds to the `HAVING` part of an SQL query: filtering on the results of the
+[Aggregate Operation](#aggregate-operation).
+
+Use it when you only need some of the groups. For instance, categories with more than 100 products:
+
+```javascript
+$.get('/api/product?query=' + JSON.stringify({
+    aggregate: {
+        category_id: 'category_id',
+        n: { $sum: 1 },
+    },
+    group: ['category_id'],
+    having: {
+        n: { $gt: 100 },
+    },
+}))
+```
+
+The syntax is the same as with the [Filter Operation](#filter-operation), but instead of column names,
+it refers to the labels defined in `aggregate`. Only those labels can be used: `having` gets no access to columns
+that `aggregate` has not exposed, so the aggregation settings (`aggregate_columns`, `aggregate_labels`)
+apply here as well.
+"""
+
+from .filter import MongoFilter
+from ..bag import CombinedBag, ColumnsBag
+from ..exc import InvalidQueryError
+
+
+class MongoHaving(MongoFilter):
+    """ MongoSql HAVING expression: filter the results of aggregation
+
+        Same as MongoFilter, but works with the labels of MongoAggregate:
+
+            { n: { $gt: 100 } }
+
+        Supported: Aggregate labels
+    """
+
+    query_object_section_name = 'having'
+
+    def __init__(self, model, bags, scalar_operators=None, array_operators=None):
+        """ Init a having expression
+
+        :param model: Sqlalchemy model to work with
+        :param bags: Model bags
+        :param scalar_operators: A dict of additional operators for scalar columns to recognize. See MongoFilter
+        :param array_operators: A dict of additional operators for array columns to recognize. See MongoFilter
+        """
+        #: Aggregate labels: {label: expression}
+        self.labels = {}
+
+        # Parent
+        super(MongoHaving, self).__init__(model, bags,
+                                          scalar_operators=scalar_operators,
+                                          array_operators=array_operators)
+
+    def _get_supported_bags(self):
+        return CombinedBag(
+            col=ColumnsBag(self.labels),
+        )
+
+    def input(self, criteria):
+        # Labels: whatever MongoAggregate has defined
+        if criteria:
+            agg_spec = self.mongoquery.handler_aggregate.agg_spec
+            if not agg_spec:
+                raise InvalidQueryError('having: can only be used together with `aggregate`')
+
+            # HAVING can't refer to the labels of the SELECT: use the expressions themselves
+            self.labels = {label: agg_col.compile().element
+                           for label, agg_col in agg_spec.items()}
+            self.supported_bags = self._get_supported_bags()
+
+        return super(MongoHaving, self).input(criteria)
+
+    def alter_query(self, query, as_relation=None):
+        if self.expressions:
+            query = query.having(self.compile_statement())
+
+        # Done
+        return query
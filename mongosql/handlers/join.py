@@ -66,16 +66,80 @@ Examples follow.
     ```
 
     Note that `null` can be used to load a relationship without custom querying.
+
+* Recursive loading.
+
+    Self-referential relationships (trees: categories, comment threads, org charts) can be loaded
+    many levels deep with a single query. Use the `recursive` key in the nested Query Object:
+
+    ```javascript
+    $.get('/api/category?query=' + JSON.stringify({
+        join: {
+            children: {
+                recursive: { maxDepth: 5 },  // load children, their children, ..., 5 levels deep
+                project: ['title'],
+                filter: { hidden: false },  // applied on every level: a hidden category hides its subtree
+            }
+        }
+    }))
+    ```
+
+    Every loaded entity gets its `children` (up to `maxDepth` levels), and the result is a tree.
+    Recursive loading does not support `aggregate`, `group`, `skip`, and `limit`.
+
+* Aggregation.
+
+    Instead of loading related entities, you can compute statistics over them, for every entity:
+    use the [Aggregate Operation](#aggregate-operation) in the nested Query Object:
+
+    ```javascript
+    $.get('/api/user?query=' + JSON.stringify({
+        join: {
+            articles: {
+                filter: { published: true },
+                aggregate: { n: { $sum: 1 }, avg_rating: { $avg: 'rating' } },
+            }
+        }
+    }))
+    ```
+
+    Every user will get `articles: { n: 3, avg_rating: 4.5 }` instead of a list of articles.
+    With the [Group Operation](#group-operation), every user gets a list of groups instead:
+    `articles: [{ theme: 'sci-fi', n: 2 }, { theme: 'romance', n: 1 }]`.
+    `sort`, `skip`, and `limit` apply to the groups of every user separately.
+    Just like everywhere else, `sort` takes column names: sort by the columns you group by (e.g. `sort: ['theme']`).
+    Aggregate labels (like `n`) can't be used for sorting.
+
+    All aggregates are computed in SQL with a single additional query.
+
+* Counting.
+
+    When only a few related entities are loaded, the API user might want to know how many there are in total
+    (think "3 of 127 comments"). Use `count` in the nested Query Object:
+
+    ```javascript
+    $.get('/api/article?query=' + JSON.stringify({
+        join: {
+            comments: { limit: 3, count: true },
+        }
+    }))
+    ```
+
+    Every article will get `comments_count`: the total number of its comments (that match the nested filter).
+    It's computed within the same query that loads comments.
+    Only works for x-to-many relationships.
 """
 
 
 import json
 from types import SimpleNamespace
 
-from sqlalchemy import exc as sa_exc
+from sqlalchemy import exc as sa_exc, tuple_
 from sqlalchemy.orm import aliased, Query
+from sqlalchemy.orm.base import instance_state
 
 from .base import MongoQueryHandlerBase
+from ..util.selectinquery import get_related_total
 from ..exc import InvalidQueryError, DisabledError, InvalidColumnError, InvalidRelationError
 
 
@@ -90,7 +154,9 @@ class MongoJoin(MongoQueryHandlerBase):
 
     query_object_section_name = 'join'
 
-    def __init__(self, model, bags, allowed_relations=None, banned_relations=None, raiseload_rel=False, legacy_fields=None):
+    def __init__(self, model, bags, allowed_relations=None, banned_relations=None, raiseload_rel=False, legacy_fields=None,
+                 selectinquery_chunk_size=None, selectinquery_concurrency=None,
+                 join_strategy=None, join_strategy_hints=False, limited_join_strategy='subquery'):
         """ Init a join expression
 
         :param model: Sqlalchemy model to work with
@@ -99,6 +165,17 @@ class MongoJoin(MongoQueryHandlerBase):
         :param banned_relations: List of relations that can't be joined to
         :param raiseload_rel: Install a raiseload() option on all relations not explicitly loaded.
             This is a performance safeguard for the cases when your code might use them.
+        :param selectinquery_chunk_size: The number of primary keys per query for relationships loaded with selectinquery().
+            Either an int, or a dict {relationship name: int}, where '*' is the default.
+        :param selectinquery_concurrency: The number of selectinquery() chunks to load concurrently, on separate connections.
+            Either an int, or a dict {relationship name: int}, where '*' is the default.
+        :param join_strategy: The strategy to use when this model is loaded as a relationship of another model:
+            'selectin', 'joined', or None (choose automatically). Makes sense in `related` and `related_models` settings.
+        :param join_strategy_hints: Allow the Query Object to choose the loading strategy for relationships
+            with a `join_strategy` key in the nested Query Object.
+        :param limited_join_strategy: How to JOIN to a query that has a LIMIT or an OFFSET:
+            'subquery' wraps the whole query with from_self(),
+            'semijoin' moves the LIMIT into a `pk IN (SELECT pk ... LIMIT)` condition.
         """
         super(MongoJoin, self).__init__(model, bags)
 
@@ -119,12 +196,35 @@ class MongoJoin(MongoQueryHandlerBase):
         self.legacy_fields = frozenset(legacy_fields or ())
         self.legacy_fields_not_faked = self.legacy_fields - self.bags.all_names  # legacy_fields not faked as a @property
 
+        # selectinquery() tuning
+        self.selectinquery_chunk_size = selectinquery_chunk_size
+        self.selectinquery_concurrency = selectinquery_concurrency
+
+        # Loading strategy hints
+        self.join_strategy = join_strategy
+        self.join_strategy_hints = join_strategy_hints
+        if self.join_strategy not in self.JOIN_STRATEGY_HINTS:
+            raise ValueError('Invalid `join_strategy`: {!r}. Supported values: {}'
+                             .format(self.join_strategy, ', '.join(map(repr, self.JOIN_STRATEGY_HINTS))))
+
+        # Joining to a LIMITed query
+        self.limited_join_strategy = limited_join_strategy
+        if self.limited_join_strategy not in ('subquery', 'semijoin'):
+            raise ValueError('Invalid `limited_join_strategy`: {!r}'.format(self.limited_join_strategy))
+
         # Use LEFT_JOIN strategy only once
         self._used_up_left_join_strategy = False
 
+        # Streaming: the number of primary entities per batch. Set by MongoQuery.end_stream()
+        self.stream_batch_size = None
+
         # Validate
         if self.allowed_relations:
             self.validate_properties(self.allowed_relations, where='join:allowed_relations')
+        if isinstance(self.selectinquery_chunk_size, dict):
+            self.validate_properties(set(self.selectinquery_chunk_size) - {'*'}, where='join:selectinquery_chunk_size')
+        if isinstance(self.selectinquery_concurrency, dict):
+            self.validate_properties(set(self.selectinquery_concurrency) - {'*'}, where='join:selectinquery_concurrency')
 
         # On input
         # type: dict
@@ -193,6 +293,41 @@ class MongoJoin(MongoQueryHandlerBase):
         # actual joining process
         mjp_list = []
         for relation_name, query_object in relations.items():
+            # Loading strategy hint from the Query Object
+            # It's not an operation, so we pluck it out, and never give it to the nested MongoQuery
+            strategy_hint = None
+            if isinstance(query_object, dict) and 'join_strategy' in query_object:
+                query_object = query_object.copy()
+                strategy_hint = query_object.pop('join_strategy')
+
+                # Is it allowed?
+                if not self.join_strategy_hints:
+                    raise DisabledError('Join: `join_strategy` hints are disabled for `{}`'
+                                        .format(self.bags.model_name))
+                if strategy_hint not in self.JOIN_STRATEGY_HINTS:
+                    raise InvalidQueryError('Join: invalid `join_strategy` for relationship `{}.{}`: {!r}'
+                                            .format(self.bags.model_name, relation_name, strategy_hint))
+
+            # Recursive loading
+            # It's not an operation either: pluck it out
+            recursive_max_depth = None
+            if isinstance(query_object, dict) and 'recursive' in query_object:
+                query_object = query_object.copy()
+                recursive_max_depth = self._input_process_recursive(relation_name, query_object.pop('recursive'))
+
+            # Count related entities
+            # It is not the Count Operation of the nested query: pluck it out
+            count_related = False
+            if isinstance(query_object, dict) and 'count' in query_object:
+                query_object = query_object.copy()
+                count_related = self._input_process_count(relation_name, query_object.pop('count'))
+
+            # Exists, facets, sample: related entities are not a query of their own
+            for name in ('exists', 'facets', 'sample'):
+                if isinstance(query_object, dict) and query_object.get(name, None):
+                    raise InvalidQueryError('Join: `{}` is not supported for relationship `{}.{}`'
+                                            .format(name, self.bags.model_name, relation_name))
+
             # Add an ignored object for legacy_fields
             if relation_name in self.legacy_fields:
                 mjp = LegacyMongoJoinParams(
@@ -226,6 +361,15 @@ class MongoJoin(MongoQueryHandlerBase):
                 nested_mongoquery=nested_mongoquery,
             )
 
+            # The loading strategy hint: from the Query Object, or from the settings of the related model
+            mjp.loading_strategy_hint = strategy_hint or nested_mongoquery.handler_join.join_strategy
+
+            # Recursive loading
+            mjp.recursive_max_depth = recursive_max_depth
+
+            # Count related entities
+            mjp.count_related = count_related
+
             # Choose the loading strategy
             mjp.loading_strategy = self._choose_relationship_loading_strategy(mjp)
 
@@ -241,11 +385,31 @@ class MongoJoin(MongoQueryHandlerBase):
                 # Don't let this MongoJoin use a LEFT JOIN again
                 self._used_up_left_join_strategy = True
 
+            # Make sure the hinted strategy can handle the Query Object
+            if mjp.loading_strategy_hint:
+                self._validate_relationship_loading_strategy_hint(mjp)
+
+            # Make sure that recursive loading is possible
+            if mjp.recursive_max_depth:
+                self._validate_relationship_loading_recursive(mjp)
+
+            # Make sure that aggregation is possible
+            if mjp.loading_strategy == self.RELSTRATEGY_AGGREGATE:
+                self._validate_relationship_loading_aggregate(mjp)
+
+            # Make sure that counting is possible
+            if mjp.count_related:
+                self._validate_relationship_loading_count(mjp)
+
             # Unfortunately, a MongoQuery has to be aliased() upfront, before query() is called.
             # Therefore, we have to do it right now.
             # However, some relationship loading strategies want aliased(), some do not.
             # selectinquery() is the only one that does not want no aliases.
-            if mjp.loading_strategy == self.RELSTRATEGY_SELECTINQUERY:
+            if mjp.loading_strategy in (self.RELSTRATEGY_RECURSIVE, self.RELSTRATEGY_AGGREGATE):
+                # recursivequery() and aggregatequery() make separate queries of their own, starting from the related model.
+                # The nested MongoQuery is a top-level query: no aliases, no relationship paths.
+                pass
+            elif mjp.loading_strategy == self.RELSTRATEGY_SELECTINQUERY:
                 # selectinquery() does not want aliases, so we don't do it.
                 # However!
                 # After a lot of pain, it was discovered that even though the second query that selectinquery()
@@ -269,6 +433,29 @@ class MongoJoin(MongoQueryHandlerBase):
 
         return relations, mjp_list
 
+    def _input_process_count(self, relation_name, count):
+        """ Validate the `count` key of a nested Query Object
+
+            :returns: bool Whether to count related entities
+        """
+        if not isinstance(count, (int, bool)):
+            raise InvalidQueryError('Join: `count` must be either true or false (relationship={})'
+                                    .format(relation_name))
+        return bool(count)
+
+    def _input_process_recursive(self, relation_name, recursive):
+        """ Validate the `recursive` key of a nested Query Object
+
+            :returns: int The maximum depth
+        """
+        if not isinstance(recursive, dict) or not isinstance(recursive.get('maxDepth'), int) or set(recursive) != {'maxDepth'}:
+            raise InvalidQueryError('Join: `recursive` must be an object: {{maxDepth: int}} (relationship={})'
+                                    .format(relation_name))
+        if recursive['maxDepth'] < 1:
+            raise InvalidQueryError('Join: `recursive.maxDepth` must be a positive number (relationship={})'
+                                    .format(relation_name))
+        return recursive['maxDepth']
+
     # Not Implemented for this Query Object handler
     compile_options = NotImplemented
     compile_columns = NotImplemented
@@ -301,6 +488,12 @@ class MongoJoin(MongoQueryHandlerBase):
     RELSTRATEGY_LEFT_JOIN = 'LJOIN'
     RELSTRATEGY_JOINF = 'JOINF'
     RELSTRATEGY_SELECTINQUERY = 'SELECTINQUERY'
+    RELSTRATEGY_RECURSIVE = 'RECURSIVE'
+    RELSTRATEGY_AGGREGATE = 'AGGREGATE'
+
+    # Loading strategy hints that can be given in the settings (`join_strategy`) or the Query Object.
+    # `None` means "choose automatically"
+    JOIN_STRATEGY_HINTS = (None, 'selectin', 'joined')
 
     def _choose_relationship_loading_strategy(self, mjp):
         """ Make a decision on how to load the relationship.
@@ -308,6 +501,22 @@ class MongoJoin(MongoQueryHandlerBase):
         :type mjp: MongoJoinParams
         :returns: str Relationship loading strategy
         """
+        # Recursive loading is something that only one strategy can do
+        if mjp.recursive_max_depth:
+            return self.RELSTRATEGY_RECURSIVE
+
+        # Sometimes, we know better than any heuristic.
+        if mjp.loading_strategy_hint:
+            return self._choose_relationship_loading_strategy_from_hint(mjp)
+
+        # Aggregation is something that only one strategy can do
+        if mjp.query_object and 'aggregate' in mjp.query_object:
+            return self.RELSTRATEGY_AGGREGATE
+
+        # Counting related entities is something that only selectinquery() can do
+        if mjp.count_related and mjp.uselist:
+            return self.RELSTRATEGY_SELECTINQUERY
+
         # The user has requested a relationship, and here we decide how to load it.
         # There are two major cases to consider:
         # A. No nested Query Object.
@@ -401,6 +610,104 @@ class MongoJoin(MongoQueryHandlerBase):
         else:
             return self.RELSTRATEGY_EAGERLOAD
 
+    def _choose_relationship_loading_strategy_from_hint(self, mjp):
+        """ Choose the loading strategy that the settings or the Query Object have requested
+
+        :type mjp: MongoJoinParams
+        :returns: str Relationship loading strategy
+        """
+        if mjp.loading_strategy_hint == 'selectin':
+            # selectinquery(), even when disabled globally with ENABLED_EXPERIMENTAL_SELECTINQUERY
+            return self.RELSTRATEGY_SELECTINQUERY
+        elif mjp.loading_strategy_hint == 'joined':
+            # joinedload() is only good for one-to-one relationships with no nested queries;
+            # everything else gets a LEFT OUTER JOIN
+            if not mjp.uselist and not mjp.has_nested_query:
+                return self.RELSTRATEGY_EAGERLOAD
+            else:
+                return self.RELSTRATEGY_LEFT_JOIN
+        else:
+            raise ValueError(mjp.loading_strategy_hint)
+
+    def _validate_relationship_loading_strategy_hint(self, mjp):
+        """ Make sure that the hinted loading strategy supports the nested Query Object
+
+            selectinquery() supports everything but aggregation: LIMIT is implemented with a window function.
+            LEFT OUTER JOIN supports neither aggregation, nor LIMIT, because they would distort the primary query.
+
+            :type mjp: MongoJoinParams
+            :raises InvalidQueryError: the Query Object can't be handled by the hinted strategy
+        """
+        if mjp.loading_strategy == self.RELSTRATEGY_SELECTINQUERY:
+            unsupported = ('aggregate', 'group')
+        elif mjp.loading_strategy == self.RELSTRATEGY_LEFT_JOIN:
+            unsupported = ('aggregate', 'group', 'skip', 'limit')
+        else:
+            unsupported = ()
+
+        for operation in unsupported:
+            if operation in (mjp.query_object or ()):
+                raise InvalidQueryError('Join strategy {!r} does not support `{}` (relationship={}, strategy={}). '
+                                        '`skip` and `limit` require the \'selectin\' strategy.'
+                                        .format(mjp.loading_strategy_hint, operation, mjp.relationship_name, mjp.loading_strategy))
+
+    def _validate_relationship_loading_recursive(self, mjp):
+        """ Make sure that the relationship can be loaded recursively
+
+            :type mjp: MongoJoinParams
+            :raises InvalidQueryError: the relationship can't be loaded recursively
+        """
+        if mjp.loading_strategy != self.RELSTRATEGY_RECURSIVE:
+            raise InvalidQueryError('`recursive` is not supported by `{}` (relationship={})'
+                                    .format(self.query_object_section_name, mjp.relationship_name))
+
+        # Only self-referential relationships with simple foreign keys
+        prop = mjp.relationship.property
+        if mjp.target_model is not self.bags.model or prop.secondary is not None or len(prop.local_remote_pairs) != 1:
+            raise InvalidQueryError('`recursive` is only supported for self-referential relationships '
+                                    'with a single foreign key (relationship={})'
+                                    .format(mjp.relationship_name))
+
+        # Recursive queries are trees: no limits, no aggregation
+        for unsupported in ('aggregate', 'group', 'skip', 'limit'):
+            if unsupported in (mjp.query_object or ()):
+                raise InvalidQueryError('MongoSQL does not support `{}` for recursive joins (relationship={}, strategy={})'
+                                        .format(unsupported, mjp.relationship_name, mjp.loading_strategy))
+
+    def _validate_relationship_loading_aggregate(self, mjp):
+        """ Make sure that the relationship can be aggregated
+
+            :type mjp: MongoJoinParams
+            :raises InvalidQueryError: the relationship can't be aggregated
+        """
+        if mjp.relationship.property.secondary is not None:
+            raise InvalidQueryError('MongoSQL does not support `aggregate` for many-to-many relationships (relationship={})'
+                                    .format(mjp.relationship_name))
+
+        # Aggregates are not entities: no nested joins
+        for unsupported in ('join', 'joinf', 'count'):
+            if unsupported in mjp.query_object:
+                raise InvalidQueryError('MongoSQL does not support `{}` for aggregated joins (relationship={}, strategy={})'
+                                        .format(unsupported, mjp.relationship_name, mjp.loading_strategy))
+
+    def _validate_relationship_loading_count(self, mjp):
+        """ Make sure that related entities can be counted
+
+            :type mjp: MongoJoinParams
+            :raises InvalidQueryError: related entities can't be counted
+        """
+        if not mjp.uselist:
+            raise InvalidQueryError('`count` is only supported for x-to-many relationships (relationship={})'
+                                    .format(mjp.relationship_name))
+        if mjp.loading_strategy != self.RELSTRATEGY_SELECTINQUERY:
+            raise InvalidQueryError('`count` is not supported by this kind of `{}` (relationship={}, strategy={})'
+                                    .format(self.query_object_section_name, mjp.relationship_name, mjp.loading_strategy))
+
+        # The total goes into a key next to the relationship: it must not shadow anything
+        if mjp.count_key in self.bags.all_names:
+            raise InvalidQueryError('`count` is not supported for relationship `{}`: `{}.{}` already exists'
+                                    .format(mjp.relationship_name, self.bags.model_name, mjp.count_key))
+
     def _load_relationship(self, query, as_relation, mjp):
         """ Load the relationship using the chosen strategy """
         return {
@@ -409,6 +716,8 @@ class MongoJoin(MongoQueryHandlerBase):
             self.RELSTRATEGY_LEFT_JOIN: self._load_relationship_with_filter__left_join,
             self.RELSTRATEGY_JOINF: self._load_relationship_with_filter__joinf,
             self.RELSTRATEGY_SELECTINQUERY: self._load_relationship_with_filter__selectinquery,
+            self.RELSTRATEGY_RECURSIVE: self._load_relationship_recursively,
+            self.RELSTRATEGY_AGGREGATE: self._load_relationship_aggregated,
         }[mjp.loading_strategy](query, as_relation, mjp)  # use the method
 
     def _load_relationship_sqlalchemy_eagerload(self, query, as_relation, mjp):
@@ -657,7 +966,8 @@ class MongoJoin(MongoQueryHandlerBase):
         # Get the list of foreign key columns for this relationship
         relation_fk = mjp.relationship.property.remote_side
         # Give them to the MongoLimit handler
-        nested_mq.handler_limit.limit_groups_over_columns(relation_fk)
+        # When the API user wants to know the total number of related entities, it's counted within the same window.
+        nested_mq.handler_limit.limit_groups_over_columns(relation_fk, with_totals=mjp.count_related)
 
         # Just set the option. That's it :)
         return query.options(
@@ -665,6 +975,75 @@ class MongoJoin(MongoQueryHandlerBase):
                 relationship=mjp.relationship,
                 alter_query=lambda q: nested_mq.from_query(q).end(),
                 cache_key=get_mongoquery_cache_key(query, nested_mq),  # cached, yes!
+                # Tuning
+                # When streaming, every batch of primary entities gets exactly one query
+                chunk_size=self.stream_batch_size or _get_relationship_setting(self.selectinquery_chunk_size, mjp.relationship_name),
+                concurrency=_get_relationship_setting(self.selectinquery_concurrency, mjp.relationship_name),
+                # Totals: kept with every primary entity; see get_related_total()
+                totals=mjp.count_related,
+            )
+        )
+
+    def _load_relationship_recursively(self, query, as_relation, mjp):
+        """ Load a self-referential relationship recursively, with one WITH RECURSIVE query
+
+            This technique will issue a second query that walks the relationship up to `maxDepth` levels deep,
+            and populates the relationship on every loaded entity.
+            The nested filter is applied on every level; the rest of the nested Query Object (projection, sorting,
+            joins) is applied to every loaded entity.
+
+            See: mongosql.util.recursivequery
+
+            :type query: sqlalchemy.orm.Query
+            :type as_relation: Load
+            :type mjp: MongoJoinParams
+        """
+        nested_mq = mjp.nested_mongoquery
+
+        # The loader needs the values of the local columns of the primary entities: they're the keys for the first level.
+        # Make sure they're loaded, even when the projection has excluded them.
+        local_columns = mjp.relationship.property.local_columns
+        query = query.options(*[as_relation.undefer(column.key)
+                                for column in local_columns])
+
+        # The filter goes into the recursive query itself, because it has to be applied on every level
+        filter_handler = nested_mq.handler_filter
+        criteria = filter_handler.compile_statement() if filter_handler.expressions else None
+
+        return query.options(
+            as_relation.recursivequery(
+                relationship=mjp.relationship,
+                alter_query=lambda q: nested_mq.from_query(q).end(),
+                max_depth=mjp.recursive_max_depth,
+                criteria=criteria,
+            )
+        )
+
+    def _load_relationship_aggregated(self, query, as_relation, mjp):
+        """ Aggregate a relationship: compute aggregates over related entities, per primary entity
+
+            This technique will issue a second query with a LATERAL subquery keyed on the foreign key:
+            the nested Query Object (filter, aggregate, group, sort, limit) is applied to every primary entity's
+            related rows separately.
+            Related entities themselves are not loaded; the results are collected into `mjp.aggregated`,
+            and pluck_instance() picks them up from there.
+
+            See: mongosql.util.aggregatequery
+
+            :type query: sqlalchemy.orm.Query
+            :type as_relation: Load
+            :type mjp: MongoJoinParams
+        """
+        nested_mq = mjp.nested_mongoquery
+
+        # A new dict for every query: results for another query can't get in
+        mjp.aggregated = {}
+
+        return query.options(
+            as_relation.aggregatequery(
+                relationship=mjp.relationship,
+                alter_query=lambda q: nested_mq.from_query(q).end(),
+                results=mjp.aggregated,
             )
         )
 
@@ -692,6 +1071,10 @@ class MongoJoin(MongoQueryHandlerBase):
         #   ) AS users
         #   LEFT JOIN articles ....
         if query._limit is not None or query._offset is not None:  # accessing protected properties of Query
+            # There is an alternative way to do it: see _join__move_LIMIT_into_semijoin()
+            if self.limited_join_strategy == 'semijoin':
+                return self._join__move_LIMIT_into_semijoin(query)
+
             # We're going to make it into a subquery, so let's first make sure that we have enough columns selected.
             # We'll need columns used in the ORDER BY clause selected, so let's get them out, so that we can use them
             # in the ORDER BY clause later on (a couple of statements later)
@@ -741,6 +1124,41 @@ class MongoJoin(MongoQueryHandlerBase):
 
         return query
 
+    def _join__move_LIMIT_into_semijoin(self, query):
+        """ An alternative to from_self(): compute the paginated primary keys in a subquery
+
+            Instead of wrapping the whole query into a derived table:
+
+                SELECT anon_1.*, articles.*
+                FROM (SELECT users.* FROM users WHERE ... ORDER BY ... LIMIT 10) AS anon_1
+                    LEFT JOIN articles ...
+                ORDER BY anon_1.age
+
+            we only select the primary keys of the current page:
+
+                SELECT users.*, articles.*
+                FROM users
+                    LEFT JOIN articles ...
+                WHERE ... AND users.id IN (SELECT users.id FROM users WHERE ... ORDER BY ... LIMIT 10)
+                ORDER BY users.age
+
+            The outer query stays a plain query on the table: nothing to undefer, no ORDER BY to re-apply,
+            and PostgreSQL is free to plan it as a semi-join.
+        """
+        # Primary key columns. getattr() makes sure we use aliases, if any
+        pk_columns = [getattr(self.model, name) for name in self.bags.pk.names]
+
+        # The page of primary keys: same WHERE, ORDER BY, LIMIT, OFFSET
+        page_pks = query.enable_eagerloads(False).with_entities(*pk_columns).subquery()
+
+        # The outer query: no LIMIT, but filtered by primary keys from the page
+        if len(pk_columns) == 1:
+            pk_condition = pk_columns[0].in_(page_pks)
+        else:
+            pk_condition = tuple_(*pk_columns).in_(page_pks)
+
+        return query.limit(None).offset(None).filter(pk_condition)
+
     # endregion
 
     # Extra features
@@ -802,6 +1220,37 @@ class MongoJoin(MongoQueryHandlerBase):
         return {relation_name: projection.get(relation_name, 0)
                 for relation_name in all_names}
 
+    def get_collections_joined_into_query(self):
+        """ Get the names of x-to-many relationships that are loaded with a JOIN into the primary query
+
+            Such relationships give several rows per primary entity, and their collections are assembled
+            from all those rows. Other strategies (selectinload(), selectinquery(), etc) use separate queries.
+
+            Nested relationships use dot-notation. Example:
+
+                MongoQuery(User).query(join={'articles': dict(join_strategy='joined')}) \
+                    .handler_join.get_collections_joined_into_query()
+                #-> ['articles']
+
+            :rtype: list[str]
+        """
+        names = []
+        for mjp in self.mjps:
+            # Only LEFT JOINs are done within the same query
+            if mjp.loading_strategy not in (self.RELSTRATEGY_LEFT_JOIN, self.RELSTRATEGY_JOINF):
+                continue
+
+            # x-to-many relationships
+            if mjp.uselist:
+                names.append(mjp.relationship_name)
+
+            # Nested relationships of a joined relationship are in the same query as well
+            nested_mongoquery = mjp.nested_mongoquery
+            for handler in (nested_mongoquery.handler_join, nested_mongoquery.handler_joinf):
+                names.extend(mjp.relationship_name + '.' + name
+                             for name in handler.get_collections_joined_into_query())
+        return names
+
     def merge(self, relations, quietly=False, strict=False):
         """ Add another relationship to be eagerly loaded.
 
@@ -942,6 +1391,22 @@ class MongoJoin(MongoQueryHandlerBase):
         # Done
         return self
 
+    def forget_related_results(self):
+        """ Forget the results that loaders have collected for the primary entities: aggregates
+
+            Loaders keep those results in dicts that grow with every loaded entity.
+            When streaming (see MongoQuery.end_stream()), they are forgotten as soon as a batch is consumed.
+            The dicts are cleared in place: loader options keep references to them.
+            Totals are not here: they are kept with the entities themselves.
+        """
+        for mjp in self.mjps:
+            if mjp.aggregated:
+                mjp.aggregated.clear()
+
+            # Nested relationships
+            mjp.nested_mongoquery.handler_join.forget_related_results()
+            mjp.nested_mongoquery.handler_joinf.forget_related_results()
+
     def get_final_input_value(self):
         return {
             mjp.relationship_name: mjp.nested_mongoquery.get_final_query_object()
@@ -977,6 +1442,11 @@ class MongoJoin(MongoQueryHandlerBase):
             # The relationship we're handling. It's been loaded.
             rel_name = mjp.relationship_name
 
+            # Aggregated relationships are not loaded: the results are stored separately
+            if mjp.loading_strategy == self.RELSTRATEGY_AGGREGATE:
+                ret[rel_name] = self._pluck_instance_aggregated(mjp, instance)
+                continue
+
             # Get property value
             value = getattr(instance, rel_name)
 
@@ -984,15 +1454,57 @@ class MongoJoin(MongoQueryHandlerBase):
             # Now, it can be a list of related entities (mjp.uselist), or a single entity, or None
             # We don't care how to handle nested entities here, because the nested MongoQuery will do that.
             # Pluck
-            if mjp.uselist:
-                value = [mjp.nested_mongoquery.pluck_instance(e)
-                         for e in value]
+            if mjp.recursive_max_depth:
+                # Recursive relationships are plucked as a tree
+                value = self._pluck_instance_recursively(mjp, value, 1)
+            elif mjp.uselist:
+                value = mjp.nested_mongoquery.pluck_many(value)
             else:
                 if value is not None:
                     value = mjp.nested_mongoquery.pluck_instance(value)
 
             # Store
             ret[rel_name] = value
+
+            # The total number of related entities
+            if mjp.count_related:
+                ret[mjp.count_key] = get_related_total(instance, rel_name)
+        return ret
+
+    def _pluck_instance_aggregated(self, mjp, instance):
+        """ Pluck the aggregated values for an instance
+
+            With `group`, it's a list of rows: one for every group.
+            Without `group`, it's a single row: aggregates over all related entities.
+        """
+        rows = mjp.aggregated.get(instance_state(instance).identity, [])
+        if mjp.nested_mongoquery.handler_group.is_input_empty():
+            return rows[0] if rows else None
+        else:
+            return rows
+
+    def _pluck_instance_recursively(self, mjp, value, depth):
+        """ Pluck a recursively loaded relationship value: every entity gets its own nested relationship value
+
+            :param mjp: The MJP of the recursive relationship
+            :param value: The loaded value of the relationship: a list, an instance, or None
+            :param depth: The depth of `value` in the tree
+        """
+        if mjp.uselist:
+            return [self._pluck_instance_recursively__one(mjp, e, depth) for e in value]
+        elif value is not None:
+            return self._pluck_instance_recursively__one(mjp, value, depth)
+        else:
+            return None
+
+    def _pluck_instance_recursively__one(self, mjp, instance, depth):
+        ret = mjp.nested_mongoquery.pluck_instance(instance)
+
+        # Go deeper, but only as deep as the tree was loaded.
+        # Also, a relationship with cycles might have been loaded that way: the depth check protects us from them.
+        rel_name = mjp.relationship_name
+        if depth < mjp.recursive_max_depth and rel_name in instance_state(instance).dict:
+            ret[rel_name] = self._pluck_instance_recursively(mjp, getattr(instance, rel_name), depth + 1)
         return ret
 
 
@@ -1009,7 +1521,9 @@ class MongoJoinParams:
                  'query_object',
                  'parent_mongoquery',
                  'nested_mongoquery',
-                 'uselist', 'loading_strategy',
+                 'uselist', 'loading_strategy', 'loading_strategy_hint',
+                 'recursive_max_depth', 'aggregated',
+                 'count_related',
                  'quietly_included')
 
     def __init__(self,
@@ -1060,6 +1574,10 @@ class MongoJoinParams:
         self.nested_mongoquery = nested_mongoquery
 
         self.loading_strategy = None  # will be added later
+        self.loading_strategy_hint = None  # 'selectin', 'joined', or None
+        self.recursive_max_depth = None  # int, for recursive relationships
+        self.aggregated = None  # dict, for aggregated relationships: { parent identity: [ row dicts ] }
+        self.count_related = False  # whether to count related entities
 
         # Whether to include this field into get_full_projection() and pluck_instance()
         # `True` is for the relationships that were officially requested by the user
@@ -1067,6 +1585,14 @@ class MongoJoinParams:
         # response because the API user has not requested it.
         self.quietly_included = False
 
+    @property
+    def count_key(self):
+        """ The key for the total number of related entities in the output of pluck_instance()
+
+        :rtype: str
+        """
+        return self.relationship_name + '_count'
+
     @property
     def has_nested_query(self):
         """ Tell whether this MJP has a nested query
@@ -1132,6 +1658,13 @@ class JSONCacheKeyEncoder(json.JSONEncoder):
         return repr(o)
 
 
+def _get_relationship_setting(setting, relationship_name):
+    """ Get the value of a setting that is either a plain value, or a dict {relationship name: value, '*': default} """
+    if isinstance(setting, dict):
+        return setting.get(relationship_name, setting.get('*'))
+    return setting
+
+
 def get_mongoquery_cache_key(query, nested_mongoquery):
     """ Get the hash key for the current query
 
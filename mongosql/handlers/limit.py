@@ -59,6 +59,8 @@ class MongoLimit(MongoQueryHandlerBase):
         # Internal
         # List of columns to group results with (in order to import a limit per group)
         self._window_over_columns = None
+        # Whether to count the total number of rows in every group
+        self._window_with_totals = False
 
     def input_prepare_query_object(self, query_object):
         """ Alter Query Object
@@ -76,9 +78,9 @@ class MongoLimit(MongoQueryHandlerBase):
             if query_object['limit'] == (None, None):
                 query_object.pop('limit')  # remove it if it's actually empty
 
-        # When there is a 'count', we have to disable self.max_items
+        # When there is a 'count', an 'exists', or 'facets', we have to disable self.max_items
         # We can safely just alter ourselves, because we're a copy anyway
-        if query_object.get('count', False):
+        if query_object.get('count', False) or query_object.get('exists', False) or query_object.get('facets', None):
             self.max_items = None
 
         return query_object
@@ -125,7 +127,7 @@ class MongoLimit(MongoQueryHandlerBase):
         """ Check thether there's a limit on this handler """
         return self.limit is not None or self.skip is not None
 
-    def limit_groups_over_columns(self, fk_columns):
+    def limit_groups_over_columns(self, fk_columns, with_totals=False):
         """ Instead of the usual limit, use a window function over the given columns.
 
         This method is used by MongoJoin when doing a custom selectinquery() to load a limited number of related
@@ -155,7 +157,15 @@ class MongoLimit(MongoQueryHandlerBase):
 
             That's what window functions do: they work like aggregate functions, but they don't group rows.
 
+        With `with_totals`, every row will also have the total number of rows in its group, before the limit:
+
+            SELECT *, count(*) OVER(PARTITION BY author_id) AS group_total_n
+
+        This is how MongoJoin finds out the total number of related entities per every primary entity,
+        when only a few of them are loaded.
+
         :param fk_columns: List of foreign key columns to group with
+        :param with_totals: Add a `group_total_n` column: the number of rows in every group
         """
         # Adaptation not needed, because this method is never used with aliases
         # pa_insp = inspect(self.model)
@@ -163,6 +173,7 @@ class MongoLimit(MongoQueryHandlerBase):
         assert not inspect(self.model).is_aliased_class, "Cannot be used with aliases; not implemented yet (because nobody needs it anyway!)"
 
         self._window_over_columns = fk_columns
+        self._window_with_totals = with_totals
 
     def alter_query(self, query, as_relation=None):
         """ Apply offset() and limit() to the query """
@@ -182,6 +193,15 @@ class MongoLimit(MongoQueryHandlerBase):
 
             This approach enables us to limit the number of eagerly loaded related entities
         """
+        # Count the rows in every group.
+        # It goes in before the limit: window functions are computed before WHERE of the outer query cuts the rows
+        if self._window_with_totals:
+            query = query.add_columns(
+                func.count().over(
+                    partition_by=self._window_over_columns
+                ).label('group_total_n')
+            )
+
         # Only do it when there is a limit
         if self.skip or self.limit:
             # First, add a row counter:
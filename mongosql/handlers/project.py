@@ -76,6 +76,29 @@ This may be appropriate for some field that contain a lot of data, or require so
 To include those fields, you have to request them explicitly: just use their name
 in the list of fields that you request.
 
+#### JSON Sub-Paths and Slices
+When a field is a large JSON document, or a long array, you may not need all of it.
+In the Object syntax, you can ask for parts of it:
+
+* A JSON sub-path, with dot-notation:
+
+    ```javascript
+    { project: { 'id': 1, 'data.title': 1, 'data.author.name': 1 } }
+    ```
+
+    You'll get the parts of the document reassembled into the same nested shape:
+    `{id: 1, data: {title: ..., author: {name: ...}}}`. Missing keys are `null`.
+
+* A slice of an array: the first N elements, or [skip, N]:
+
+    ```javascript
+    { project: { 'id': 1, 'tags': {$slice: 5}, 'data.comments': {$slice: [10, 5]} } }
+    ```
+
+    This works with ARRAY fields, JSON fields, and JSON sub-paths.
+
+Only the requested parts are sent by the database. Only works in include mode.
+
 #### Related Models
 Normally, in order to load a related model (say, user's `user_profile`, or some other data related to this model),
 you would use the [Join Operation](#join-operation).
@@ -95,6 +118,7 @@ This request will load the related `user_articles` for you.
 
 Note that some relationships will be disabled for security reasons.
 """
+from operator import attrgetter
 
 from sqlalchemy.orm.base import InspectionAttr
 
@@ -154,6 +178,8 @@ class MongoProject(MongoQueryHandlerBase):
                  default_unexclude_properties=None,
                  force_include=None, force_exclude=None,
                  ensure_loaded=None,
+                 raw_json_columns=None,
+                 heavy_columns=None,
                  raiseload_col=False,
                  legacy_fields=None):
         """ Init projection
@@ -177,6 +203,12 @@ class MongoProject(MongoQueryHandlerBase):
         :param force_include: A list of column names to include into the output always
         :param force_exclude: A list of column names to exclude from the output always
         :param ensure_loaded: The list of columns to load at all times, but quietly (without adding them into the projection)
+        :param raw_json_columns: The list of JSON columns to pass through to the output as they are:
+            loaded as text, and given RawJSON values that are never decoded. See rawjsonload()
+            NOTE: instances with RawJSON values should not stay in the Session. See MongoQuerySettingsDict
+        :param heavy_columns: The list of columns that hold a lot of data, or `True` to detect them by type (TEXT, BYTEA, JSON).
+            They are excluded by default, like `default_exclude`; when requested, they are loaded with a separate query,
+            only for the rows that made it into the result. See selectinload_col()
         :param raiseload_col: Install a raiseload_col() option on all fields excluded by projection.
             This is a performance safeguard: when your custom code uses certain fields, but a
             projection has excluded them, the situation will result in a LOT of extra queries!
@@ -203,6 +235,10 @@ class MongoProject(MongoQueryHandlerBase):
         self.force_exclude = set(force_exclude) if force_exclude else None
         self.default_exclude_properties = None
         self.ensure_loaded = set(ensure_loaded) if ensure_loaded else None
+        self.raw_json_columns = set(raw_json_columns) if raw_json_columns else None
+        if heavy_columns is True:
+            heavy_columns = self.bags.columns.heavy_names  # detect by type
+        self.heavy_columns = set(heavy_columns) if heavy_columns else None
         self.raiseload_col = raiseload_col
 
         if default_exclude_properties or default_unexclude_properties:  # when either is specified, the effect is the same
@@ -214,6 +250,10 @@ class MongoProject(MongoQueryHandlerBase):
             # Merge `properties` and `hybrid_properties` into `default_exclude`
             self.default_exclude = (self.default_exclude or set()) | self.default_exclude_properties
 
+        if self.heavy_columns:
+            # Heavy columns are only loaded when requested explicitly
+            self.default_exclude = (self.default_exclude or set()) | self.heavy_columns
+
         # On input
         #: Projection mode: self.MODE_INCLUDE, self.MODE_EXCLUDE, self.MODE_MIXED
         self.mode = None
@@ -221,6 +261,10 @@ class MongoProject(MongoQueryHandlerBase):
         self._projection = None
         #: The list of fields that are quietly included
         self.quietly_included = set()
+        #: Compiled pluck_instance(): (keys, getter). Cached; reset when the projection changes
+        self._pluck_plan = None
+        #: JSON sub-paths and slices: { column name: [(path, slice)] }
+        self.partial_columns = {}
 
         # Validate
         if self.default_projection:
@@ -246,11 +290,16 @@ class MongoProject(MongoQueryHandlerBase):
             self.validate_properties_or_relations(self.force_exclude, where='project:force_exclude')
         if self.ensure_loaded:
             self.validate_properties_or_relations(self.ensure_loaded, where='project:ensure_loaded')
+        if self.raw_json_columns:
+            self.validate_properties(self.raw_json_columns, bag=self.bags.columns, where='project:raw_json_columns')
+        if self.heavy_columns:
+            self.validate_properties(self.heavy_columns, bag=self.bags.columns, where='project:heavy_columns')
 
     def __copy__(self):
         obj = super(MongoProject, self).__copy__()
         obj._projection = obj._projection.copy() if obj._projection is not None else None
         obj.quietly_included = obj.quietly_included.copy()
+        obj._pluck_plan = None
         return obj
 
     def validate_properties_or_relations(self, prop_names, where=None):
@@ -297,8 +346,10 @@ class MongoProject(MongoQueryHandlerBase):
             :raises InvalidQueryError: invalid input
         """
         super(MongoProject, self).input(projection)
+        self._pluck_plan = None
 
         # Process
+        projection, self.partial_columns = self._input_process_partial(projection)
         self.mode, self._projection, relations = self._input_process(projection)
 
         # Settings: default_exclude
@@ -423,6 +474,61 @@ class MongoProject(MongoQueryHandlerBase):
         # Done
         return mode, projection, relations
 
+    def _input_process_partial(self, projection):
+        """ input(): pluck JSON sub-paths and slices out of the projection
+
+            Every such key is replaced with its column: {'data.title': 1} -> {'data': 1}
+
+            :return: (projection, { column name: [(path, slice)] })
+        """
+        # Only the Object syntax supports it
+        if not isinstance(projection, dict):
+            return projection, {}
+
+        # Don't modify the Query Object: it may be reused
+        projection = projection.copy()
+
+        partial_columns = {}
+        for key, value in list(projection.items()):
+            # Parse: a sub-path, a $slice
+            name, _, path = key.partition('.')
+            path = tuple(path.split('.')) if path else ()
+            is_slice = isinstance(value, dict)
+            if not path and not is_slice:
+                continue  # a regular column, or a relationship
+
+            # Where does it work?
+            if name not in self.bags.columns:
+                continue  # validation will complain
+            if path and not self.bags.columns.is_column_json(name):
+                raise InvalidQueryError('Projection: sub-path `{}` only works with JSON columns'.format(key))
+            if is_slice and not (self.bags.columns.is_column_json(name) or self.bags.columns.is_column_array(name)):
+                raise InvalidQueryError('Projection: $slice only works with ARRAY and JSON columns (`{}`)'.format(key))
+
+            # Parse the value
+            if is_slice:
+                part_slice = _parse_slice(key, value)
+            elif value == 1:
+                part_slice = None
+            else:
+                raise InvalidQueryError('Projection: sub-path `{}` can only be included'.format(key))
+
+            # Replace it with the column
+            del projection[key]
+            partial_columns.setdefault(name, []).append((path, part_slice))
+
+        # Parts can't overlap, and can't be mixed with the whole column
+        for name, parts in partial_columns.items():
+            if name in projection:
+                raise InvalidQueryError('Projection: `{}` is both included, and projected partially'.format(name))
+            paths = [part_path for part_path, part_slice in parts]
+            for part_path in paths:
+                if any(other != part_path and other[:len(part_path)] == part_path for other in paths):
+                    raise InvalidQueryError('Projection: path collision in `{}`'.format(name))
+            projection[name] = 1
+
+        return projection, partial_columns
+
     def _process_simple_merge(self, mode, projection, merge_projection, quietly_included=()):
         """ Simply merge two projections: merge `merge_projection` into (mode, projection) and return it """
         # Prepare the input
@@ -606,6 +712,9 @@ class MongoProject(MongoQueryHandlerBase):
         """ Get the list of options for a Query: load_only() for columns, and some eager loaders for relationships """
         options = []
         options.extend(self._compile_column_options(as_relation))
+        options.extend(self._compile_heavy_column_options(as_relation))
+        options.extend(self._compile_raw_json_options(as_relation))
+        options.extend(self._compile_partial_options(as_relation))
         options.extend(self._compile_relationship_options(as_relation))
         return options
 
@@ -650,6 +759,31 @@ class MongoProject(MongoQueryHandlerBase):
         # done
         return ()
 
+    def _compile_heavy_column_options(self, as_relation):
+        """ Column options: selectinload_col() for heavy columns that have been requested """
+        if self.heavy_columns:
+            heavy_columns = sorted(name for name in self.heavy_columns if name in self)
+            if heavy_columns:
+                return [as_relation.selectinload_col(*heavy_columns)]
+
+        # done
+        return ()
+
+    def _compile_raw_json_options(self, as_relation):
+        """ Column options: rawjsonload() for JSON columns that are passed through to the output """
+        raw_json_columns = self.get_raw_json_columns()
+        if raw_json_columns:
+            return [as_relation.rawjsonload(*raw_json_columns)]
+
+        # done
+        return ()
+
+    def _compile_partial_options(self, as_relation):
+        """ Column options: partialload() for JSON sub-paths and slices """
+        return [as_relation.partialload(name, parts)
+                for name, parts in sorted(self.partial_columns.items())
+                if name in self]
+
     def _compile_relationship_options(self, as_relation):
         """ Relationship options: for relationships that are affected by this projection.
 
@@ -714,6 +848,7 @@ class MongoProject(MongoQueryHandlerBase):
         # Apply
         self.mode = new_mode
         self._projection = new_projection
+        self._pluck_plan = None
 
         # Quiet mode handler
         if quietly:
@@ -820,10 +955,52 @@ class MongoProject(MongoQueryHandlerBase):
         """
         return self._generate_full_projection_for(self.mode, self._projection, self.quietly_included)
 
+    def get_raw_json_columns(self):
+        """ Get the names of `raw_json_columns` that are included into the projection
+
+            Quietly included columns are not on the list: they are loaded for the application, not for the output.
+
+            :rtype: list[str]
+        """
+        if not self.raw_json_columns:
+            return []
+        return sorted(name
+                      for name in self.raw_json_columns
+                      if name in self and name not in self.quietly_included and name not in self.partial_columns)
+
+    def get_columns_only(self):
+        """ Get the names of columns to select when no entities are needed: see MongoQuery.options(columns_only)
+
+            This is only possible when the projection contains nothing but columns and column properties:
+            @property, @hybrid_property, association proxies, JSON parts and raw JSON need an entity.
+
+            Quietly included columns go last: the application needs them, but they are not plucked.
+
+            :return: Column names, or None if the projection needs entities
+            :rtype: tuple[str] | None
+        """
+        keys, _ = self.pluck_plan
+        loadable = self._get_supported_bags_for_actually_loading_with_options()
+        if not keys or self.partial_columns or self.get_raw_json_columns() \
+                or not all(key in loadable for key in keys):
+            return None
+        return keys + tuple(sorted(name
+                                   for name in self.quietly_included
+                                   if name in loadable and name not in keys))
+
     def get_final_input_value(self):
         # Make sure that Default() does not make it out. Otherwise, jsonify() would fail on it
-        return {k: Default.unwrap(v)
-                for k, v in self.projection.items()}
+        ret = {k: Default.unwrap(v)
+               for k, v in self.projection.items()}
+
+        # Partial columns: report the sub-paths and slices, as they were given, instead of the whole column
+        if self.partial_columns:
+            for name in self.partial_columns:
+                ret.pop(name, None)
+            ret.update((k, v)
+                       for k, v in self.input_value.items()
+                       if k.partition('.')[0] in self.partial_columns)
+        return ret
 
     def __contains__(self, name):
         """ Test whether a column name is included into projection (by name)
@@ -854,11 +1031,55 @@ class MongoProject(MongoQueryHandlerBase):
             :param instance: object
             :rtype: dict
         """
-        return {key: getattr(instance, key)
-                for key, include in self.get_full_projection().items()
-                if include
-                and key not in self.quietly_included
-                and key not in self.legacy_fields_not_faked}
+        keys, getter = self.pluck_plan
+        return dict(zip(keys, getter(instance)))
+
+    @property
+    def pluck_plan(self):
+        """ Get the compiled pluck_instance(): the keys to pluck, and a getter that plucks them all at once
+
+            The full projection is only computed once, not for every instance;
+            it is recompiled when the projection changes (input(), merge()).
+
+            :rtype: (tuple[str], callable)
+        """
+        if self._pluck_plan is None:
+            keys = tuple(key
+                         for key, include in self.get_full_projection().items()
+                         if include
+                         and key not in self.quietly_included
+                         and key not in self.legacy_fields_not_faked)
+            self._pluck_plan = (keys, _tuple_attrgetter(keys))
+        return self._pluck_plan
+
+
+def _parse_slice(key, value):
+    """ Parse a {$slice: N} or {$slice: [skip, N]} projection value into (skip, limit) """
+    if set(value) != {'$slice'}:
+        raise InvalidQueryError('Projection: `{}` only supports {{$slice: ...}}'.format(key))
+    value = value['$slice']
+
+    # N, or [skip, N]
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        skip, limit = value
+    else:
+        skip, limit = 0, value
+
+    if not (isinstance(skip, int) and isinstance(limit, int) and skip >= 0 and limit > 0) \
+            or isinstance(skip, bool) or isinstance(limit, bool):
+        raise InvalidQueryError('Projection: $slice for `{}` must be N, or [skip, N], with positive integers'.format(key))
+    return skip, limit
+
+
+def _tuple_attrgetter(keys):
+    """ Make an attrgetter() that always returns a tuple, even for one key or no keys at all """
+    if len(keys) == 0:
+        return lambda instance: ()
+    elif len(keys) == 1:
+        key = keys[0]
+        return lambda instance: (getattr(instance, key),)
+    else:
+        return attrgetter(*keys)
 
 
 class Default(Marker):
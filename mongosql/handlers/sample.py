@@ -0,0 +1,174 @@
+"""
+### Sample Operation
+Sample corresponds to the `TABLESAMPLE` SQL clause: only look at a random part of the table.
+
+Use it for previews, data quality checks, "show me some examples" features: unlike `ORDER BY random() LIMIT n`,
+it does not have to read the whole table.
+
+```javascript
+$.get('/api/article?query=' + JSON.stringify({
+    filter: { published: true },
+    sample: { percent: 1, method: 'system', seed: 42 },
+}))
+```
+
+The sample is either:
+
+* `{ percent: 1 }`: the percentage of the table's rows to look at
+* `{ rows: 500 }`: the number of rows to look at.
+    Requires the `tsm_system_rows` PostgreSQL extension: `CREATE EXTENSION tsm_system_rows;`
+
+Rows are picked before any `filter` is applied: the result contains those of the sampled rows that match the criteria.
+
+Options:
+
+* `method`: how to pick the rows for `percent`:
+    * `'system'` (default): picks whole pages of the table. Very fast, but the rows that live on the same page
+        come together.
+    * `'bernoulli'`: picks every row with the given probability. Reads the whole table, but the sample is better.
+* `seed`: a number. The same seed gives the same sample, as long as the table does not change.
+    Without it, every query gives a different sample.
+
+Use it together with the [Aggregate Operation](#aggregate-operation) to get approximate statistics over large tables
+without having to read all of them: multiply counts and sums by `100 / percent`.
+
+`sample` only works with models stored in a single table. PostgreSQL only.
+"""
+
+from numbers import Real
+
+from sqlalchemy import inspect, tablesample, func, literal
+from sqlalchemy.sql.util import ClauseAdapter
+
+from .base import MongoQueryHandlerBase
+from ..exc import InvalidQueryError
+
+
+class MongoSample(MongoQueryHandlerBase):
+    """ MongoSql TABLESAMPLE: use a random part of the table
+
+        Syntax:
+
+            { percent: 1, method: 'system' | 'bernoulli', seed: 42 }
+            { rows: 500, seed: 42 }
+
+        Supported: models that are stored in a single table
+    """
+
+    query_object_section_name = 'sample'
+
+    #: Sampling methods: {name: TABLESAMPLE function}
+    METHODS = {
+        'system': func.system,
+        'bernoulli': func.bernoulli,
+    }
+
+    def __init__(self, model, bags):
+        """ Init a sample
+
+        :param model: Sqlalchemy model to work with
+        :param bags: Model bags
+        """
+        super(MongoSample, self).__init__(model, bags)
+
+        # On input
+        #: The percentage of rows to look at
+        self.percent = None
+        #: The number of rows to look at
+        self.rows = None
+        #: Sampling method: 'system' or 'bernoulli'
+        self.method = None
+        #: Seed for REPEATABLE
+        self.seed = None
+
+    def _get_supported_bags(self):
+        return None  # not used by this class
+
+    def input(self, sample):
+        super(MongoSample, self).input(sample)
+
+        # Validate
+        if not sample:
+            return self
+        if not isinstance(sample, dict):
+            raise InvalidQueryError('Sample: argument must be an object')
+        invalid_keys = set(sample) - {'percent', 'rows', 'method', 'seed'}
+        if invalid_keys:
+            raise InvalidQueryError('Sample: unsupported keys: {}'.format(', '.join(sorted(invalid_keys))))
+
+        percent = sample.get('percent', None)
+        rows = sample.get('rows', None)
+        method = sample.get('method', 'system')
+        seed = sample.get('seed', None)
+
+        if (percent is None) == (rows is None):
+            raise InvalidQueryError('Sample: either `percent` or `rows` must be given')
+        if percent is not None and (not _is_number(percent) or not 0 < percent <= 100):
+            raise InvalidQueryError('Sample: `percent` must be a number between 0 and 100')
+        if rows is not None and (not isinstance(rows, int) or isinstance(rows, bool) or rows < 1):
+            raise InvalidQueryError('Sample: `rows` must be a positive integer')
+        if not isinstance(method, str) or method not in self.METHODS:
+            raise InvalidQueryError('Sample: `method` must be one of: {}'.format(', '.join(sorted(self.METHODS))))
+        if rows is not None and method != 'system':
+            raise InvalidQueryError('Sample: `rows` only supports the "system" method')
+        if seed is not None and not _is_number(seed):
+            raise InvalidQueryError('Sample: `seed` must be a number')
+
+        # Joined inheritance: there's more than one table to sample
+        if len(inspect(self.model).tables) != 1:
+            raise InvalidQueryError('Sample: not supported for model `{}`: it is stored in more than one table'
+                                    .format(self.bags.model_name))
+
+        # Done
+        self.percent = percent
+        self.rows = rows
+        self.method = method
+        self.seed = seed
+        return self
+
+    def is_input_empty(self):
+        return self.percent is None and self.rows is None
+
+    def compile_statement(self):
+        """ Get the sampled table: `table AS table TABLESAMPLE SYSTEM(percent) REPEATABLE(seed)`
+
+            The alias has the same name as the table, so that the clauses that were made with the table
+            still render correctly.
+        """
+        # SYSTEM(percent), BERNOULLI(percent), or SYSTEM_ROWS(rows) from `tsm_system_rows`
+        if self.rows is not None:
+            sampling = func.system_rows(self.rows)
+        else:
+            sampling = self.METHODS[self.method](self.percent)
+
+        # REPEATABLE(seed)
+        seed = literal(self.seed) if self.seed is not None else None
+
+        table = inspect(self.model).local_table
+        return tablesample(self.model, sampling, name=table.name, seed=seed)
+
+    # Not Implemented for this Query Object handler
+    compile_columns = NotImplemented
+    compile_options = NotImplemented
+    compile_statements = NotImplemented
+
+    def alter_query(self, query, as_relation=None):
+        if self.is_input_empty():
+            return query  # short-circuit
+
+        sample = self.compile_statement()
+
+        # Query.select_entity_from() wants a query without any criteria, and would throw away those it has.
+        # But the query may come filtered (see MongoQuery.from_query()): keep the criteria, and point them to the sample.
+        criterion = query.whereclause
+        query = query.enable_assertions(False).select_entity_from(sample).enable_assertions(True)
+        if criterion is not None:
+            query._criterion = ClauseAdapter(sample).traverse(criterion)
+
+        # Done
+        return query
+
+
+def _is_number(value) -> bool:
+    """ Is the value a number, but not a boolean """
+    return isinstance(value, Real) and not isinstance(value, bool)
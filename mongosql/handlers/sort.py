@@ -42,11 +42,25 @@ $.get('/api/user?query=' + JSON.stringify({
     ```
 
 Object syntax is not supported because it does not preserve the ordering of keys.
+
+* Bucketing expressions
+
+    In array syntax, an item can also be a [bucketing expression](mongosql/handlers/bucket.py).
+    It always sorts in ascending order.
+
+    Example:
+
+    ```javascript
+    { sort: [ { $dateTrunc: ['ctime', 'day'] }, 'id-' ] }
+    ```
 """
 
 from collections import OrderedDict
 
+from sqlalchemy.sql.functions import FunctionElement
+
 from .base import MongoQueryHandlerBase
+from .bucket import BucketExpressionBase, is_bucket_expression, parse_bucket_expression
 from ..bag import CombinedBag, FakeBag
 from ..exc import InvalidQueryError, InvalidColumnError, InvalidRelationError
 
@@ -99,9 +113,12 @@ class MongoSort(MongoQueryHandlerBase):
         # List
         if isinstance(spec, (list, tuple)):
             # Strings: convert "column[+-]" into an ordered dict
-            if all(isinstance(v, str) for v in spec):
+            # Objects: bucketing expressions, ascending
+            if all(isinstance(v, str) or is_bucket_expression(v) for v in spec):
                 spec = OrderedDict([
-                    [v[:-1], -1 if v[-1] == '-' else +1]
+                    [self._input_bucket_expression(v), +1]
+                    if isinstance(v, dict)
+                    else [v[:-1], -1 if v[-1] == '-' else +1]
                     if v[-1] in {'+', '-'}
                     else [v, +1]
                     for v in spec
@@ -125,10 +142,35 @@ class MongoSort(MongoQueryHandlerBase):
         if not all(dir in {-1, +1} for field, dir in spec.items()):
             raise InvalidQueryError('{} direction can be either +1 or -1'.format(self.query_object_section_name))
 
-        # Validate columns
-        self.validate_properties(spec.keys())
+        # Validate columns (bucketing expressions are validated when parsed)
+        self.validate_properties([name for name in spec.keys() if isinstance(name, str)])
         return spec
 
+    def _input_bucket_expression(self, expression):
+        """ Parse a bucketing expression: { $dateTrunc: [...] } """
+        return parse_bucket_expression(expression, self._get_bucket_column, self._is_column_json)
+
+    def _get_bucket_column(self, column_name):
+        """ Get a column for a bucketing expression: validate it the way column names are """
+        self.validate_properties([column_name])
+        return self.supported_bags.get(column_name)
+
+    def _is_column_json(self, column_name):
+        return column_name in self.bags.columns and self.bags.columns.is_column_json(column_name)
+
+    def _compile_key(self, name):
+        """ Compile a key: a column name, or a bucketing expression """
+        if isinstance(name, BucketExpressionBase):
+            return name.compile()
+        return self.supported_bags.get(name)
+
+    @staticmethod
+    def _final_key(name, direction=+1):
+        """ Get the input value for a key: a column name, or a bucketing expression """
+        if isinstance(name, BucketExpressionBase):
+            return name.expression
+        return f'{name}{"-" if direction == -1 else ""}'
+
     def input(self, sort_spec):
         super(MongoSort, self).input(sort_spec)
         self.sort_spec = self._input(sort_spec)
@@ -140,9 +182,9 @@ class MongoSort(MongoQueryHandlerBase):
 
     def compile_columns(self):
         return [
-            self.supported_bags.get(name).desc() if d == -1 else self.supported_bags.get(name)
+            self._compile_key(name).desc() if d == -1 else self._compile_key(name)
             for name, d in self.sort_spec.items()
-            if name not in self.supported_bags.bag('legacy')  # remove fake items
+            if isinstance(name, BucketExpressionBase) or name not in self.supported_bags.bag('legacy')  # remove fake items
         ]
 
     # Not Implemented for this Query Object handler
@@ -156,7 +198,7 @@ class MongoSort(MongoQueryHandlerBase):
         return query.order_by(*self.compile_columns())
 
     def get_final_input_value(self):
-        return [f'{name}{"-" if d == -1 else ""}'
+        return [self._final_key(name, d)
                 for name, d in self.sort_spec.items()]
 
     # Extra stuff
@@ -164,8 +206,10 @@ class MongoSort(MongoQueryHandlerBase):
     def undefer_columns_involved_in_sorting(self, as_relation):
         """ undefer() columns required for this sort """
         # Get the names of the columns
+        # Bucketing expressions are not columns
         order_by_column_names = [c.key or c.element.key
-                                 for c in self.compile_columns()]
+                                 for c in self.compile_columns()
+                                 if not isinstance(c, FunctionElement)]
 
         # Return options: undefer() every column
         return (as_relation.undefer(column_name)
@@ -134,7 +134,9 @@ that implement most of this logic for you.
 
 """
 
+import json
 from copy import copy
+from itertools import islice
 
 from sqlalchemy import inspect, exc as sa_exc
 from sqlalchemy.orm import Query, Load, defaultload
@@ -143,9 +145,10 @@ from mongosql import RuntimeQueryError, BaseMongoSqlException
 from .bag import ModelPropertyBags
 from . import handlers
 from .exc import InvalidQueryError
-from .util import MongoQuerySettingsHandler, CountingQuery
+from .util import MongoQuerySettingsHandler, CountingQuery, ConcurrentCountingQuery, stream_json, StreamedBatches
+from .util import CompactRow, compact_rows, columnar
 
-from typing import Union, Mapping, Iterable, Tuple, Any
+from typing import Union, Mapping, Iterable, Iterator, Tuple, Any, List, Callable, Hashable
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from sqlalchemy.orm import RelationshipProperty
@@ -179,6 +182,7 @@ class MongoQuery:
         self._query_options = {
             # See: options()
             'no_limit_offset': False,
+            'columns_only': False,
         }
 
         # Initialized later
@@ -230,7 +234,7 @@ class MongoQuery:
 
         return result
 
-    def options(self, *, no_limit_offset=False):
+    def options(self, *, no_limit_offset=False, columns_only=False):
         """ Set options for this query to alter its behavior
 
         Args:
@@ -239,6 +243,12 @@ class MongoQuery:
                 an unrestricted query with the same settings.
                 Note that this setting only has effect on the immediate query; it does not remove limits/offsets
                 from nested queries (i.e. queries for related objects)
+            columns_only: Select plain columns instead of entities, when no entities are needed.
+                When the projection only contains columns, and no relationships are loaded,
+                the query will select just those columns (see Query.with_entities()),
+                and return lightweight named rows instead of instances: no instances, no identity map.
+                pluck_instance() and pluck_many() give exactly the same results for those rows.
+                Use result_contains_rows() to tell whether the optimization has taken place.
         """
         # Option: no limit offset
         assert isinstance(no_limit_offset, bool)
@@ -246,6 +256,10 @@ class MongoQuery:
         # Can apply immediately
         self.handler_limit.skip_this_handler = no_limit_offset
 
+        # Option: columns only
+        assert isinstance(columns_only, bool)
+        self._query_options['columns_only'] = columns_only
+
         return self
 
     def from_query(self, query: Query) -> 'MongoQuery':
@@ -393,8 +407,15 @@ class MongoQuery:
         # The query
         q = self._from_query()
 
+        # Columns only: select them instead of the entity. The projection has nothing else to do
+        columns_only = self._get_columns_only()
+        if columns_only:
+            q = q.with_entities(*(getattr(self.model, name) for name in columns_only))
+
         # Apply every handler
         for handler_name, handler in self._handlers_ordered_for_end_method():
+            if columns_only and handler is self.handler_project:
+                continue
             if not handler.skip_this_handler:
                 # Apply the handler
                 try:
@@ -414,7 +435,8 @@ class MongoQuery:
 
         return q
 
-    def end_count(self) -> CountingQuery:
+    def end_count(self, concurrent: bool = False, approx: bool = False, max_count: int = None,
+                  cache_scope: Hashable = None) -> CountingQuery:
         """ Get the result, and also count the total number of rows.
 
             Be aware that the cost will be substantially higher than without the total number,
@@ -437,29 +459,186 @@ class MongoQuery:
 
                 # (!) only one actual SQL query was made
                 ```
+
+            On large tables, the window function makes the database go through the entire filtered set
+            before it can return the first row of the page. With `concurrent=True`, the page query is left alone,
+            and the rows are counted with a stripped COUNT query that runs concurrently, on another connection.
+            See [ConcurrentCountingQuery](#concurrentcountingqueryquery-executornone).
+
+            The separate COUNT query can also be approximate, or capped: as with `count: {approx: true, max: N}`.
+            The `count_max` and `count_approx_threshold` settings apply here as well.
+
+            :param concurrent: Count with a separate COUNT query, run concurrently with the page query
+            :param approx: Give the planner's estimate instead of an exact count. Implies `concurrent`
+            :param max_count: Only count up to `max_count + 1` rows: `max_count + 1` means "more than `max_count`".
+                Implies `concurrent`
+            :param cache_scope: With the `count_cache` setting: whatever else your query is filtered by,
+                besides the Query Object (e.g. the current tenant). See CountCache
         """
+        # Settings override the arguments
+        count_max = self.handler_count.count_max
+        if count_max is not None:
+            max_count = min(max_count or count_max, count_max)
+        approx_threshold = self.handler_count.count_approx_threshold
+
+        # Count cache: the same Query Object, the same scope, any page
+        count_cache = self.handler_count.count_cache
+        count_cache_key = None
+        if count_cache is not None:
+            count_cache_key = count_cache.key(self.bags.model_name, self.get_final_query_object(), cache_scope,
+                                              approx=approx, approx_threshold=approx_threshold, max_count=max_count)
+
         # Get the query and wrap it with a counting query
-        return CountingQuery(self.end())
+        if concurrent or approx or max_count is not None or approx_threshold is not None:
+            return ConcurrentCountingQuery(self.end(), approx=approx, approx_threshold=approx_threshold,
+                                           max_count=max_count,
+                                           count_cache=count_cache, count_cache_key=count_cache_key)
+        return CountingQuery(self.end(), count_cache=count_cache, count_cache_key=count_cache_key)
+
+    def end_exists(self) -> Query:
+        """ Get a query that tells whether there are any results at all: `True` or `False`
+
+            This is the same as the `exists` operation, but for your code, rather than for the API user:
+            whatever the Query Object is, you get the answer to the question "is there anything?".
+            Sorting, projection, joins, skip/limit, and count are ignored; filtering is not.
+
+                SELECT EXISTS (SELECT 1 FROM ... WHERE ... LIMIT 1)
+
+            Example:
+
+                ```python
+                has_adults = User.mongoquery(ssn).query(filter={'age': {'$gte': 18}}).end_exists().scalar()
+                ```
+        """
+        # Ignore everything that does not affect whether there are any rows.
+        # Only for this query: restore the flags, so that end() still gives the complete query afterwards
+        handlers = (self.handler_project, self.handler_sort, self.handler_join,
+                    self.handler_limit, self.handler_count, self.handler_exists)
+        skip_flags = [handler.skip_this_handler for handler in handlers]
+        try:
+            for handler in handlers:
+                handler.skip_this_handler = True
+            query = self.end()
+        finally:
+            for handler, skip_this_handler in zip(handlers, skip_flags):
+                handler.skip_this_handler = skip_this_handler
+
+        # EXISTS
+        return self.handler_exists.exists_query(query)
+
+    def end_stream(self, batch_size: int = 1000, expunge: bool = True) -> StreamedBatches:
+        """ Get the results as a stream: for result sets that are too large to be loaded at once.
+
+            Rows are fetched with a server-side cursor, `batch_size` rows at a time (see Query.yield_per()).
+            Relationships loaded with separate queries (selectinload(), selectinquery(), etc) are loaded per batch:
+            with selectinquery(), every batch gets exactly one query, with all the filtering, projection,
+            and per-parent limits of the nested Query Object. No N+1 problem, and no growing memory.
+            Once a batch is consumed, its instances are expunged from the Session, together with their related
+            instances: memory stays flat regardless of the size of the result set.
+
+            Example:
+
+                ```python
+                for user in User.mongoquery(ssn).query(...).end_stream(500):
+                    writer.writerow(...)
+                ```
+
+            NOTE: expunged instances are detached: treat them as read-only,
+            and don't keep references to them past their batch if you don't need to.
+            Aggregates of their joined relationships are forgotten as well:
+            pluck every batch before you ask for the next one. Use `.batches()` to get the rows batch by batch;
+            stream_json() does it for you.
+
+            NOTE: x-to-many relationships can't be loaded with a JOIN ('joined' strategy, or 'joinf'):
+            their rows would span several batches. Use the 'selectin' strategy.
+
+            :param batch_size: The number of rows to fetch at once
+            :param expunge: Expunge every batch from the Session once it is consumed
+            :raises InvalidQueryError: The Query Object joins an x-to-many relationship
+        """
+        # Collections loaded with a JOIN are incompatible with yield_per()
+        joined_collections = [
+            *self.handler_join.get_collections_joined_into_query(),
+            *self.handler_joinf.get_collections_joined_into_query(),
+        ]
+        if joined_collections:
+            raise InvalidQueryError('Cannot stream results with x-to-many relationships loaded with a JOIN: {}. '
+                                    'Use the \'selectin\' join strategy.'
+                                    .format(', '.join(joined_collections)))
+
+        # The query
+        # Related entities: one query per batch
+        self.handler_join.stream_batch_size = batch_size
+        query = self.end().yield_per(batch_size)
+
+        # Only entities are kept in the Session
+        return StreamedBatches(_stream_batches(
+            query, batch_size,
+            expunge=expunge and self.result_contains_entities() and not self.result_contains_rows(),
+            on_batch_consumed=self._forget_streamed_batch))
+
+    def _forget_streamed_batch(self):
+        """ Forget everything that was collected for the batch of entities that has just been streamed """
+        self.handler_join.forget_related_results()
+        self.handler_joinf.forget_related_results()
 
     # Extra features
 
     def result_contains_entities(self) -> bool:
         """ Test whether the result will contain entities.
 
-        This is normally the case in the absence of 'aggregate', 'group', and 'count' queries.
+        This is normally the case in the absence of 'aggregate', 'group', 'count', 'exists', and 'facets' queries.
+        With options(columns_only=True), entities may come as lightweight named rows: see result_contains_rows().
         """
         return self.handler_aggregate.is_input_empty() and \
                self.handler_group.is_input_empty() and \
-               self.handler_count.is_input_empty()
+               self.handler_count.is_input_empty() and \
+               self.handler_exists.is_input_empty() and \
+               self.handler_facets.is_input_empty()
+
+    def result_contains_rows(self) -> bool:
+        """ Test whether the result will contain lightweight named rows instead of entities
+
+        This is the case when options(columns_only=True) is used, and the Query Object allows it:
+        see MongoQuery.options(). Such rows have the same attributes as the entities would (e.g. `row.id`),
+        and pluck_instance()/pluck_many() handle them just like entities.
+        """
+        return self._get_columns_only() is not None
+
+    def _get_columns_only(self) -> Union[Tuple[str], None]:
+        """ Get the names of columns to select instead of entities, or None if entities are needed """
+        if not self._query_options['columns_only'] \
+                or not self.result_contains_entities() \
+                or self.handler_join.mjps or self.handler_joinf.mjps:
+            return None
+        return self.handler_project.get_columns_only()
 
     def result_is_scalar(self) -> bool:
-        """ Test whether the result is a scalar value, like with count
+        """ Test whether the result is a scalar value, like with count or exists
 
             In this case, you'll fetch it like this:
 
                 MongoQuery(...).end().scalar()
+
+            NOTE: for a count, end() always gives a Query that counts the rows: exactly, or capped.
+            `count: {approx: true}` and the `count_approx_threshold` setting are ignored by it.
+            Use collect_count() to honor them:
+
+                mq = MongoQuery(...)
+                mq.collect_count(mq.end())
+        """
+        return not self.handler_count.is_input_empty() or \
+               not self.handler_exists.is_input_empty()
+
+    def result_is_facets(self) -> bool:
+        """ Test whether the result is a set of facet counts
+
+            In this case, you'll fetch it like this:
+
+                mq = MongoQuery(...)
+                mq.collect_facets(mq.end())
         """
-        return not self.handler_count.is_input_empty()
+        return not self.handler_facets.is_input_empty()
 
     def result_is_tuples(self) -> bool:
         """ Test whether the result is a list of keyed tuples, like with group_by
@@ -468,10 +647,95 @@ class MongoQuery:
 
                 res = MongoQuery(...).end()
                 return [dict(zip(row.keys(), row)) for row in res], None
+
+            or, without a dict for every row, with compact_rows() or columnar().
         """
         return not self.handler_aggregate.is_input_empty() or \
                not self.handler_group.is_input_empty()
 
+    def get_tuple_keys(self) -> Tuple[str]:
+        """ Get the key schema of tuple results: the names of values in every row, in order
+
+            It is computed from the Query Object once, and is shared by all rows.
+            With subtotals (e.g. `group: {rollup: [...]}`), the grouping indicator comes last.
+
+            Example:
+
+                MongoQuery(User).query(aggregate={'n': {'$sum': 1}, 'age': 'age'}, group=['age']).get_tuple_keys()
+                #-> ('n', 'age')
+        """
+        return (*self.handler_aggregate.projection, *self.handler_group.projection)
+
+    def compact_rows(self, rows: Iterable[Tuple]) -> Iterator[CompactRow]:
+        """ Make tuple results into compact read-only mappings that share one key schema
+
+            This is a lighter alternative to `dict(zip(row.keys(), row))` for every row:
+            CompactRow keeps a reference to the row, and its keys live on a class shared by all rows.
+            It supports `row['n']`, `dict(row)`, and `__json__()`.
+
+            Example:
+
+                ```python
+                mq = User.mongoquery(ssn).query(aggregate={'n': {'$sum': 1}, 'age': 'age'}, group=['age'])
+                rows = list(mq.compact_rows(mq.end()))
+                rows[0]['n']  #-> 10
+                ```
+
+            :param rows: Tuple results of this query: see result_is_tuples()
+        """
+        return compact_rows(rows, self.get_tuple_keys())
+
+    def columnar(self, rows: Iterable[Tuple]) -> Mapping[str, list]:
+        """ Make tuple results into columns: a list of values for every key
+
+            This is the format that charts want: one series per key.
+
+            Example:
+
+                ```python
+                mq = User.mongoquery(ssn).query(aggregate={'n': {'$sum': 1}, 'age': 'age'}, group=['age'])
+                mq.columnar(mq.end())
+                #-> {'n': [10, 20, 5], 'age': [18, 19, 20]}
+                ```
+
+            :param rows: Tuple results of this query: see result_is_tuples()
+        """
+        return columnar(rows, self.get_tuple_keys())
+
+    def collect_count(self, query: Query) -> int:
+        """ Get the result of a 'count' query: the number of rows, or the planner's estimate
+
+            end() always gives a Query that counts the rows: exactly, or up to `max + 1`, as in `count: {max: N}`.
+            With `count: {approx: true}`, or the `count_approx_threshold` setting, use this method:
+            it gives the planner's estimate instead of running that query.
+
+            Example:
+
+                ```python
+                mq = User.mongoquery(ssn).query(count={'approx': True})
+                mq.collect_count(mq.end())
+                #-> 1200000, approximately
+                ```
+
+            :param query: The query that end() has given: see result_is_scalar()
+        """
+        return self.handler_count.collect(query)
+
+    def collect_facets(self, rows: Iterable[Tuple]) -> Mapping[str, Union[int, list]]:
+        """ Collect the results of a 'facets' query: a count for every facet
+
+            Example:
+
+                ```python
+                mq = User.mongoquery(ssn).query(facets={'adults': {'age': {'$gte': 18}}, 'by_age': 'age'})
+                mq.collect_facets(mq.end())
+                #-> {'adults': 2, 'by_age': [{'value': 18, 'count': 2}, {'value': 16, 'count': 1}]}
+                ```
+
+            :param rows: Results of this query: see result_is_facets()
+        """
+        return self.handler_facets.collect(rows)
+
     def ensure_loaded(self, *cols: Iterable[str]) -> 'MongoQuery':
         """ Ensure the given columns, relationships, and related columns are loaded
 
@@ -595,7 +859,8 @@ class MongoQuery:
             :param instance: object
             :rtype: dict
         """
-        if not isinstance(instance, self.bags.model):  # bags.model, because self.model may be aliased
+        if not isinstance(instance, self.bags.model) and \
+                not (isinstance(instance, tuple) and self.result_contains_rows()):  # bags.model, because self.model may be aliased
             raise ValueError('This MongoQuery.pluck_instance() expects {}, but {} was given'
                              .format(self.bags.model, type(instance)))
         # First, projection will do what it wants.
@@ -608,6 +873,109 @@ class MongoQuery:
         # Done.
         return dct
 
+    def pluck_many(self, instances: Iterable[object]) -> List[dict]:
+        """ Pluck a whole result set: pluck_instance() for every instance, but faster
+
+            The projection is compiled once and is applied to every instance;
+            relationships are plucked with pluck_many() on the nested MongoQuery, one list at a time.
+
+            Example:
+
+                ```python
+                mq = User.mongoquery(ssn).query(...)
+                users = mq.pluck_many(mq.end())
+                ```
+
+            :param instances: sqlalchemy instances
+            :rtype: list[dict]
+        """
+        model = tuple if self.result_contains_rows() else self.bags.model
+        keys, getter = self.handler_project.pluck_plan
+        pluck_join = self.handler_join.pluck_instance if self.handler_join.mjps else None
+        pluck_joinf = self.handler_joinf.pluck_instance if self.handler_joinf.mjps else None
+
+        ret = []
+        for instance in instances:
+            if not isinstance(instance, model):
+                raise ValueError('This MongoQuery.pluck_many() expects {}, but {} was given'
+                                 .format(model, type(instance)))
+
+            # Same as pluck_instance(), but without the overhead
+            dct = dict(zip(keys, getter(instance)))
+            if pluck_join is not None:
+                dct.update(pluck_join(instance))
+            if pluck_joinf is not None:
+                dct.update(pluck_joinf(instance))
+            ret.append(dct)
+        return ret
+
+    def stream_json(self, key: str, query: Union[Query, CountingQuery] = None, **kwargs) -> Iterator[bytes]:
+        """ Execute the query and stream the results as JSON: an iterator of encoded chunks
+
+            The result set is never kept in memory as a whole: not as dicts, not as JSON.
+            Every row is plucked with the compiled projection (see pluck_many()), encoded,
+            and sent out in chunks with a bounded buffer.
+
+            Example:
+
+                ```python
+                mq = User.mongoquery(ssn).query(...)
+                return flask.Response(mq.stream_json('users', mq.end_count()), mimetype='application/json')
+                # -> {"count": 127, "users": [{...}, {...}, ...]}
+                ```
+
+            Results of 'aggregate' and 'group' are streamed as dicts; results of 'count' as a single number.
+
+            JSON columns listed in the `raw_json_columns` setting are never decoded: their text is spliced
+            into the output as it is.
+
+            :param key: The key to put the list of results into
+            :param query: The query to execute: end(), or end_count() if you want the `count` in the output.
+                Default: end()
+            :param kwargs: More arguments for mongosql.util.stream_json.stream_json():
+                encoder, buffer_size, batch_size, raw_json
+        """
+        if query is None:
+            query = self.end()
+
+        # Exists: true or false
+        if not self.handler_exists.is_input_empty():
+            return iter([json.dumps({key: query.scalar()}).encode('utf-8')])
+
+        # Count: just a number
+        if self.result_is_scalar():
+            return iter([json.dumps({key: self.collect_count(query)}).encode('utf-8')])
+
+        # Facets: a single object
+        if self.result_is_facets():
+            return iter([json.dumps({key: self.collect_facets(query)}).encode('utf-8')])
+
+        # Group, aggregate: tuples
+        if self.result_is_tuples():
+            # The key schema is shared by all rows
+            names = self.get_tuple_keys()
+            pluck_many = lambda rows: [dict(zip(names, row)) for row in rows]
+        # Entities
+        else:
+            pluck_many = self.pluck_many
+
+            # JSON columns passed through as text
+            kwargs.setdefault('raw_json', self._has_raw_json_columns())
+
+            # Instances with RawJSON values must not stay in the Session: other code would get RawJSON too
+            if kwargs['raw_json']:
+                pluck_many = _pluck_and_expunge(pluck_many, self._from_query().session)
+
+        return stream_json(query, pluck_many, key, **kwargs)
+
+    def _has_raw_json_columns(self) -> bool:
+        """ Test whether this query, or any of the nested ones, loads columns as RawJSON (see `raw_json_columns`) """
+        return bool(self.handler_project.get_raw_json_columns()) or any(
+            mjp.nested_mongoquery._has_raw_json_columns()
+            for handler in (self.handler_join, self.handler_joinf)
+            for mjp in handler.mjps
+        )
+
     def __contains__(self, key: str) -> bool:
         """ Test if a property is going to be loaded by this query """
         return key in self.handler_project or key in self.handler_join
@@ -628,8 +996,12 @@ class MongoQuery:
     _QO_HANDLER_JOINF = handlers.MongoFilteringJoin
     _QO_HANDLER_FILTER = handlers.MongoFilter
     _QO_HANDLER_AGGREGATE = handlers.MongoAggregate  # Use MongoAggregateInsecure for backwards compatibility
+    _QO_HANDLER_HAVING = handlers.MongoHaving
     _QO_HANDLER_LIMIT = handlers.MongoLimit
     _QO_HANDLER_COUNT = handlers.MongoCount
+    _QO_HANDLER_EXISTS = handlers.MongoExists
+    _QO_HANDLER_FACETS = handlers.MongoFacets
+    _QO_HANDLER_SAMPLE = handlers.MongoSample
 
     HANDLER_NAMES = frozenset(('project',
                                'sort',
@@ -638,8 +1010,12 @@ class MongoQuery:
                                'joinf',
                                'filter',
                                'aggregate',
+                               'having',
                                'limit',
-                               'count'))
+                               'count',
+                               'exists',
+                               'facets',
+                               'sample'))
     HANDLER_ATTR_NAMES = frozenset('handler_'+name
                                    for name in HANDLER_NAMES)
 
@@ -655,6 +1031,8 @@ class MongoQuery:
             #    NOTE: this is the only handler that has preferences for its input() method.
             #          Because other handlers do not care, and this one does, the best way to bring it down
             #          to the bottom is to use reversed(self._handlers()).
+            # 2. 'having' before 'aggregate'
+            #    Because 'having' refers to the labels that MongoAggregate gets with its input()
             #
             # Considerations for the alter_query() method:
             # 1. 'limit' after 'order_by':
@@ -662,7 +1040,7 @@ class MongoQuery:
             # 2. 'join' after 'filter' and 'limit'
             #    Because 'join' handler may make it into a subquery,
             #    and at that point is has to have all filters and limits applied
-            # 3. 'aggregate' before 'sort', 'group', 'filter'
+            # 3. 'aggregate' and 'facets' before 'sort', 'group', 'filter'
             #    Because aggregate handler uses Query.select_from(), which can only be applied to a query
             #    without any clauses like WHERE, ORDER BY, GROUP BY
             # 4. 'sort' before 'join'
@@ -671,16 +1049,26 @@ class MongoQuery:
             #    Because it will wrap everything into a subquery, which has a different name.
             #    However, 'join' and 'joinf' somehow manage to handle the situation, so the requirement is restated:
             #    "after everything", but can be before "join".
+            # 6. 'having' before 'limit'
+            #    Because Query.having() does not like limits. Query.with_entities() and Query.select_from()
+            #    keep the HAVING clause, so it can go before 'aggregate'.
+            # 7. 'sample' after 'aggregate' and 'facets', but before everything else
+            #    Because it replaces the FROM clause, which Query.select_from() would not allow,
+            #    and clauses added after it are adapted to the sample automatically.
             # *. There may be others that the author is not aware of... yet.
             ('project', self.handler_project),
+            ('having', self.handler_having),
             ('aggregate', self.handler_aggregate),
+            ('facets', self.handler_facets),
+            ('sample', self.handler_sample),
             ('sort', self.handler_sort),
             ('group', self.handler_group),
             ('filter', self.handler_filter),
             ('limit', self.handler_limit),
             ('join', self.handler_join),
             ('joinf', self.handler_joinf),
-            ('count', self.handler_count)
+            ('count', self.handler_count),
+            ('exists', self.handler_exists),
         )
 
     def _handlers_ordered_for_query_method(self):
@@ -700,8 +1088,12 @@ class MongoQuery:
     handler_joinf = None  # type: handlers.MongoJoinf
     handler_filter = None  # type: handlers.MongoFilter
     handler_aggregate = None  # type: handlers.MongoAggregate
+    handler_having = None  # type: handlers.MongoHaving
     handler_limit = None  # type: handlers.MongoLimit
     handler_count = None  # type: handlers.MongoCount
+    handler_exists = None  # type: handlers.MongoExists
+    handler_facets = None  # type: handlers.MongoFacets
+    handler_sample = None  # type: handlers.MongoSample
 
     def _init_query_object_handlers(self):
         """ Initialize every Query Object handler """
@@ -835,3 +1227,59 @@ class MongoQuery:
         self.handler_settings.raise_if_not_handler_enabled(self.bags.model_name, handler_name)
 
     # endregion
+
+
+def _stream_batches(query: Query, batch_size: int, expunge: bool, on_batch_consumed: Callable = None) -> Iterator[list]:
+    """ Iterate a yield_per() query batch by batch, and expunge every batch from the Session once it's consumed
+
+        Not just the instances are expunged, but everything that has been loaded with them: related instances.
+        Instances that were in the Session before are left alone.
+
+        A batch is consumed when the next one is requested.
+
+        :param on_batch_consumed: A callable() to invoke once a batch is consumed
+    """
+    ssn = query.session
+    rows = iter(query)
+    known_keys = set(ssn.identity_map.keys()) if expunge else None
+
+    while True:
+        # Results, batch by batch
+        # With yield_per(), a batch is loaded as a whole: together with relationships loaded by separate queries
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        yield batch
+
+        # The batch is consumed: forget about it
+        if expunge:
+            _expunge_new_instances(ssn, known_keys)
+
+        if on_batch_consumed is not None:
+            on_batch_consumed()
+
+
+def _pluck_and_expunge(pluck_many: Callable, ssn: Session) -> Callable:
+    """ Wrap pluck_many(): once a batch is plucked, expunge all instances it has brought into the Session
+
+        Instances that were in the Session before are left alone.
+    """
+    if ssn is None:
+        return pluck_many
+
+    known_keys = set(ssn.identity_map.keys())
+
+    def pluck_and_expunge(instances):
+        ret = pluck_many(instances)
+        _expunge_new_instances(ssn, known_keys)
+        return ret
+    return pluck_and_expunge
+
+
+def _expunge_new_instances(ssn: Session, known_keys: set):
+    """ Expunge all instances from the Session, except for those with `known_keys` """
+    loaded = [ssn.identity_map.get(key) for key in set(ssn.identity_map.keys()) - known_keys]
+    for instance in loaded:
+        # An instance may have already been expunged by a cascade
+        if instance is not None and instance in ssn:
+            ssn.expunge(instance)
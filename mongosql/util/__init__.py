@@ -1,5 +1,14 @@
-from .selectinquery import selectinquery
-from .counting_query_wrapper import CountingQuery
+from .selectinquery import selectinquery, get_related_total
+from .recursivequery import recursivequery
+from .aggregatequery import aggregatequery
+from .rawjson import rawjsonload, RawJSON
+from .selectinload_col import selectinload_col
+from .partialload import partialload
+from .counting_query_wrapper import CountingQuery, ConcurrentCountingQuery
+from .count_estimate import EstimatedCountQuery, estimate_rows
+from .count_cache import CountCache
+from .stream_json import stream_json, StreamJSONEncoder, StreamedBatches
+from .rows import CompactRow, compact_rows, columnar
 from .reusable import Reusable
 from .mongoquery_settings_handler import MongoQuerySettingsHandler
 from .marker import Marker
@@ -0,0 +1,160 @@
+from sqlalchemy import log, sql, tuple_
+from sqlalchemy.orm import properties, loading, aliased
+from sqlalchemy.orm import util as orm_util
+from sqlalchemy.orm.strategies import AbstractRelationshipLoader
+from sqlalchemy.orm.strategy_options import loader_option, _UnboundLoad
+
+
+@log.class_logger
+@properties.RelationshipProperty.strategy_for(lazy="aggregate_query")
+class AggregateQueryLoader(AbstractRelationshipLoader):
+    """ A loader that does not load related entities, but computes aggregates over them, per parent entity.
+
+    Where selectinload() loads related entities, this loader runs an aggregate query over them
+    (think: COUNT(*), AVG(rating), GROUP BY theme) for every primary entity, with one query
+    for all of them. The relationship itself is not populated: the results are given to `results`,
+    a dict { parent identity: [ row dicts ] }.
+
+    Example usage:
+
+        results = {}
+        ssn.query(User).options(
+            aggregatequery(User.articles,
+                           lambda q: q.with_entities(func.count().label('n')),
+                           results)
+        )
+
+    The query it makes:
+
+        SELECT u_1.id, aggregated.n
+        FROM users AS u_1
+            JOIN LATERAL (
+                SELECT count(*) AS n
+                FROM articles
+                WHERE articles.uid = u_1.id
+            ) AS aggregated ON true
+        WHERE u_1.id IN (...primary keys...)
+
+    Because it's a LATERAL subquery, everything in it works per parent entity:
+    aggregates without GROUP BY always give exactly one row (even COUNT(*)=0 for entities with no related rows),
+    and LIMIT limits the number of groups per parent entity.
+
+    Only supports relationships without `secondary`.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, parent, strategy_key):
+        super(AggregateQueryLoader, self).__init__(parent, strategy_key)
+
+        # Only simple relationships are supported
+        assert self.parent_property.secondary is None, 'aggregatequery() does not support `secondary` relationships'
+
+    def init_class_attribute(self, mapper):
+        # Same as SelectInLoader: let the default lazy loader instrument the attribute
+        self.parent_property._get_strategy(
+            (("lazy", "select"),)
+        ).init_class_attribute(mapper)
+
+    def create_row_processor(self, context, path, loadopt, mapper, result, adapter, populators):
+        # Copied from SelectInLoader.create_row_processor(), simplified
+        if not orm_util._entity_isa(path[-1], self.parent):
+            return
+
+        aggregate_path = (context.query._current_path or orm_util.PathRegistry.root) + path
+        if loading.PostLoad.path_exists(context, aggregate_path, self.parent_property):
+            return
+
+        # Register a post-load callable that will run the aggregate query once all primary entities are here.
+        # The relationship attribute is left alone: no populators.
+        loading.PostLoad.callable_for_path(
+            context,
+            aggregate_path,
+            self.parent,
+            self.parent_property,
+            self._load_for_path,
+            loadopt.local_opts['alter_query'],
+            loadopt.local_opts['results'],
+        )
+
+    def _load_for_path(self, context, path, states, load_only, alter_query, results):
+        if load_only and self.key not in load_only:
+            return
+
+        # Identities of the primary entities
+        identities = {state.identity for state, overwrite in states if state.key is not None}
+
+        # Every primary entity gets a result, even when there are no rows for it
+        for identity in identities:
+            results[identity] = []
+
+        # Run the aggregate query
+        if identities:
+            for identity, row in self._load_aggregated(context.session, identities, alter_query):
+                results[identity].append(row)
+
+    def _load_aggregated(self, session, identities, alter_query):
+        """ Run the aggregate query with a LATERAL subquery
+
+            :return: Iterable[(identity, row dict)]
+        """
+        # The parent is aliased: the relationship might be self-referential
+        parent_alias = aliased(self.parent)
+
+        def parent_column(column):
+            return getattr(parent_alias, self.parent.get_property_by_column(column).key)
+
+        # The nested query: related entities, correlated to the parent
+        q = session.query(self.mapper).filter(sql.and_(*[
+            remote == parent_column(local)
+            for local, remote in self.parent_property.local_remote_pairs
+        ]))
+        aggregated = alter_query(q).statement.lateral('aggregated')
+
+        # The final query: parent primary key + aggregated values
+        pk = [parent_column(column) for column in self.parent.primary_key]
+        q = session.query(*pk, aggregated) \
+            .select_from(parent_alias) \
+            .join(aggregated, sql.true()) \
+            .filter(pk[0].in_([identity[0] for identity in sorted(identities)])
+                    if len(pk) == 1 else
+                    tuple_(*pk).in_(sorted(identities)))
+
+        # Results
+        labels = [column.key for column in aggregated.c]
+        for row in q:
+            yield tuple(row[:len(pk)]), dict(zip(labels, row[len(pk):]))
+
+
+# Register the loader option
+
+@loader_option()
+def aggregatequery(loadopt, relationship, alter_query, results):
+    """Indicate that the given relationship should not be loaded, but aggregated:
+    with one query that computes aggregates over related entities, per primary entity.
+
+    Args
+    ----
+
+    alter_query: Callable
+        A callable(query) that turns the query into an aggregate one: with_entities(), group_by(), etc
+    results: dict
+        A dict to store the results to: { parent identity: [ row dicts ] }
+    """
+    loadopt = loadopt.set_relationship_strategy(relationship, {"lazy": "aggregate_query"})
+
+    # Pass the options through `local_opts`: see selectinquery()
+    loadopt.local_opts['alter_query'] = alter_query
+    loadopt.local_opts['results'] = results
+
+    # Done
+    return loadopt
+
+
+@aggregatequery._add_unbound_fn
+def aggregatequery(relationship, alter_query, results):
+    return _UnboundLoad.aggregatequery(_UnboundLoad(), relationship, alter_query, results)
+
+
+# The exported loader option
+aggregatequery = aggregatequery._unbound_fn
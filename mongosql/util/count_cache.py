@@ -0,0 +1,152 @@
+import json
+import time
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_mapper
+from sqlalchemy.sql.util import find_tables
+
+from typing import Any, Hashable, Iterable, Mapping, Union, Set
+
+
+class CountCache:
+    """ A cache for total counts, shared across pages
+
+        When the user pages through results with end_count(), every page recomputes the same total,
+        even though only `skip` and `limit` have changed. This cache remembers the total for a while,
+        so that next pages only have to run the page query.
+
+        Entries are keyed by the Query Object without the keys that do not affect the count
+        (`skip`, `limit`, `sort`, `project`, `join`), and by a `scope` that you provide.
+
+        NOTE: the Query Object is all the cache knows about your query.
+        If your code filters the query by anything else (e.g. the current tenant, or user permissions),
+        put that into the `scope`: otherwise, users would see each other's counts!
+
+        Entries expire after `ttl` seconds, and are invalidated when any of their tables are flushed to
+        (see listen()). Bulk updates and deletes, as well as changes made by other processes, are not seen:
+        the `ttl` is what limits the staleness of counts.
+
+        Example:
+
+            ```python
+            count_cache = CountCache(ttl=60)
+            count_cache.listen(Session)  # invalidate on flush
+
+            mq = MongoQuery(User, MongoQuerySettingsDict(count_cache=count_cache))
+            q = mq.with_session(ssn).query(...).end_count(cache_scope=current_tenant.id)
+            ```
+    """
+
+    #: Query Object keys that do not affect the count
+    IGNORED_QUERY_OBJECT_KEYS = frozenset(('skip', 'limit', 'sort', 'project', 'join'))
+
+    def __init__(self, ttl: float = 60, maxsize: int = 10000):
+        """
+        :param ttl: The number of seconds to keep every count for
+        :param maxsize: The maximum number of counts to keep. When full, the oldest ones are evicted.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        #: key -> (expires, count, tables)
+        self._counts = {}
+        #: table name -> set of keys
+        self._keys_by_table = {}
+        self._lock = Lock()
+
+    def key(self, model_name: str, query_object: Mapping, scope: Hashable = None, **extra) -> str:
+        """ Make a key for the count of a Query Object
+
+            :param model_name: The name of the model that is queried
+            :param query_object: The Query Object; keys that do not affect the count are ignored
+            :param scope: The scope: whatever else your query is filtered by
+            :param extra: More values that affect the count (e.g. `max_count` of a capped count)
+        """
+        return json.dumps([
+            model_name,
+            {k: v for k, v in query_object.items() if k not in self.IGNORED_QUERY_OBJECT_KEYS},
+            scope,
+            extra,
+        ], sort_keys=True, default=repr)
+
+    def get(self, key: str) -> Union[int, None]:
+        """ Get a count, if it's cached and not expired """
+        entry = self._counts.get(key)
+        if entry is None:
+            return None
+
+        expires, count, tables = entry
+        if expires < time.monotonic():
+            return None
+        return count
+
+    def set(self, key: str, count: int, tables: Iterable[str]):
+        """ Store a count
+
+            :param key: The key; see key()
+            :param count: The count
+            :param tables: Names of the tables that the count depends upon: flushing to them invalidates it
+        """
+        tables = frozenset(tables)
+        with self._lock:
+            # Evict the oldest ones
+            while len(self._counts) >= self.maxsize:
+                self._forget(next(iter(self._counts)))
+
+            # Store
+            self._forget(key)
+            self._counts[key] = (time.monotonic() + self.ttl, count, tables)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+
+    def invalidate_tables(self, tables: Iterable[str]):
+        """ Forget all counts that depend on the given tables
+
+            Use it when the tables are modified in a way that listen() can't see: e.g. with bulk updates.
+        """
+        with self._lock:
+            for table in tables:
+                for key in self._keys_by_table.pop(table, ()):
+                    self._forget(key)
+
+    def clear(self):
+        """ Forget all counts """
+        with self._lock:
+            self._counts.clear()
+            self._keys_by_table.clear()
+
+    def listen(self, target: Any):
+        """ Invalidate counts whenever a Session flushes changes to their tables
+
+            :param target: A Session, a sessionmaker, or a Session class: see sqlalchemy.event.listen()
+        """
+        event.listen(target, 'after_flush', self._after_flush)
+
+    def _after_flush(self, session, flush_context):
+        # NOTE: in after_flush, `new`, `dirty`, and `deleted` still have their pre-flush state
+        self.invalidate_tables(_get_table_names_for_instances(
+            *session.new, *session.dirty, *session.deleted
+        ))
+
+    def _forget(self, key: str):
+        entry = self._counts.pop(key, None)
+        if entry is not None:
+            for table in entry[2]:
+                keys = self._keys_by_table.get(table)
+                if keys is not None:
+                    keys.discard(key)
+
+
+def get_statement_table_names(statement) -> Set[str]:
+    """ Get the names of all tables that a statement selects from: including joins and subqueries """
+    return {table.name
+            for table in find_tables(statement)
+            if hasattr(table, 'name')}
+
+
+def _get_table_names_for_instances(*instances) -> Set[str]:
+    """ Get the names of all tables that the instances are stored in """
+    return {table.name
+            for mapper in {object_mapper(instance) for instance in instances}
+            for table in mapper.tables}
@@ -0,0 +1,87 @@
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.expression import Executable, ClauseElement
+
+from typing import Union
+from sqlalchemy.engine import Connectable
+
+
+class explain(Executable, ClauseElement):
+    """ EXPLAIN (FORMAT JSON) for a statement
+
+        PostgreSQL only. The result is a single JSON document with the plan.
+    """
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, 'postgresql')
+def _compile_explain_postgresql(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+def estimate_rows(connectable: Union[Session, Connectable], statement) -> int:
+    """ Get the planner's estimate of the number of rows the statement would return
+
+        The planner takes `pg_class.reltuples` for every table, and scales it by the selectivity of the filters,
+        joins, and groupings. It never looks at the rows themselves: this is cheap regardless of the size of the table,
+        but it is only as good as the table statistics (see ANALYZE).
+
+        :param connectable: A Session, an Engine, or a Connection to EXPLAIN the statement with
+        :param statement: The statement (e.g. Query.statement)
+    """
+    plan = connectable.execute(explain(statement)).scalar()
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountQuery:
+    """ A count query that gives the planner's estimate instead of counting the rows
+
+        This is what MongoCount uses for `count: {approx: true}` (see MongoQuery.collect_count()):
+
+            ```python
+            q = EstimatedCountQuery(ssn.query(User).filter(...))
+            q.scalar()  # -> 1200000, approximately
+            ```
+
+        With `threshold`, it only trusts the estimate when it's large: small counts are made exact with `exact_query`.
+    """
+    __slots__ = ('_query', '_exact_query', '_threshold', '_max_count')
+
+    def __init__(self, query: Query, exact_query: Query = None, threshold: int = None, max_count: int = None):
+        """
+        :param query: The query whose rows are to be estimated
+        :param exact_query: The query that counts the rows exactly: used when the estimate is below `threshold`
+        :param threshold: The estimate is only used when it's at least this large. `None`: always use the estimate
+        :param max_count: Cap the result at `max_count + 1`: the result of a capped count; "more than `max_count`"
+        """
+        assert threshold is None or exact_query is not None
+        self._query = query
+        self._exact_query = exact_query
+        self._threshold = threshold
+        self._max_count = max_count
+
+    def with_session(self, ssn: Session):
+        """ Return a `Query` that will use the given `Session`. """
+        self._query = self._query.with_session(ssn)
+        if self._exact_query is not None:
+            self._exact_query = self._exact_query.with_session(ssn)
+        return self
+
+    def scalar(self) -> int:
+        """ Get the count """
+        count = estimate_rows(self._query.session, self._query.statement)
+
+        # Small counts are made exact
+        if self._threshold is not None and count < self._threshold:
+            return self._exact_query.scalar()
+
+        # Cap
+        if self._max_count is not None:
+            count = min(count, self._max_count + 1)
+        return count
+
+    def __iter__(self):
+        """ Get the result row, like a count query would give """
+        return iter([(self.scalar(),)])
@@ -1,7 +1,13 @@
 import itertools
+from concurrent.futures import Executor, ThreadPoolExecutor
 
-from sqlalchemy import func
+from sqlalchemy import func, select, text, literal_column
+from sqlalchemy.engine import Engine, Connection
 from sqlalchemy.orm import Query, Session
+from sqlalchemy.util import lightweight_named_tuple
+
+from .count_estimate import estimate_rows
+from .count_cache import CountCache, get_statement_table_names
 
 
 class CountingQuery:
@@ -27,15 +33,29 @@ class CountingQuery:
 
             # (!) only one SQL query was made
             ```
+
+        With a CountCache, the count is only made when it's not in the cache.
+        Otherwise, only the page query is executed: without the window function.
     """
     __slots__ = ('_query', '_original_query',
                  '_count', '_query_iterator',
-                 '_single_entity', '_row_fixer')
+                 '_single_entity', '_row_fixer',
+                 '_count_cache', '_count_cache_key')
 
-    def __init__(self, query: Query):
+    def __init__(self, query: Query, count_cache: CountCache = None, count_cache_key: str = None):
+        """
+        :param query: The query to execute and count
+        :param count_cache: The cache to take the count from, and to put it to
+        :param count_cache_key: The key for the count in `count_cache`: see CountCache.key()
+        """
         # The original query. We store it just in case.
         self._original_query = query
 
+        # The count cache
+        assert count_cache is None or count_cache_key is not None
+        self._count_cache = count_cache
+        self._count_cache_key = count_cache_key
+
         # The current query
         # It differs from the originla query in that it is modified with a window function counting the rows
         self._query = query
@@ -88,6 +108,25 @@ class CountingQuery:
     # region Counting logic
 
     def _get_query_count(self):
+        """ Execute the query and get the count: from the cache, if possible """
+        # Cached: only the page is queried
+        if self._count_cache is not None:
+            self._count = self._count_cache.get(self._count_cache_key)
+            if self._count is not None:
+                self._query_iterator = iter(self._query)
+                return
+
+        # Count
+        self._count_rows()
+
+        # Cache it
+        if self._count_cache is not None:
+            self._count_cache.set(self._count_cache_key, self._count,
+                                  get_statement_table_names(self._original_query.statement))
+
+    _query_execute = _get_query_count  # makes more sense when called this way in the context of __iter__ method
+
+    def _count_rows(self):
         """ Retrieve the first row and get the count.
             If that fails due to an OFFSET being present in the query, make an additional, COUNT query.
         """
@@ -136,8 +175,6 @@ class CountingQuery:
             )
         )
 
-    _query_execute = _get_query_count  # makes more sense when called this way in the context of __iter__ method
-
     def _get_query_count__make_another_query(self) -> int:
         """ Make an additional query to count the number of rows """
         # Build the query
@@ -176,8 +213,130 @@ class CountingQuery:
 
     @staticmethod
     def _fix_result_tuple__tuple(row):
-        """ Fix the result tuple: drop the last item """
-        return row[:-1]
+        """ Fix the result tuple: drop the last item, but keep the names of the rest """
+        return lightweight_named_tuple('result', row._real_fields[:-1])(row[:-1])
 
     # endregion
 
+
+
+class ConcurrentCountingQuery(CountingQuery):
+    """ `Query` object wrapper that counts the rows with a separate COUNT query, run concurrently with the page query
+
+        CountingQuery adds `count(*) OVER ()` to the query, which forces the database to go through the entire
+        filtered set before it can return the first row: with a LIMIT, the page becomes as slow as a full count.
+        This class leaves the page query alone, and counts with a stripped query instead:
+
+            SELECT count(*) FROM (SELECT 1 FROM ... WHERE ...)
+
+        with no ORDER BY, no LIMIT/OFFSET, no eager loads, and no projection.
+        The COUNT query runs in a thread, on another pooled connection, while the page query runs in the Session.
+
+        With PostgreSQL, the COUNT query runs in the snapshot exported from the Session's transaction
+        (see pg_export_snapshot()), so both see the same data.
+        Note that with READ COMMITTED, every statement takes a new snapshot: the page and the count are only
+        guaranteed to be consistent under REPEATABLE READ or SERIALIZABLE.
+        An autocommit Session has no transaction to export a snapshot from: the two queries are simply concurrent.
+        Also note that the count never sees uncommitted changes made in the Session's own transaction.
+
+        The API is the same as CountingQuery's:
+
+            ```python
+            qc = ConcurrentCountingQuery(ssn.query(...))
+            qc.count  # -> 127
+            list(qc)
+            ```
+
+        Because the count is a separate query, it can also be approximate (the planner's estimate: see estimate_rows()),
+        or capped: `SELECT count(*) FROM (SELECT 1 ... LIMIT N+1)`.
+    """
+    __slots__ = ('_executor', '_approx', '_approx_threshold', '_max_count')
+
+    def __init__(self, query: Query, executor: Executor = None,
+                 approx: bool = False, approx_threshold: int = None, max_count: int = None,
+                 count_cache: CountCache = None, count_cache_key: str = None):
+        """
+        :param query: The query to execute and count
+        :param executor: The executor to run the COUNT query with. Default: a shared thread pool
+        :param approx: Give the planner's estimate instead of an exact count
+        :param approx_threshold: Give the planner's estimate when it's at least this large; count exactly otherwise
+        :param max_count: Only count up to `max_count + 1` rows: `max_count + 1` means "more than `max_count`"
+        :param count_cache: The cache to take the count from, and to put it to
+        :param count_cache_key: The key for the count in `count_cache`: see CountCache.key()
+        """
+        super().__init__(query, count_cache, count_cache_key)
+        self._executor = executor or _get_shared_executor()
+        self._approx = approx
+        self._approx_threshold = approx_threshold
+        self._max_count = max_count
+
+    def _count_rows(self):
+        """ Run the page query and the COUNT query concurrently """
+        ssn = self._query.session
+        bind = ssn.get_bind(mapper=self._query._bind_mapper())  # accessing protected method
+
+        # Export the snapshot of the Session's transaction
+        # An autocommit Session has no transaction: every statement would see its own snapshot anyway
+        snapshot_id = None
+        if bind.dialect.name == 'postgresql' and ssn.transaction is not None:
+            snapshot_id = ssn.execute(text('SELECT pg_export_snapshot()'), mapper=self._query._bind_mapper()).scalar()
+
+        # Start counting
+        count_future = self._executor.submit(self._execute_count_query,
+                                             # A Connection can't be shared between threads: take another one
+                                             bind.engine if isinstance(bind, Connection) else bind,
+                                             self._get_rows_statement(),
+                                             snapshot_id)
+
+        # Execute the page query
+        # The rows need no fixing: there is no count column
+        self._query_iterator = iter(self._query)
+
+        # Get the count
+        self._count = count_future.result()
+
+    def _get_rows_statement(self):
+        """ Get the statement for the rows to count: the original query, stripped of everything that does not affect the count """
+        q = self._original_query
+
+        # Remove eager loads, LIMIT and OFFSET, ordering
+        q = q.enable_eagerloads(False).limit(None).offset(None).order_by(None)
+        statement = q.statement
+
+        # Remove the projection. DISTINCT needs it, though
+        if not q._distinct:  # accessing protected property
+            statement = statement.with_only_columns([literal_column('1')])
+
+        # Done
+        return statement
+
+    def _execute_count_query(self, engine: Engine, statement, snapshot_id: str = None) -> int:
+        """ Count the rows of the statement on a separate connection; in the given snapshot, if any """
+        with engine.connect() as conn:
+            if snapshot_id is not None:
+                conn = conn.execution_options(isolation_level='REPEATABLE READ')
+            with conn.begin():
+                if snapshot_id is not None:
+                    conn.execute(text('SET TRANSACTION SNAPSHOT :snapshot_id'), snapshot_id=snapshot_id)
+
+                # Estimate
+                if self._approx or self._approx_threshold is not None:
+                    count = estimate_rows(conn, statement)
+                    if self._approx or count >= self._approx_threshold:
+                        return count if self._max_count is None else min(count, self._max_count + 1)
+
+                # Count: exactly, or up to `max_count + 1`
+                if self._max_count is not None:
+                    statement = statement.limit(self._max_count + 1)
+                return conn.scalar(select([func.count()]).select_from(statement.alias()))
+
+
+_shared_executor = None
+
+
+def _get_shared_executor() -> Executor:
+    """ Get the thread pool that ConcurrentCountingQuery uses by default """
+    global _shared_executor
+    if _shared_executor is None:
+        _shared_executor = ThreadPoolExecutor(thread_name_prefix='mongosql-count')
+    return _shared_executor
@@ -0,0 +1,129 @@
+import json
+
+from sqlalchemy import log, func, cast
+from sqlalchemy.dialects import postgresql as pg
+from sqlalchemy.orm import properties
+from sqlalchemy.orm.strategies import ColumnLoader
+from sqlalchemy.orm.strategy_options import loader_option, _UnboundLoad
+
+
+@log.class_logger
+@properties.ColumnProperty.strategy_for(partial=True)
+class PartialColumnLoader(ColumnLoader):
+    """ A column loader that only loads parts of a JSON or ARRAY column
+
+    Every part is a (path, slice) tuple:
+
+    * `path`: a JSON sub-path: a tuple of keys. An empty tuple is the whole column.
+    * `slice`: `None`, or (skip, limit) for arrays.
+
+    Every part is selected as a separate SQL expression:
+
+        SELECT articles.data -> 'title', articles.data #> '{author,name}', users.tags[1:5] ...
+
+    The attribute gets the parts reassembled into the original nested shape:
+
+        {'title': ..., 'author': {'name': ...}}
+
+    or just the value of the only part, when its path is empty (a slice of the whole column).
+
+    NOTE: the attribute has a partial value: treat it as read-only.
+
+    Example usage:
+
+        ssn.query(Article).options(partialload('data', [(('title',), None)]))
+    """
+
+    __slots__ = ()
+
+    def setup_query(self, context, query_entity, path, loadopt, adapter, column_collection, memoized_populators, **kwargs):
+        column = self.columns[0]
+        if adapter:
+            column = adapter.columns[column]
+
+        # Select every part
+        expressions = [_part_expression(column, part_path, part_slice)
+                       for part_path, part_slice in loadopt.local_opts['parts']]
+        column_collection.extend(expressions)
+
+        # Remember the expressions: create_row_processor() will need them to find the values in the row
+        path.set(context.attributes, ('partial_expressions', self.key), expressions)
+
+    def create_row_processor(self, context, path, loadopt, mapper, result, adapter, populators):
+        expressions = path.get(context.attributes, ('partial_expressions', self.key))
+        getters = [result._getter(expression, False) for expression in expressions or ()]
+
+        # Not in the row: same as ColumnLoader
+        if not getters or not all(getters):
+            populators["expire"].append((self.key, True))
+            return
+
+        # The whole column: no need to reassemble
+        parts = loadopt.local_opts['parts']
+        if len(parts) == 1 and not parts[0][0]:
+            populators["quick"].append((self.key, getters[0]))
+            return
+
+        # Reassemble the parts
+        paths = [part_path for part_path, part_slice in parts]
+
+        def fetch(row):
+            value = {}
+            for part_path, getter in zip(paths, getters):
+                d = value
+                for key in part_path[:-1]:
+                    d = d.setdefault(key, {})
+                d[part_path[-1]] = getter(row)
+            return value
+
+        populators["quick"].append((self.key, fetch))
+
+
+def _part_expression(column, path, slice):
+    """ Build an SQL expression for a part of a JSON or ARRAY column """
+    # ARRAY: native slicing. Arrays are 1-based, and both bounds are inclusive
+    if isinstance(column.type, pg.ARRAY):
+        skip, limit = slice
+        return column[skip + 1:skip + limit]
+
+    # JSON: slices are done with jsonpath
+    if slice is not None:
+        skip, limit = slice
+        jsonpath = '$' + ''.join('.' + json.dumps(key) for key in path) + '[{} to {}]'.format(skip, skip + limit - 1)
+        return func.jsonb_path_query_array(cast(column, pg.JSONB), jsonpath, type_=pg.JSONB)
+
+    # JSON: -> and #> operators
+    if len(path) == 1:
+        return column[path[0]]
+    else:
+        return column[tuple(path)]
+
+
+# Register the loader option
+
+@loader_option()
+def partialload(loadopt, attr, parts):
+    """Indicate that only parts of the given JSON or ARRAY column should be loaded
+
+    Args
+    ----
+
+    parts: list
+        A list of (path, slice) tuples: JSON sub-paths and array slices. See PartialColumnLoader
+    """
+    loadopt = loadopt.set_column_strategy((attr,), {"partial": True})
+
+    # Pass the options through `local_opts`: see selectinquery()
+    loadopt.local_opts['parts'] = parts
+
+    # Done
+    return loadopt
+
+
+@partialload._add_unbound_fn
+def partialload(attr, parts):
+    return _UnboundLoad.partialload(_UnboundLoad(), attr, parts)
+
+
+# The exported loader option
+partialload = partialload._unbound_fn
@@ -0,0 +1,100 @@
+import json
+
+from sqlalchemy import log, sql, Text
+from sqlalchemy.orm import properties
+from sqlalchemy.orm.strategies import ColumnLoader
+from sqlalchemy.orm.strategy_options import loader_option, _UnboundLoad
+
+
+class RawJSON:
+    """ JSON text that goes to the output as is: never decoded, never re-encoded
+
+        Columns loaded with rawjsonload() get values of this type.
+        A JSON encoder that knows about it (see mongosql.util.stream_json.stream_json()) splices the text
+        into the output verbatim. Any other encoder falls back to `__json__()`, which has to decode it.
+    """
+    __slots__ = ('json',)
+
+    def __init__(self, json_text: str):
+        self.json = json_text
+
+    def __json__(self):
+        # Fallback for encoders that do not splice raw JSON, e.g. flask_jsontools.DynamicJSONEncoder
+        return json.loads(self.json)
+
+    def __eq__(self, other):
+        return isinstance(other, RawJSON) and self.json == other.json
+
+    def __hash__(self):
+        return hash(self.json)
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.json)
+
+
+@log.class_logger
+@properties.ColumnProperty.strategy_for(raw_json=True)
+class RawJsonColumnLoader(ColumnLoader):
+    """ A column loader for JSON columns that loads them as text, wrapped with RawJSON
+
+    The database driver decodes JSON into Python objects; if all we do with those objects is encode them back,
+    that's two extra passes over a potentially large document. This loader selects the column as text:
+
+        SELECT CAST(articles.data AS TEXT) ...
+
+    and gives the attribute a RawJSON value (or None).
+
+    Example usage:
+
+        ssn.query(Article).options(rawjsonload('data'))
+    """
+
+    __slots__ = ()
+
+    def setup_query(self, context, query_entity, path, loadopt, adapter, column_collection, memoized_populators, **kwargs):
+        column = self.columns[0]
+        if adapter:
+            column = adapter.columns[column]
+
+        # Select it as text
+        expression = sql.cast(column, Text)
+        column_collection.append(expression)
+
+        # Remember the expression: create_row_processor() will need it to find the value in the row.
+        # We don't use `memoized_populators`: that would put the text into the attribute as is, without RawJSON
+        path.set(context.attributes, ('raw_json_expression', self.key), expression)
+
+    def create_row_processor(self, context, path, loadopt, mapper, result, adapter, populators):
+        expression = path.get(context.attributes, ('raw_json_expression', self.key))
+        getter = result._getter(expression, False) if expression is not None else None
+
+        # Not in the row: same as ColumnLoader
+        if not getter:
+            populators["expire"].append((self.key, True))
+            return
+
+        # Wrap it
+        def fetch(row):
+            value = getter(row)
+            return None if value is None else RawJSON(value)
+
+        populators["quick"].append((self.key, fetch))
+
+
+# Register the loader option
+
+@loader_option()
+def rawjsonload(loadopt, *attrs):
+    """Indicate that the given JSON columns should be loaded as text, and given RawJSON values,
+    so that they can be passed through to the output without decoding and re-encoding them.
+    """
+    return loadopt.set_column_strategy(attrs, {"raw_json": True})
+
+
+@rawjsonload._add_unbound_fn
+def rawjsonload(*attrs):
+    return _UnboundLoad.rawjsonload(_UnboundLoad(), *attrs)
+
+
+# The exported loader option
+rawjsonload = rawjsonload._unbound_fn
@@ -0,0 +1,215 @@
+from collections import defaultdict
+
+from sqlalchemy import log, sql, Integer
+from sqlalchemy.orm import properties, loading
+from sqlalchemy.orm import util as orm_util
+from sqlalchemy.orm.base import instance_state
+from sqlalchemy.orm.strategies import AbstractRelationshipLoader
+from sqlalchemy.orm.strategy_options import loader_option, _UnboundLoad
+
+
+@log.class_logger
+@properties.RelationshipProperty.strategy_for(lazy="recursive_query")
+class RecursiveQueryLoader(AbstractRelationshipLoader):
+    """ A loader for self-referential relationships that loads the whole tree with one `WITH RECURSIVE` query.
+
+    Where selectinload() loads one level of related entities, this loader walks the relationship recursively,
+    up to `max_depth` levels deep, and populates the relationship on every loaded entity, not only on the
+    primary ones.
+
+    Example usage:
+
+        ssn.query(Category).options(
+            recursivequery(Category.children, lambda q: q, max_depth=5)
+        )
+
+    The query it makes:
+
+        WITH RECURSIVE tree(pk, key, parent_key, depth) AS (
+            -- The first level: related to the primary entities
+            SELECT id, id, parent_id, 1
+            FROM categories
+            WHERE parent_id IN (...primary keys...) AND <criteria>
+          UNION ALL
+            -- Every next level: related to the previous level
+            SELECT categories.id, categories.id, categories.parent_id, tree.depth + 1
+            FROM categories, tree
+            WHERE categories.parent_id = tree.key AND tree.depth < <max_depth> AND <criteria>
+        )
+        SELECT categories.*, tree.parent_key, tree.key, tree.depth
+        FROM categories JOIN tree ON categories.id = tree.pk
+
+    Only supports self-referential relationships with a single column on both sides (no `secondary`).
+    """
+
+    __slots__ = ('_local_column', '_remote_column')
+
+    def __init__(self, parent, strategy_key):
+        super(RecursiveQueryLoader, self).__init__(parent, strategy_key)
+
+        # Only simple relationships are supported
+        assert self.parent_property.secondary is None, 'recursivequery() does not support `secondary` relationships'
+        assert len(self.parent_property.local_remote_pairs) == 1, 'recursivequery() only supports single-column relationships'
+
+        # Local column: on the parent side ; remote column: on the related side.
+        # Related entities are those where `remote_column = parent.local_column`.
+        # Because the relationship is self-referential, every related entity has a `local_column` too,
+        # and its own related entities are found the same way. That's our recursion.
+        ((self._local_column, self._remote_column),) = self.parent_property.local_remote_pairs
+
+    def init_class_attribute(self, mapper):
+        # Same as SelectInLoader: let the default lazy loader instrument the attribute
+        self.parent_property._get_strategy(
+            (("lazy", "select"),)
+        ).init_class_attribute(mapper)
+
+    def create_row_processor(self, context, path, loadopt, mapper, result, adapter, populators):
+        # Copied from SelectInLoader.create_row_processor(), simplified
+        if not orm_util._entity_isa(path[-1], self.parent):
+            return
+
+        recursive_path = (context.query._current_path or orm_util.PathRegistry.root) + path
+        if loading.PostLoad.path_exists(context, recursive_path, self.parent_property):
+            return
+
+        # Register a post-load callable that will load the whole tree once all primary entities are here.
+        # Unlike SelectInQueryLoader, we don't keep the options on `self`: they go straight to the callable
+        loading.PostLoad.callable_for_path(
+            context,
+            recursive_path,
+            self.parent,
+            self.parent_property,
+            self._load_for_path,
+            loadopt.local_opts['alter_query'],
+            loadopt.local_opts['max_depth'],
+            loadopt.local_opts['criteria'],
+        )
+
+    def _load_for_path(self, context, path, states, load_only, alter_query, max_depth, criteria):
+        if load_only and self.key not in load_only:
+            return
+
+        # Keys of the primary entities
+        parent_keys = [(state, overwrite, self._get_state_key(state))
+                       for state, overwrite in states]
+        keys = {key for state, overwrite, key in parent_keys if key is not None}
+
+        # Load the tree
+        if keys:
+            related, expandable = self._load_tree(context.session, keys, alter_query, max_depth, criteria)
+        else:
+            related, expandable = {}, ()
+
+        # Populate the primary entities
+        for state, overwrite, key in parent_keys:
+            self._set_related(state, overwrite, related.get(key, ()))
+
+        # Populate every loaded entity that's not too deep: we've loaded its related entities as well
+        for instance, key in expandable:
+            self._set_related(instance_state(instance), True, related.get(key, ()))
+
+    def _get_state_key(self, state):
+        """ Get the value of the local column from a loaded instance """
+        return self.parent._get_state_attr_by_column(state, state.dict, self._local_column)
+
+    def _set_related(self, state, overwrite, collection):
+        """ Set the loaded value for the relationship """
+        if not overwrite and self.key in state.dict:
+            return
+
+        if self.uselist:
+            value = collection
+        else:
+            value = collection[0] if collection else None
+
+        state.get_impl(self.key).set_committed_value(state, state.dict, value)
+
+    def _load_tree(self, session, keys, alter_query, max_depth, criteria):
+        """ Load the tree with one WITH RECURSIVE query
+
+            :return: (related, expandable):
+                `related`: { key: [related instances] }, where key is the value of the parent's local column;
+                `expandable`: [(instance, key)]: instances whose related entities have been loaded as well
+        """
+        local_column, remote_column = self._local_column, self._remote_column
+        pk_columns = self.mapper.primary_key
+
+        # The first level
+        columns = [
+            *[pk.label('pk_{}'.format(i)) for i, pk in enumerate(pk_columns)],
+            local_column.label('key'),
+            remote_column.label('parent_key'),
+        ]
+        first_level = sql.select([*columns, sql.literal_column('1', Integer).label('depth')]) \
+            .where(remote_column.in_(list(keys)))
+        if criteria is not None:
+            first_level = first_level.where(criteria)
+        tree = first_level.cte('recursive_tree', recursive=True)
+
+        # Every next level
+        next_level = sql.select([*columns, (tree.c.depth + 1).label('depth')]) \
+            .where(remote_column == tree.c.key) \
+            .where(tree.c.depth < max_depth)
+        if criteria is not None:
+            next_level = next_level.where(criteria)
+        tree = tree.union_all(next_level)
+
+        # The final query: entities, with the information about their position in the tree
+        q = session.query(self.mapper) \
+            .join(tree, sql.and_(*[pk == tree.c['pk_{}'.format(i)] for i, pk in enumerate(pk_columns)])) \
+            .add_columns(tree.c.parent_key, tree.c.key, tree.c.depth)
+        q = alter_query(q)
+
+        # Group entities by their parents.
+        # With UNION ALL, an entity may come in more than once: dedupe, but keep the order.
+        related = defaultdict(list)
+        seen = set()
+        expandable = {}
+        for instance, parent_key, key, depth in q:
+            if (parent_key, id(instance)) not in seen:
+                seen.add((parent_key, id(instance)))
+                related[parent_key].append(instance)
+
+            # Entities on the last level don't have their related entities loaded
+            if depth < max_depth:
+                expandable[id(instance)] = (instance, key)
+
+        return related, list(expandable.values())
+
+
+# Register the loader option
+
+@loader_option()
+def recursivequery(loadopt, relationship, alter_query, max_depth, criteria=None):
+    """Indicate that the given self-referential relationship should be loaded recursively,
+    with a single `WITH RECURSIVE` query, up to `max_depth` levels deep.
+
+    Args
+    ----
+
+    alter_query: Callable
+        A callable(query) that alters the final query (projections, sorting, etc)
+    max_depth: int
+        The number of levels to load
+    criteria: BinaryExpression
+        A condition that every related entity has to match, on every level.
+        Entities that do not match it are not loaded, and neither is their subtree.
+    """
+    loadopt = loadopt.set_relationship_strategy(relationship, {"lazy": "recursive_query"})
+
+    # Pass the options through `local_opts`: see selectinquery()
+    loadopt.local_opts['alter_query'] = alter_query
+    loadopt.local_opts['max_depth'] = max_depth
+    loadopt.local_opts['criteria'] = criteria
+
+    # Done
+    return loadopt
+
+
+@recursivequery._add_unbound_fn
+def recursivequery(relationship, alter_query, max_depth, criteria=None):
+    return _UnboundLoad.recursivequery(_UnboundLoad(), relationship, alter_query, max_depth, criteria)
+
+
+# The exported loader option
+recursivequery = recursivequery._unbound_fn
@@ -0,0 +1,88 @@
+from collections.abc import Mapping
+from functools import lru_cache
+
+from typing import Iterable, Iterator, Sequence, Tuple, Type, Dict, List, Any
+
+
+class CompactRow(Mapping):
+    """ A compact read-only result row: a tuple of values, and a key schema shared by all rows
+
+        This is what 'aggregate' and 'group' results are made into: instead of building a dict for every row,
+        every row keeps a reference to the tuple of values it came with.
+        The keys live on the class: see compact_row_class().
+
+        It's a read-only Mapping: `row['n']`, `dict(row)`, and `row == {'n': 1}` all work.
+        JSON encoders that support `__json__()` (e.g. flask_jsontools.DynamicJSONEncoder) serialize it as an object.
+    """
+    __slots__ = ('_values',)
+
+    #: The key schema: names of the values, in order
+    _keys = ()  # type: Tuple[str]
+
+    #: {key: index} for the key schema
+    _index = {}  # type: Dict[str, int]
+
+    def __init__(self, values: Sequence):
+        self._values = values
+
+    def __getitem__(self, key: str):
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __json__(self):
+        return dict(zip(self._keys, self._values))
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.__json__())
+
+
+@lru_cache(maxsize=256)
+def compact_row_class(keys: Tuple[str]) -> Type[CompactRow]:
+    """ Get a CompactRow class for the given key schema
+
+        Classes are cached: the same schema always gives the same class.
+    """
+    return type('CompactRow', (CompactRow,), {
+        '__slots__': (),
+        '_keys': keys,
+        '_index': {key: i for i, key in enumerate(keys)},
+    })
+
+
+def compact_rows(rows: Iterable[Sequence], keys: Sequence[str]) -> Iterator[CompactRow]:
+    """ Make result tuples into CompactRow objects that share the same key schema
+
+        :param rows: Result tuples, e.g. a Query with 'aggregate'
+        :param keys: The names of the values in every tuple
+    """
+    row_class = compact_row_class(tuple(keys))
+    return map(row_class, rows)
+
+
+def columnar(rows: Iterable[Sequence], keys: Sequence[str]) -> Dict[str, List[Any]]:
+    """ Make result tuples into columns: {key: [value, ...]}
+
+        This is the format charting libraries like: one list of values per series.
+
+        Example:
+
+            columnar([('a', 1), ('b', 2)], ('name', 'n'))
+            #-> {'name': ['a', 'b'], 'n': [1, 2]}
+
+        :param rows: Result tuples, e.g. a Query with 'aggregate'
+        :param keys: The names of the values in every tuple
+    """
+    columns = [[] for _ in keys]
+    appends = [column.append for column in columns]
+    for row in rows:
+        for append, value in zip(appends, row):
+            append(value)
+    return dict(zip(keys, columns))
@@ -0,0 +1,105 @@
+from sqlalchemy import log, tuple_
+from sqlalchemy.orm import properties, loading
+from sqlalchemy.orm import util as orm_util
+from sqlalchemy.orm.strategies import DeferredColumnLoader
+from sqlalchemy.orm.strategy_options import loader_option, _UnboundLoad
+
+
+@log.class_logger
+@properties.ColumnProperty.strategy_for(selectin_col=True)
+class SelectInColumnLoader(DeferredColumnLoader):
+    """ A loader for heavy columns: keeps them out of the primary query, and loads them with a separate one
+
+    Where selectinload() loads relationships for all primary entities at once, this loader does the same
+    for columns: once the primary entities are loaded, every column that has this option is loaded
+    with one more query, for all entities at once:
+
+        SELECT articles.id, articles.text, articles.data
+        FROM articles
+        WHERE articles.id IN (...primary keys...)
+
+    This keeps large TEXT, BYTEA and JSON values out of the primary query, with its sorting, joins and window functions,
+    and only fetches them for the rows that made it into the result.
+
+    Example usage:
+
+        ssn.query(Article).options(selectinload_col('text', 'data'))
+    """
+
+    __slots__ = ()
+
+    def setup_query(self, context, query_entity, path, loadopt, adapter, column_collection, memoized_populators, **kwargs):
+        # Not in the primary query
+        pass
+
+    def create_row_processor(self, context, path, loadopt, mapper, result, adapter, populators):
+        # Copied from SelectInLoader.create_row_processor(), simplified
+        if not orm_util._entity_isa(path[-1], self.parent):
+            return
+
+        selectin_path = (context.query._current_path or orm_util.PathRegistry.root) + path
+
+        # All columns of the same entity are loaded with one query:
+        # the first column registers the post-load callable, the rest add their keys to it
+        token = ('selectin_col', self.parent)
+        if loading.PostLoad.path_exists(context, selectin_path, token):
+            token, limit_to_mapper, loader_callable, (keys,), kw = context.post_load_paths[selectin_path.path].loaders[token]
+            keys.append(self.key)
+        else:
+            loading.PostLoad.callable_for_path(
+                context,
+                selectin_path,
+                self.parent,
+                token,
+                self._load_for_path,
+                [self.key],
+            )
+
+    def _load_for_path(self, context, path, states, load_only, keys):
+        if load_only:
+            keys = [key for key in keys if key in load_only]
+        if not keys:
+            return
+
+        # Primary entities that need their columns
+        states = {state.key[1]: (state, overwrite)
+                  for state, overwrite in states
+                  if state.key is not None}
+        if not states:
+            return
+
+        # Load the columns
+        mapper = self.parent
+        pk = mapper.primary_key
+        columns = [mapper.get_property(key).columns[0] for key in keys]
+
+        q = context.session.query(*pk, *columns) \
+            .filter(pk[0].in_([identity[0] for identity in sorted(states)])
+                    if len(pk) == 1 else
+                    tuple_(*pk).in_(sorted(states)))
+
+        # Populate
+        for row in q:
+            state, overwrite = states[tuple(row[:len(pk)])]
+            for key, value in zip(keys, row[len(pk):]):
+                if overwrite or key not in state.dict:
+                    state.get_impl(key).set_committed_value(state, state.dict, value)
+
+
+# Register the loader option
+
+@loader_option()
+def selectinload_col(loadopt, *attrs):
+    """Indicate that the given columns should not be loaded with the primary query,
+    but with a separate query, for all primary entities at once.
+    """
+    return loadopt.set_column_strategy(attrs, {"selectin_col": True})
+
+
+@selectinload_col._add_unbound_fn
+def selectinload_col(*attrs):
+    return _UnboundLoad.selectinload_col(_UnboundLoad(), *attrs)
+
+
+# The exported loader option
+selectinload_col = selectinload_col._unbound_fn
@@ -1,7 +1,13 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from sqlalchemy.orm.strategy_options import loader_option, _UnboundLoad
 from sqlalchemy.orm.strategies import SelectInLoader
-from sqlalchemy.orm import properties
-from sqlalchemy import log, util
+from sqlalchemy.orm import properties, Session
+from sqlalchemy.orm.base import instance_state
+from sqlalchemy.orm.util import PathRegistry
+from sqlalchemy import log, util, text
 
 
 @log.class_logger
@@ -19,15 +25,37 @@ class SelectInQueryLoader(SelectInLoader, util.MemoizedSlots):
             lambda q, **kw: \
                 q.filter(User.articles.rating > 0.5)
         )
+
+    In addition, it supports a custom chunk size (the number of primary keys per `IN` query),
+    and is able to load those chunks concurrently, on separate connections (see `concurrency`).
+
+    It can also count the total number of related entities per every primary entity (see `totals`)
+    when the query has a `group_total_n` column (see MongoLimit.limit_groups_over_columns())
     """
 
     __slots__ = ('_alter_query', '_cache_key', '_bakery')
 
+    # SelectInLoader chunks primary keys with this class attribute. It's the same for every query,
+    # but our chunk size is an option of the query: we make chunks ourselves, and give SelectInLoader whole chunks.
+    # See _load_via_child() and _load_via_parent()
+    _chunksize = sys.maxsize
+
     def create_row_processor(self, context, path, loadopt, mapper, result, adapter, populators):
         # Pluck the custom callable that alters the query out of the `loadopt`
         self._alter_query = loadopt.local_opts['alter_query']
         self._cache_key = loadopt.local_opts['cache_key']
 
+        # The loader object is shared by every query that loads this relationship, possibly in different threads.
+        # Therefore, options that are used after the primary query is loaded can't be kept on `self`:
+        # they go into the QueryContext, per path, just like SqlAlchemy keeps its own loader state.
+        # See _load_for_path()
+        selectin_path = (context.query._current_path or PathRegistry.root) + path
+        selectin_path[self.parent_property].set(context.attributes, 'selectinquery_options', _LoadOptions(
+            chunk_size=loadopt.local_opts.get('chunk_size') or SelectInLoader._chunksize,
+            concurrency=loadopt.local_opts.get('concurrency') or 1,
+            totals=loadopt.local_opts.get('totals') or False,
+        ))
+
         # Call super
         return super(SelectInQueryLoader, self) \
             .create_row_processor(context, path, loadopt, mapper, result, adapter, populators)
@@ -62,6 +90,264 @@ class SelectInQueryLoader(SelectInLoader, util.MemoizedSlots):
             size=300  # we can expect a lot of different queries
         )
 
+    # Concurrent loading.
+    # SelectInLoader loads related entities in chunks: one `IN (...)` query per every `chunk_size` primary keys,
+    # one after another, using the session's connection.
+    # With thousands of parent entities, this becomes dozens of sequential round trips.
+    # When `concurrency` > 1, we execute those chunks in parallel, on separate connections from the pool.
+
+    # What do those connections see?
+    # PostgreSQL can export a snapshot from one transaction and import it into another one:
+    #   SELECT pg_export_snapshot();  -- in the session's transaction
+    #   SET TRANSACTION SNAPSHOT '...';  -- in every REPEATABLE READ transaction on the other connections
+    # This way, all chunks are loaded within the very same snapshot: the one the session's transaction has right now.
+    # Under REPEATABLE READ and SERIALIZABLE, that's the snapshot the primary query has seen.
+    # Under READ COMMITTED (PostgreSQL's default), every statement takes a new snapshot: the exported one may
+    # already include changes committed after the primary query, just like the chunks loaded one after another would.
+    # The snapshot never includes the transaction's own uncommitted changes, and other connections can't see
+    # the session's pending changes at all. Therefore, we quietly fall back to loading the chunks one after another
+    # when the session has pending changes, or its transaction has already written something;
+    # and when that's not possible at all (not PostgreSQL, or the session has no transaction to export a snapshot from).
+
+    # How do we inject the results?
+    # Again, we don't copy SqlAlchemy's code. SelectInLoader._load_via_child() and _load_via_parent() iterate over
+    # chunks and invoke `q(session).params(primary_keys=chunk)` for every one of them.
+    # We load all chunks upfront, merge() the entities into the session, and give those methods a fake `q`
+    # that just returns the results that are already there.
+
+    def _load_for_path(self, context, path, states, load_only, effective_entity):
+        # _load_via_child() and _load_via_parent() only get the `context`: give them the options for this path
+        context.attributes[(self, 'selectinquery_options')] = \
+            path[self.parent_property].get(context.attributes, 'selectinquery_options')
+        return super(SelectInQueryLoader, self)._load_for_path(context, path, states, load_only, effective_entity)
+
+    def _load_via_child(self, our_states, none_states, query_info, q, context):
+        options = context.attributes[(self, 'selectinquery_options')]
+
+        # Same chunking as in SelectInLoader._load_via_child()
+        chunks = _make_chunks(sorted(our_states), options.chunk_size)
+        q = self._prefetch_chunks_concurrently(q, context, options, [
+            [key[0] if query_info.zero_idx else key for key in chunk]
+            for chunk in chunks
+        ])
+
+        # Give SelectInLoader one chunk at a time.
+        # `none_states` are populated once: with the first chunk, or alone, when there are no chunks
+        for i, chunk in enumerate(chunks or [[]]):
+            super(SelectInQueryLoader, self)._load_via_child({key: our_states[key] for key in chunk},
+                                                             none_states if i == 0 else [],
+                                                             query_info, q, context)
+
+    def _load_via_parent(self, our_states, query_info, q, context):
+        options = context.attributes[(self, 'selectinquery_options')]
+
+        # Collect totals: watch the rows as SelectInLoader reads them
+        if options.totals:
+            group_totals = {}
+            q = GroupTotalsCollector(q, group_totals)
+
+        # Same chunking as in SelectInLoader._load_via_parent()
+        chunks = _make_chunks(our_states, options.chunk_size)
+        q = self._prefetch_chunks_concurrently(q, context, options, [
+            [key[0] if query_info.zero_idx else key for key, state, state_dict, overwrite in chunk]
+            for chunk in chunks
+        ])
+
+        # Give SelectInLoader one chunk at a time
+        for chunk in chunks:
+            super(SelectInQueryLoader, self)._load_via_parent(chunk, query_info, q, context)
+
+        # Give every primary entity its total.
+        # It's kept with the entity, next to the related entities it counts: no other query can get in the way.
+        # When a primary entity has no rows, it has no related entities: 0
+        if options.totals:
+            for key, state, state_dict, overwrite in our_states:
+                state.info[(_TOTALS_INFO_KEY, self.key)] = group_totals.get(key, 0)
+
+    def _prefetch_chunks_concurrently(self, q, context, options, chunks):
+        """ Load all chunks concurrently, and return a replacement for `q` that serves the loaded results
+
+            :param q: The baked query that SelectInLoader would have used
+            :param context: QueryContext
+            :param options: _LoadOptions for this path
+            :param chunks: Lists of primary keys, in the order SelectInLoader would load them
+            :return: `q`, if concurrent loading is not possible, or a `PrefetchedChunks` object
+        """
+        # Only worth it when there are at least two chunks.
+        # Never do it from within a worker thread: nested concurrent loads would exhaust the connection pool.
+        if options.concurrency <= 1 or len(chunks) <= 1 or getattr(_concurrent_worker, 'active', False):
+            return q
+
+        # Other connections won't see the changes that are not in the database yet
+        session = context.session
+        if session.new or session.dirty or session.deleted:
+            return q
+
+        # Export the snapshot
+        snapshot = _export_snapshot(session, self.mapper)
+        if snapshot is None:
+            return q
+        engine, snapshot_id = snapshot
+
+        # Make sure `alter_query()` is injected before the query gets into multiple threads
+        q.inject_alter_query()
+
+        # Load chunks concurrently
+        with ThreadPoolExecutor(max_workers=min(options.concurrency, len(chunks))) as pool:
+            results = list(pool.map(
+                lambda chunk: _load_chunk_within_snapshot(q, engine, snapshot_id, chunk),
+                chunks
+            ))
+
+        # Entities that are already in the session are not refreshed by queries: they may have been loaded differently,
+        # or have changes of their own. merge() would overwrite them. Load those chunks one after another instead.
+        if any(identity_key in session.identity_map
+               for rows, identity_keys in results
+               for identity_key in identity_keys):
+            return q
+
+        # Entities were loaded by other sessions: merge them into ours.
+        # load=False: don't query anything; together with them, merge() will cascade to loaded relationships
+        # Rows may have additional columns after the entity (e.g. `group_row_n`): SelectInLoader ignores them
+        return PrefetchedChunks({
+            _hashable_chunk(chunk): [(row[0], session.merge(row[1], load=False))
+                                     for row in rows]
+            for chunk, (rows, identity_keys) in zip(chunks, results)
+        })
+
+
+class _LoadOptions:
+    """ Per-query options for SelectInQueryLoader """
+    __slots__ = ('chunk_size', 'concurrency', 'totals')
+
+    def __init__(self, chunk_size, concurrency, totals):
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.totals = totals
+
+
+#: The key for totals in InstanceState.info: (_TOTALS_INFO_KEY, relationship name)
+_TOTALS_INFO_KEY = 'selectinquery_totals'
+
+
+def get_related_total(instance, relationship_name):
+    """ Get the total number of related entities that selectinquery(totals=True) has counted for an instance
+
+        :param instance: The primary entity
+        :param relationship_name: The name of the relationship
+        :return: The number of related entities; 0 if they were not counted
+    """
+    return instance_state(instance).info.get((_TOTALS_INFO_KEY, relationship_name), 0)
+
+
+def _make_chunks(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+#: Thread-local flag: are we inside a worker thread that loads a chunk?
+#: Attributes of threading.local() are per-thread: other threads don't have `active` until they set it
+_concurrent_worker = threading.local()
+
+
+def _export_snapshot(session, mapper):
+    """ Export the snapshot of the session's transaction so that other connections can import it
+
+        :return: (engine, snapshot id), or None if not possible
+    """
+    # Autocommit sessions outside of begin() have no transaction: the snapshot would die immediately
+    if session.transaction is None:
+        return None
+
+    connection = session.connection(mapper=mapper)
+    if connection.dialect.name != 'postgresql':
+        return None
+
+    # Once the transaction has written something (e.g. flushed the session), it has a transaction id.
+    # Its own changes are not a part of the snapshot: other connections won't see them.
+    snapshot_id = connection.scalar(text('SELECT pg_export_snapshot() WHERE txid_current_if_assigned() IS NULL'))
+    if snapshot_id is None:
+        return None
+
+    return connection.engine, snapshot_id
+
+
+def _load_chunk_within_snapshot(q, engine, snapshot_id, primary_keys):
+    """ Load one chunk on a separate connection, within the given snapshot (runs in a worker thread)
+
+        :return: (rows, identity keys of all loaded entities)
+    """
+    _concurrent_worker.active = True
+    try:
+        with engine.connect() as connection:
+            # Only REPEATABLE READ and SERIALIZABLE transactions can import a snapshot
+            connection = connection.execution_options(isolation_level='REPEATABLE READ')
+            with connection.begin():
+                connection.execute(text('SET TRANSACTION SNAPSHOT :snapshot_id'), snapshot_id=snapshot_id)
+
+                ssn = Session(bind=connection, autoflush=False)
+                try:
+                    rows = list(q(ssn).params(primary_keys=primary_keys))
+                    return rows, list(ssn.identity_map.keys())
+                finally:
+                    # Detach the entities: they will be merged into the original session
+                    ssn.close()
+    finally:
+        _concurrent_worker.active = False
+
+
+def _hashable_chunk(primary_keys):
+    return tuple(primary_keys)
+
+
+class PrefetchedChunks:
+    """ A fake baked query that serves the results that were already loaded
+
+        It mimics the `q(session).params(primary_keys=...)` interface used by SelectInLoader
+    """
+    __slots__ = ('_results', )
+
+    def __init__(self, results):
+        self._results = results
+
+    def __call__(self, session):
+        return self
+
+    def params(self, primary_keys):
+        return self._results[_hashable_chunk(primary_keys)]
+
+
+class GroupTotalsCollector:
+    """ A wrapper for a baked query that collects `group_total_n` from every row it gives out
+
+        It mimics the `q(session).params(primary_keys=...)` interface used by SelectInLoader.
+        Rows are (parent key, entity, ...more columns): totals are collected as { parent key: group_total_n }
+    """
+    __slots__ = ('_q', '_group_totals')
+
+    def __init__(self, q, group_totals):
+        self._q = q
+        self._group_totals = group_totals
+
+    def inject_alter_query(self):
+        self._q.inject_alter_query()
+
+    def __call__(self, session):
+        # Loaded chunks may run in different threads: don't keep the session on `self`
+        return _GroupTotalsCollectingQuery(self._q(session), self._group_totals)
+
+
+class _GroupTotalsCollectingQuery:
+    __slots__ = ('_query', '_group_totals')
+
+    def __init__(self, query, group_totals):
+        self._query = query
+        self._group_totals = group_totals
+
+    def params(self, **kwargs):
+        for row in self._query.params(**kwargs):
+            self._group_totals[row[0]] = row.group_total_n
+            yield row
+
 
 # region Bakery Wrapper that will apply alter_query() in the end
 
@@ -77,7 +363,7 @@ class SmartInjectorBakedQuery(BakedQuery):
 
         To achieve that, we subclass BakedQuery, and do our injection in the overridden __call__(), once.
     """
-    __slots__ = ('_alter_query', '_done_once', '_can_be_cached')
+    __slots__ = ('_alter_query', '_done_once', '_can_be_cached', '_lock')
 
     @classmethod
     def bakery(cls, alter_query_getter, size=200, _size_alert=None):
@@ -95,10 +381,10 @@ class SmartInjectorBakedQuery(BakedQuery):
         self._alter_query = alter_query
         self._can_be_cached = cache_key is not None
         self._done_once = False
+        self._lock = threading.Lock()
 
-    def __call__(self, session):
-        # This method will be called many times in a loop, so we have to inject only once.
-
+    def inject_alter_query(self):
+        """ Inject `alter_query()` into the query. Only once. """
         # Dot it just once
         if not self._done_once:
             # If no external cache key was provided, we can't cache
@@ -106,9 +392,19 @@ class SmartInjectorBakedQuery(BakedQuery):
                 self.spoil()
 
             # Inject our custom query
-            self.add_criteria(self._alter_query)
+            self.add_criteria(self._alter_query_threadsafe)
             self._done_once = True  # never again
 
+    def _alter_query_threadsafe(self, query):
+        # When chunks are loaded concurrently, alter_query() may be invoked from multiple threads at once.
+        # MongoQuery is not thread-safe, so we serialize those calls.
+        with self._lock:
+            return self._alter_query(query)
+
+    def __call__(self, session):
+        # This method will be called many times in a loop, so we have to inject only once.
+        self.inject_alter_query()
+
         # Execute the query
         return super(SmartInjectorBakedQuery, self).__call__(session)
 
@@ -135,7 +431,7 @@ class SmartInjectorBakery(Bakery):
 # Register the loader option
 
 @loader_option()
-def selectinquery(loadopt, relationship, alter_query, cache_key=None):
+def selectinquery(loadopt, relationship, alter_query, cache_key=None, chunk_size=None, concurrency=None, totals=False):
     """Indicate that the given attribute should be loaded using SELECT IN eager loading,
     with a custom `alter_query(q)` callable that returns a modified query.
 
@@ -146,6 +442,22 @@ def selectinquery(loadopt, relationship, alter_query, cache_key=None):
         A callable(query) that alters the query produced by selectinloader
     cache_key: Hashable
         A value to use for caching the query (if possible)
+    chunk_size: int
+        The number of primary keys to load with one `IN (...)` query. Default: 500
+    concurrency: int
+        The number of chunks to load concurrently, on separate connections, within the same snapshot.
+        Only works with PostgreSQL, and only when the session is in a transaction; otherwise, chunks are loaded
+        one after another. Default: 1 (no concurrency)
+        The snapshot is exported when related entities are loaded. Only under REPEATABLE READ or SERIALIZABLE is
+        it the snapshot the primary query has seen; under READ COMMITTED, it may include changes committed since.
+        Chunks are also loaded one after another when the session has pending changes, its transaction has already
+        written something (e.g. flushed), or some of the loaded entities are already in the session:
+        other connections can't see those changes, and merging would overwrite them.
+        NOTE: only the chunks of this relationship are loaded concurrently. Sibling relationships are still
+        loaded one after another, as SqlAlchemy runs their loaders in turn.
+    totals: bool
+        Count the total number of related entities for every primary entity: see get_related_total().
+        The query must have a `group_total_n` column: see MongoLimit.limit_groups_over_columns()
     """
     # The loader option just declares which class to use
     loadopt = loadopt.set_relationship_strategy(relationship, {"lazy": "selectin_query"})
@@ -156,14 +468,17 @@ def selectinquery(loadopt, relationship, alter_query, cache_key=None):
     assert 'alter_query' not in loadopt.local_opts  # I'm not too sure that there won't be a clash. If there is, we'll have to use a unique key per relationship.
     loadopt.local_opts['alter_query'] = alter_query
     loadopt.local_opts['cache_key'] = cache_key
+    loadopt.local_opts['chunk_size'] = chunk_size
+    loadopt.local_opts['concurrency'] = concurrency
+    loadopt.local_opts['totals'] = totals
 
     # Done
     return loadopt
 
 
 @selectinquery._add_unbound_fn
-def selectinquery(relationship, alter_query, cache_key=None):
-    return _UnboundLoad.selectinquery(_UnboundLoad(), relationship, alter_query, cache_key)
+def selectinquery(relationship, alter_query, cache_key=None, chunk_size=None, concurrency=None, totals=False):
+    return _UnboundLoad.selectinquery(_UnboundLoad(), relationship, alter_query, cache_key, chunk_size, concurrency, totals)
 
 
 # The exported loader option
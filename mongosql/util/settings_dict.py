@@ -42,6 +42,8 @@ class MongoQuerySettingsDict(dict):
                  force_include = None,
                  force_exclude = None,
                  ensure_loaded = None,
+                 raw_json_columns = None,
+                 heavy_columns = None,
                  # --- project & join & joinf
                  raiseload_col = False,
                  raiseload_rel = False,
@@ -49,6 +51,7 @@ class MongoQuerySettingsDict(dict):
                  # --- aggregate
                  aggregate_columns = None,
                  aggregate_labels = False,
+                 aggregate_hll = False,
                  # --- filter
                  force_filter = None,
                  scalar_operators = None,
@@ -56,19 +59,34 @@ class MongoQuerySettingsDict(dict):
                  # --- join & joinf
                  allowed_relations = None,
                  banned_relations = None,
+                 selectinquery_chunk_size = None,
+                 selectinquery_concurrency = None,
+                 join_strategy = None,
+                 join_strategy_hints = False,
+                 limited_join_strategy = 'subquery',
                  # --- limit
                  max_items = None,
+                 # --- count
+                 count_max = None,
+                 count_approx_threshold = None,
+                 count_cache = None,
+                 # --- facets
+                 facets_columns = None,
                  # --- Misc
                  legacy_fields: Iterable[str] = None,
                  # --- enabled_handlers?
                  aggregate_enabled: bool = True,
                  count_enabled: bool = True,
+                 exists_enabled: bool = True,
+                 facets_enabled: bool = True,
                  filter_enabled: bool = True,
                  group_enabled: bool = True,
+                 having_enabled: bool = True,
                  join_enabled: bool = True,
                  joinf_enabled: bool = True,
                  limit_enabled: bool = True,
                  project_enabled: bool = True,
+                 sample_enabled: bool = True,
                  sort_enabled: bool = True,
                  # --- Relations
                  related = None,
@@ -139,6 +157,22 @@ class MongoQuerySettingsDict(dict):
                 These columns will be loaded quietly, however, without being included into the projection.
                 Use case: columns which your code requires. It would break without them, in case the user excludes them.
                 You wouldn't want to force include them, but you'd like to include them 'quietly'.
+            raw_json_columns (list[str]): (for: project)
+                A list of JSON columns that are passed through to the output without being decoded.
+                They are selected as text, and their values are wrapped with `RawJSON`:
+                MongoQuery.stream_json() splices them into the output verbatim.
+                Use this for large JSON documents that your code never looks into.
+
+                NOTE: the RawJSON values are the attribute values of the instances, and so they get into the Session:
+                any other code that gets the same instance from the Session sees RawJSON instead of a dict.
+                MongoQuery.stream_json() expunges the instances it has loaded as soon as they are plucked.
+                When you load them with MongoQuery.end() yourself, expunge them once you're done.
+            heavy_columns (list[str] | bool): (for: project)
+                A list of columns that hold a lot of data, or `True` to detect them by type: TEXT, BYTEA, JSON.
+                These columns are excluded by default (see `default_exclude`): only loaded when requested explicitly.
+                When requested, they are not loaded by the primary query, but by a separate one,
+                only for the rows that made it into the result: `SELECT pk, columns ... WHERE pk IN (...)`.
+                This keeps large values out of sorting, joins, and window functions of the primary query.
             raiseload (bool): (for: project, join)
                 Raise an exception when a column or a relationship that was not loaded
                 is accessed by the application.
@@ -159,23 +193,81 @@ class MongoQuerySettingsDict(dict):
                 Whether to enable labelling columns (aliases).
                 This features is mostly useless,
                 but exists here to complete compatilibility with MongoDB queries.
+            aggregate_hll (bool): (for: aggregate)
+                Whether the `hll` PostgreSQL extension is installed: `$approxCountDistinct` will use HyperLogLog.
+                When disabled, `$approxCountDistinct` makes an exact count, just like `$countDistinct`.
             force_filter (dict | Callable): (for: filter)
                 A dictionary with a filter that will be forced onto every request;
                 or a Python `callable(model)` that returns a filtering condition for Query.filter().
-            scalar_operators (dict[str, Callable]): (for: filter)
+            scalar_operators (dict[str, Callable]): (for: filter, having)
                 A dict of additional operators for scalar columns.
                 A better way to declare global operators would be to subclass MongoFilter
                 and declare the additional operators inside the class.
-            array_operators (dict[str, Callable]): (for: filter)
+            array_operators (dict[str, Callable]): (for: filter, having)
                 A dict of additional operators for array columns.
             allowed_relations (list[str] | None): (for: join)
                 An explicit list of relationships that can be loaded by the user.
                 All other relationships will raise a DisabledError when a 'join' is attempted.
             banned_relations: (for: join)
                 An list of relationships that cannot be loaded by the user: DisabledError will be raised.
+            selectinquery_chunk_size (int | dict[str, int] | None): (for: join)
+                The number of primary keys to load with one query for relationships loaded with `selectinquery()`.
+                Either a number, or a dict that configures it per relationship: {relationship-name: int, '*': default}.
+                The default is 500, which is SqlAlchemy's default for `selectinload()`.
+            selectinquery_concurrency (int | dict[str, int] | None): (for: join)
+                The number of `selectinquery()` chunks to load concurrently, on separate pooled connections.
+                Either a number, or a dict that configures it per relationship: {relationship-name: int, '*': default}.
+
+                All connections share the same snapshot, exported from the session's transaction.
+                It's the snapshot the primary query has seen only under REPEATABLE READ or SERIALIZABLE isolation;
+                under READ COMMITTED, it may include changes committed after the primary query.
+                Only works with PostgreSQL, and only when the Session is in a transaction
+                with no pending or flushed changes; otherwise, chunks are loaded one after another, as usual.
+            join_strategy (str | None): (for: join)
+                The loading strategy to use when this model is loaded as a relationship of another model.
+                Put it into `related` or `related_models` settings:
+
+                    related={'events': dict(join_strategy='selectin')}
+
+                Values: 'selectin' (a separate query with `selectinquery()`),
+                'joined' (`joinedload()` or a LEFT OUTER JOIN), or `None` (choose automatically).
+                A strategy has to support the Query Object: 'selectin' does not support `aggregate` and `group`;
+                'joined' does not support `aggregate`, `group`, `skip`, `limit`.
+            join_strategy_hints (bool): (for: join)
+                Allow the API user to choose the loading strategy with a `join_strategy` key in the nested Query Object:
+
+                    join: { events: { join_strategy: 'selectin', limit: 10 } }
+
+                When disabled, such a hint raises a DisabledError.
+            limited_join_strategy (str): (for: join, joinf)
+                How to JOIN related entities to a query that has a LIMIT or an OFFSET:
+                the LIMIT has to stay within the primary entities; otherwise, joined rows would eat it up.
+
+                'subquery': wrap the whole query with `from_self()`, and join to that subquery;
+                'semijoin': select the primary keys of the page in a subquery: `WHERE pk IN (SELECT pk ... LIMIT ...)`,
+                and join to the table itself. PostgreSQL can usually plan it better.
             max_items: (for: limit)
                 The maximum number of items that can be loaded with this query.
                 The user can never go any higher than that, and this value is forced onto every query.
+            count_max (int | None): (for: count)
+                The maximum number of rows to count. Every count is capped: it's exact up to `count_max`,
+                and `count_max + 1` means "more than that". The user can ask for a lower cap, but never a higher one.
+                Also applies to MongoQuery.end_count()
+            count_approx_threshold (int | None): (for: count)
+                Give the planner's estimate instead of an exact count when the estimate is at least this large.
+                Counts below the threshold remain exact. PostgreSQL only.
+                Only applies where the count is collected: MongoQuery.collect_count() (used by the CRUD helpers),
+                MongoQuery.stream_json(), and MongoQuery.end_count().
+                MongoQuery.end().scalar() ignores it, and always counts the rows.
+            count_cache (CountCache | None): (for: count)
+                A cache for counts made by MongoQuery.end_count(): when the user pages through results,
+                the total is only counted once, and next pages only run the page query.
+                Counts are keyed by the Query Object; use `end_count(cache_scope=...)` for anything else
+                your code filters by. See [CountCache](mongosql/util/count_cache.py)
+            facets_columns (list[str]): (for: facets)
+                List of column names for which group-key facets are enabled: counts per every value of the column.
+                All columns for which facets are not explicitly enabled are disabled.
+                Filter facets are not affected: they follow the settings of the `filter` handler.
             legacy_fields (list[str] | None): (for: everything)
                 The list of fields (columns, relationships) that used to exist, but do not anymore.
                 These fields will be quietly ignored by all handlers. Note that they will still appear in projections
@@ -192,12 +284,16 @@ class MongoQuerySettingsDict(dict):
 
             aggregate_enabled (bool): Enable/disable the `aggregate` handler
             count_enabled (bool): Enable/disable the `count` handler
+            exists_enabled (bool): Enable/disable the `exists` handler
+            facets_enabled (bool): Enable/disable the `facets` handler
             filter_enabled (bool): Enable/disable the `filter` handler
             group_enabled (bool): Enable/disable the `group` handler
+            having_enabled (bool): Enable/disable the `having` handler
             join_enabled (bool): Enable/disable the `join` handler
             joinf_enabled (bool): Enable/disable the `joinf` handler
             limit_enabled (bool): Enable/disable the `limit` handler
             project_enabled (bool): Enable/disable the `project` handler
+            sample_enabled (bool): Enable/disable the `sample` handler
             sort_enabled (bool): Enable/disable the `sort` handler
 
             related (dict | Callable | None):
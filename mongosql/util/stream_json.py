@@ -0,0 +1,161 @@
+import json
+from datetime import date, time
+from decimal import Decimal
+from functools import partial
+from uuid import UUID
+from itertools import islice, chain
+
+from typing import Iterable, Iterator, Callable, List, Any, Mapping
+
+from .counting_query_wrapper import CountingQuery
+from .rawjson import RawJSON
+
+
+def stream_json(rows: Iterable,
+                pluck_many: Callable[[List[Any]], List[Mapping]],
+                key: str,
+                encoder: json.JSONEncoder = None,
+                buffer_size: int = 64 * 1024,
+                batch_size: int = 100,
+                raw_json: bool = False) -> Iterator[bytes]:
+    """ Stream query results as a JSON object, without keeping the whole result set in memory
+
+        The output looks like this:
+
+            {"count": 127, "<key>": [{...}, {...}, ...]}
+
+        where `count` is only present when `rows` is a CountingQuery.
+
+        Rows are plucked in batches of `batch_size` (see MongoQuery.pluck_many()),
+        encoded one by one, and sent out in chunks of about `buffer_size` bytes.
+        This makes it suitable for WSGI and ASGI streaming responses:
+
+            ```python
+            return flask.Response(stream_json(query, mq.pluck_many, 'users'), mimetype='application/json')
+            ```
+
+        :param rows: The rows to stream: a Query, a CountingQuery, StreamedBatches, or any iterable
+        :param pluck_many: A callable that converts a list of rows into a list of JSON-serializable dicts
+        :param key: The key for the list of results
+        :param encoder: The JSON encoder to use. Default: a compact StreamJSONEncoder, `ensure_ascii=False`.
+            Make sure it can handle every value your rows may have: a failure in the middle of the stream
+            happens after the response has started.
+        :param buffer_size: The size of chunks to send out, in characters. The last chunk may be smaller.
+        :param batch_size: The number of rows to pluck at once. StreamedBatches are plucked per their own batch.
+        :param raw_json: Whether plucked values may contain RawJSON: JSON text to splice into the output verbatim.
+            When enabled, dicts and lists are assembled by us, and only the values go through the `encoder`.
+    """
+    if encoder is None:
+        encoder = StreamJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    if raw_json:
+        encode = partial(_encode_with_raw_json, encoder.encode)
+    else:
+        encode = encoder.encode
+
+    # The envelope
+    # With a CountingQuery, the count is available as soon as the query is executed: before any rows are sent out.
+    head = '{'
+    if isinstance(rows, CountingQuery):
+        head += encode('count') + ':' + encode(rows.count) + ','
+    head += encode(key) + ':['
+
+    # The buffer
+    buffer = [head]
+    buffer_len = len(head)
+
+    # Rows
+    # A stream from MongoQuery.end_stream() is plucked batch by batch, as it comes:
+    # a batch is forgotten as soon as the next one is requested, so it has to be plucked before that.
+    if isinstance(rows, StreamedBatches):
+        batches = rows.batches()
+    else:
+        batches = _iter_batches(rows, batch_size)
+
+    separator = ''
+    for batch in batches:
+        # Encode
+        for item in pluck_many(batch):
+            item_json = separator + encode(item)
+            separator = ','
+            buffer.append(item_json)
+            buffer_len += len(item_json)
+
+            # Flush
+            if buffer_len >= buffer_size:
+                yield ''.join(buffer).encode('utf-8')
+                buffer = []
+                buffer_len = 0
+
+    # Done
+    buffer.append(']}')
+    yield ''.join(buffer).encode('utf-8')
+
+
+class StreamedBatches:
+    """ An iterator of rows that come in batches: e.g. from MongoQuery.end_stream()
+
+        Iterate it to get the rows one by one, or use batches() to get them as lists.
+        Whatever comes with a batch (related results, instances in the Session) is forgotten
+        when the next batch is requested: consume a batch before asking for the next one.
+    """
+
+    def __init__(self, batches: Iterator[list]):
+        """
+        :param batches: An iterator of lists of rows
+        """
+        self._batches = batches
+        self._rows = chain.from_iterable(batches)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    def batches(self) -> Iterator[list]:
+        """ Get the rest of the rows, batch by batch """
+        return self._batches
+
+
+def _iter_batches(rows: Iterable, batch_size: int) -> Iterator[list]:
+    """ Split rows into lists of `batch_size` """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        yield batch
+
+
+class StreamJSONEncoder(json.JSONEncoder):
+    """ The default encoder for stream_json(): supports the values that database rows typically have
+
+        * Objects with `__json__()`: e.g. CompactRow, RawJSON, or your models
+        * `datetime`, `date`, `time`: ISO 8601 strings
+        * `Decimal`: numbers. E.g. `numeric` columns, or `avg()` and `stddev_samp()` of integers
+        * `UUID`: strings
+    """
+
+    def default(self, o):
+        if hasattr(o, '__json__'):
+            return o.__json__()
+        elif isinstance(o, (date, time)):  # datetime is a date
+            return o.isoformat()
+        elif isinstance(o, Decimal):
+            return float(o)
+        elif isinstance(o, UUID):
+            return str(o)
+        return super(StreamJSONEncoder, self).default(o)
+
+
+def _encode_with_raw_json(encode: Callable[[Any], str], value: Any) -> str:
+    """ Encode a value to JSON, splicing RawJSON values into the output as they are """
+    if isinstance(value, RawJSON):
+        return value.json
+    elif isinstance(value, dict):
+        return '{' + ','.join(encode(str(k)) + ':' + _encode_with_raw_json(encode, v)
+                              for k, v in value.items()) + '}'
+    elif isinstance(value, (list, tuple)):
+        return '[' + ','.join(_encode_with_raw_json(encode, v) for v in value) + ']'
+    else:
+        return encode(value)
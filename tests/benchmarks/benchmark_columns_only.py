@@ -0,0 +1,48 @@
+"""
+This benchmark compares loading and plucking a list of plain columns:
+* as entities: instances, identity map, and all
+* with options(columns_only=True): lightweight named rows
+"""
+
+from tests.benchmarks.benchmark_utils import benchmark_parallel_funcs
+
+from mongosql import Reusable, MongoQuery
+from tests.models import get_big_db_for_benchmarks, Article
+
+# Run me: python -m tests.benchmarks.benchmark_columns_only
+
+# Init DB: 1000 users, 10 articles each
+engine, Session = get_big_db_for_benchmarks(1000, 10, 0)
+
+# Prepare
+N_REPEATS = 100
+ssn = Session()
+
+mq_article = Reusable(MongoQuery(Article))
+query_object = dict(project=['id', 'uid', 'title'])
+
+
+# Tests
+def test_entities(n):
+    """ Test loading entities """
+    for i in range(n):
+        mq = mq_article.with_session(ssn).query(**query_object)
+        mq.pluck_many(mq.end().all())
+        ssn.expunge_all()
+
+def test_columns_only(n):
+    """ Test loading rows """
+    for i in range(n):
+        mq = mq_article.with_session(ssn).query(**query_object).options(columns_only=True)
+        mq.pluck_many(mq.end().all())
+
+
+# Run
+res = benchmark_parallel_funcs(
+    N_REPEATS, 10,
+    test_entities,
+    test_columns_only,
+)
+
+# Done
+print(res)
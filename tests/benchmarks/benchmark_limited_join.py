@@ -0,0 +1,57 @@
+"""
+This benchmark compares the performance of joining to a query with a LIMIT:
+* limited_join_strategy='subquery': the whole query is wrapped with from_self()
+* limited_join_strategy='semijoin': paginated primary keys are selected with `IN (SELECT pk ... LIMIT)`
+"""
+
+from tests.benchmarks.benchmark_utils import benchmark_parallel_funcs
+
+from mongosql import MongoQuery, MongoQuerySettingsDict, Reusable, handlers
+from tests.models import get_big_db_for_benchmarks, User
+
+# Run me: python -m tests.benchmarks.benchmark_limited_join
+
+# Init DB: a large parent table
+engine, Session = get_big_db_for_benchmarks(10000, 3, 0)
+
+# Prepare
+N_REPEATS = 100
+ssn = Session()
+
+# Make sure that a LEFT JOIN is used
+handlers.MongoJoin.ENABLED_EXPERIMENTAL_SELECTINQUERY = False
+
+QUERY_OBJECT = dict(
+    project=['name'],
+    filter={'age': {'$gte': 18}},
+    sort=['id-'],
+    skip=5000,
+    limit=20,
+    join={'articles': dict(project=['title'])},
+)
+
+mq_subquery = Reusable(MongoQuery(User, MongoQuerySettingsDict(limited_join_strategy='subquery')))
+mq_semijoin = Reusable(MongoQuery(User, MongoQuerySettingsDict(limited_join_strategy='semijoin')))
+
+
+# Tests
+def test_subquery(n):
+    """ Test from_self() """
+    for i in range(n):
+        mq_subquery.with_session(ssn).query(**QUERY_OBJECT).end().all()
+
+def test_semijoin(n):
+    """ Test IN (SELECT pk ... LIMIT) """
+    for i in range(n):
+        mq_semijoin.with_session(ssn).query(**QUERY_OBJECT).end().all()
+
+
+# Run
+res = benchmark_parallel_funcs(
+    N_REPEATS, 10,
+    test_subquery,
+    test_semijoin,
+)
+
+# Done
+print(res)
@@ -0,0 +1,52 @@
+"""
+This benchmark compares plucking a result set:
+* pluck_instance(), once for every instance
+* pluck_many(), with a projection compiled once
+"""
+
+from tests.benchmarks.benchmark_utils import benchmark_parallel_funcs
+
+from mongosql import handlers
+from tests.models import get_big_db_for_benchmarks, User
+
+# Run me: python -m tests.benchmarks.benchmark_pluck
+
+# Init DB: 1000 users, 2 nested levels
+engine, Session = get_big_db_for_benchmarks(1000, 3, 3)
+
+# Prepare
+N_REPEATS = 100
+ssn = Session()
+
+handlers.MongoJoin.ENABLED_EXPERIMENTAL_SELECTINQUERY = True
+
+# Load the result set once: we measure plucking, not querying
+mq = User.mongoquery(ssn).query(
+    project=['name', 'age'],
+    join={'articles': dict(project=['title', 'data'],
+                           join={'comments': dict(project=['text'])})},
+)
+users = mq.end().all()
+
+
+# Tests
+def test_pluck_instance(n):
+    """ Test pluck_instance() """
+    for i in range(n):
+        [mq.pluck_instance(user) for user in users]
+
+def test_pluck_many(n):
+    """ Test pluck_many() """
+    for i in range(n):
+        mq.pluck_many(users)
+
+
+# Run
+res = benchmark_parallel_funcs(
+    N_REPEATS, 10,
+    test_pluck_instance,
+    test_pluck_many,
+)
+
+# Done
+print(res)
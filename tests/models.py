@@ -152,6 +152,17 @@ class Edit(Base):
     creator = relationship(User, foreign_keys=cuid)
 
 
+class Category(Base):
+    """ A tree: self-referential relationship """
+    __tablename__ = 'cat'
+
+    id = Column(Integer, primary_key=True)
+    pid = Column(Integer, ForeignKey('cat.id'), nullable=True)
+    title = Column(String)
+
+    parent = relationship(lambda: Category, remote_side=lambda: Category.id, backref=backref('children'))
+
+
 class CustomStrategies(Base):
     __tablename__ = 'd'
 
@@ -506,6 +517,15 @@ def content_samples():
         GirlWatcherFavorites(gw_id=2, user_id=1, best=False),
         GirlWatcherFavorites(gw_id=2, user_id=2, best=True),
         GirlWatcherFavorites(gw_id=2, user_id=3, best=False),
+    ], [
+        # Category tree: A { A.1 { A.1.a { A.1.a.x } }, A.2 }, B { B.1 }
+        Category(id=1, pid=None, title='A'),
+        Category(id=2, pid=1, title='A.1'),
+        Category(id=3, pid=1, title='A.2'),
+        Category(id=4, pid=2, title='A.1.a'),
+        Category(id=5, pid=4, title='A.1.a.x'),
+        Category(id=6, pid=None, title='B'),
+        Category(id=7, pid=6, title='B.1'),
     ]]
 
 
@@ -1179,6 +1179,28 @@ class HandlersTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             mq.pluck_instance(u)  # can pluck Article, not User
 
+        # === Test: pluck_many()
+        mq = User.mongoquery().query(project=['name'],
+                                     join={'articles': dict(project=('title',),
+                                                            joinf={'user': dict(project=('id',))}
+                                                            )})
+        self.assertEqual(mq.pluck_many([u, u]), [mq.pluck_instance(u)] * 2)
+        self.assertEqual(mq.pluck_many([]), [])
+
+        with self.assertRaises(ValueError):
+            mq.pluck_many([a])  # can pluck User, not Article
+
+        # === Test: the compiled projection is recompiled when the projection changes
+        mq = User.mongoquery().query(project=['name'])
+        self.assertEqual(mq.pluck_many([u]), [dict(name='a')])
+        mq.handler_project.merge(['age'])
+        self.assertEqual(mq.pluck_many([u]), [dict(name='a', age=18)])
+        mq.handler_project.merge(['id'], quietly=True)
+        self.assertEqual(mq.pluck_many([u]), [dict(name='a', age=18)])
+
+        mq = User.mongoquery().query(project=[])
+        self.assertEqual(mq.handler_project.pluck_instance(u), {})
+
     # NOTE: we don't test 'join', 'aggregate', 'limit', 'count' here, because they're tested in t3_statements_test.py
 
     def test_legacy_fields(self):
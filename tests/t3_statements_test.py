@@ -5,12 +5,12 @@ from copy import copy
 from collections import OrderedDict
 
 from sqlalchemy import inspect
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, Query
 
 from distutils.version import LooseVersion
 
 from mongosql import SA_12, SA_13
-from mongosql import handlers, MongoQuery, Reusable, MongoQuerySettingsDict
+from mongosql import handlers, MongoQuery, Reusable, MongoQuerySettingsDict, get_related_total
 from mongosql import InvalidQueryError, DisabledError, InvalidColumnError, InvalidRelationError
 
 
@@ -283,6 +283,22 @@ class QueryStatementsTest(unittest.TestCase, TestQueryStringsMixin):
             group=['id-', 'age']
         )
 
+        # Subtotals
+        test_group({'rollup': ['age', 'name']}, 'GROUP BY ROLLUP(u.age, u.name)')
+        test_group({'cube': 'age name'}, 'GROUP BY CUBE(u.age, u.name)')
+        test_group({'sets': [['age', 'name'], ['age'], []]}, 'GROUP BY GROUPING SETS((u.age, u.name), (u.age), ())')
+        self.assertIn('grouping(u.age, u.name) AS grouping', q2sql(group({'rollup': ['age', 'name']})))
+        self.assertIn('grouping(u.age) AS level', q2sql(group({'rollup': ['age'], 'grouping': 'level'})))
+        self.assertRaises(InvalidQueryError, test_group, {'rollup': ['age'], 'cube': ['name']}, '')
+        self.assertRaises(InvalidQueryError, test_group, {'sets': 'age'}, '')
+        self.assertRaises(InvalidColumnError, test_group, {'rollup': ['???']}, '')
+
+        self.assertFinalQueryObject(
+            m.mongoquery().query(group={'rollup': ['age', 'name'], 'grouping': 'level'}),
+            project=dict(user_calculated=0),
+            group={'rollup': ['age', 'name'], 'grouping': 'level'}
+        )
+
     def test_filter(self):
         """ Test filter() """
         m = models.User
@@ -501,6 +517,28 @@ class QueryStatementsTest(unittest.TestCase, TestQueryStringsMixin):
         test_aggregate({ 'avg_age': {'$avg': 'age'} }, 'SELECT avg(u.age) AS avg_age \nFROM')
         test_aggregate({ 'sum_age': {'$sum': 'age'} }, 'SELECT sum(u.age) AS sum_age \nFROM')
 
+        # statistics
+        test_aggregate({'sd_age': {'$stddev': 'age'}}, 'SELECT stddev_samp(u.age) AS sd_age \nFROM')
+        test_aggregate({'n': {'$countDistinct': 'age'}}, 'SELECT count(DISTINCT u.age) AS n \nFROM')
+        test_aggregate({'n': {'$approxCountDistinct': 'age'}}, 'SELECT count(DISTINCT u.age) AS n \nFROM')  # no HLL
+        test_aggregate({'m': {'$median': 'age'}},
+                       'SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY u.age) AS m \nFROM')
+        test_aggregate({'p': {'$percentile': ['age', 0.9]}},
+                       'SELECT percentile_cont(0.9) WITHIN GROUP (ORDER BY u.age) AS p \nFROM')
+        test_aggregate({'p': {'$percentile': ['age', 0.9, 'disc']}},
+                       'SELECT percentile_disc(0.9) WITHIN GROUP (ORDER BY u.age) AS p \nFROM')
+        self.assertRaises(InvalidQueryError, test_aggregate, {'p': {'$percentile': 'age'}}, '')
+        self.assertRaises(InvalidQueryError, test_aggregate, {'p': {'$percentile': ['age', 90]}}, '')
+        self.assertRaises(InvalidQueryError, test_aggregate, {'p': {'$percentile': ['age', 0.9, 'avg']}}, '')
+        self.assertRaises(InvalidQueryError, test_aggregate, {'m': {'$median': {'age': 1}}}, '')
+        self.assertRaises(InvalidQueryError, test_aggregate, {'n': {'$countDistinct': {'age': 1}}}, '')
+        self.assertRaises(DisabledError, test_aggregate, {'m': {'$median': 'id'}}, '')
+
+        # $approxCountDistinct: HyperLogLog
+        mq_hll = MongoQuery(u, MongoQuerySettingsDict(aggregate_columns=('age',), aggregate_hll=True))
+        self.assertQuery(mq_hll.query(aggregate={'n': {'$approxCountDistinct': 'age'}}).end(),
+                         'SELECT CAST(hll_cardinality(hll_add_agg(hll_hash_any(u.age))) AS INTEGER) AS n')
+
         # $sum(1)
         test_aggregate({'count': {'$sum': 1}}, 'SELECT count(*) AS count')
         test_aggregate({'count': {'$sum': 10}}, 'SELECT count(*) * 10 AS count')
@@ -557,6 +595,104 @@ class QueryStatementsTest(unittest.TestCase, TestQueryStringsMixin):
             aggregate={'avg_rating': {'$avg': 'data.rating'}}
         )
 
+    def test_bucket(self):
+        """ Test bucketing expressions: $dateTrunc, $bucket """
+        ca = models.CarArticle
+        mq = Reusable(MongoQuery(ca, MongoQuerySettingsDict(
+            aggregate_columns=('ctime', 'id', 'data'),
+        )))
+
+        day = {'$dateTrunc': ['ctime', 'day']}
+        day_tz = {'$dateTrunc': ['ctime', 'day', 'Europe/Moscow']}
+        ids = {'$bucket': ['id', 0, 100, 10]}
+
+        # === Test: aggregate, group, sort
+        mqa = mq.query(aggregate={'day': day, 'n': {'$sum': 1}}, group=[day], sort=[day, 'id-'])
+        self.assertQuery(mqa.end(),
+                         "SELECT date_trunc(day, ia.ctime) AS day, count(*) AS n",
+                         "GROUP BY date_trunc(day, ia.ctime)",
+                         "ORDER BY date_trunc(day, ia.ctime), ia.id DESC")
+        self.assertEqual(mqa.get_final_query_object()['group'], [day])
+        self.assertEqual(mqa.get_final_query_object()['sort'], [day, 'id-'])
+
+        # === Test: time zone
+        self.assertQuery(mq.query(aggregate={'day': day_tz}, group=[day_tz]).end(),
+                         "SELECT date_trunc(day, ia.ctime, Europe/Moscow) AS day",
+                         "GROUP BY date_trunc(day, ia.ctime, Europe/Moscow)")
+
+        # === Test: width_bucket, JSON, rollup
+        self.assertQuery(mq.query(aggregate={'b': ids, 'r': {'$bucket': ['data.rating', 0, 10, 5]}},
+                                  group={'rollup': [ids]}).end(),
+                         "SELECT width_bucket(ia.id, 0, 100, 10) AS b, "
+                         "width_bucket(CAST(a.data #>> ['rating'] AS FLOAT), 0, 10, 5) AS r",
+                         "GROUP BY ROLLUP(width_bucket(ia.id, 0, 100, 10))")
+
+        # === Test: errors
+        # Columns are validated
+        with self.assertRaises(InvalidColumnError):
+            mq.query(group=[{'$dateTrunc': ['???', 'day']}])
+        with self.assertRaises(InvalidColumnError):
+            mq.query(sort=[{'$dateTrunc': ['???', 'day']}])
+        # Aggregation security
+        with self.assertRaises(DisabledError):
+            mq.query(aggregate={'b': {'$bucket': ['uid', 0, 100, 10]}})
+        # Arguments
+        with self.assertRaises(InvalidQueryError):
+            mq.query(group=[{'$dateTrunc': ['ctime', 'fortnight']}])
+        with self.assertRaises(InvalidQueryError):
+            mq.query(group=[{'$dateTrunc': ['ctime']}])
+        with self.assertRaises(InvalidQueryError):
+            mq.query(group=[{'$bucket': ['id', 0, 0, 10]}])
+        with self.assertRaises(InvalidQueryError):
+            mq.query(group=[{'$bucket': ['id', 0, 100, 0]}])
+        with self.assertRaises(InvalidQueryError):
+            mq.query(group=[{'$unknown': ['id']}])
+        # Column types
+        with self.assertRaises(InvalidQueryError):
+            mq.query(group=[{'$dateTrunc': ['id', 'day']}])
+        with self.assertRaises(InvalidQueryError):
+            mq.query(sort=[{'$dateTrunc': ['title', 'day']}])
+        with self.assertRaises(InvalidQueryError):
+            mq.query(aggregate={'b': {'$bucket': ['ctime', 0, 100, 10]}})
+
+    def test_having(self):
+        """ Test having() """
+        u = models.User
+
+        mq = Reusable(MongoQuery(u, MongoQuerySettingsDict(
+            aggregate_columns=('age',),
+            aggregate_labels=True,
+        )))
+
+        # === Test: having on aggregate labels
+        qs = self.assertQuery(mq.query(aggregate={'age': 'age', 'n': {'$sum': 1}},
+                                       group=['age'],
+                                       having={'n': {'$gt': 1}, 'age': {'$ne': 18}},
+                                       limit=10).end(),
+                              'SELECT u.age AS age, count(*) AS n',
+                              'GROUP BY u.age',
+                              'HAVING (count(*) > 1 AND u.age IS DISTINCT FROM 18)',
+                              'LIMIT 10')
+
+        # === Test: boolean operators, boolean count
+        self.assertQuery(mq.query(aggregate={'adults': {'$sum': {'age': {'$gte': 18}}}},
+                                  having={'$or': [{'adults': 0}, {'adults': {'$gt': 10}}]}).end(),
+                         'HAVING (sum(CAST(u.age >= 18 AS INTEGER)) = 0 OR sum(CAST(u.age >= 18 AS INTEGER)) > 10)')
+
+        # === Test: errors
+        # Columns are not labels
+        with self.assertRaises(InvalidColumnError):
+            mq.query(aggregate={'n': {'$sum': 1}}, having={'age': 18})
+        # No aggregate
+        with self.assertRaises(InvalidQueryError):
+            mq.query(having={'n': 1})
+        # Aggregation security still applies
+        with self.assertRaises(DisabledError):
+            mq.query(aggregate={'n': {'$max': 'id'}}, having={'n': 1})
+        # Disabled
+        with self.assertRaises(DisabledError):
+            MongoQuery(u, MongoQuerySettingsDict(having_enabled=False)).query(having={'n': 1})
+
     def test_invalid__aggregate_with_projection(self):
         """ Invalid combination: aggregate + project """
         u = models.User
@@ -654,6 +790,167 @@ class QueryStatementsTest(unittest.TestCase, TestQueryStringsMixin):
             count=2
         )
 
+    def test_exists(self):
+        """ Test query(exists) """
+        u = models.User
+
+        # === Test: exists + filter + sort + join
+        mq = u.mongoquery().query(filter={'age': {'$gt': 18}},
+                                  sort=['age-'],
+                                  join=('articles',),
+                                  limit=10,
+                                  exists=True)
+        qs = self.assertQuery(mq.end(),
+                              'SELECT EXISTS (SELECT 1',
+                              'FROM u',
+                              'WHERE u.age > 18',
+                              'LIMIT 1) AS anon_1')
+        self.assertNotIn('ORDER BY', qs)
+        self.assertNotIn('JOIN', qs)
+
+        # === Test: end_exists(): whatever the Query Object is
+        mq = u.mongoquery().query(filter={'age': {'$gt': 18}}, sort=['age-'], join=('articles',), skip=10)
+        qs = self.assertQuery(mq.end_exists(),
+                              'SELECT EXISTS (SELECT 1',
+                              'WHERE u.age > 18',
+                              'LIMIT 1) AS anon_1')
+        self.assertNotIn('ORDER BY', qs)
+        self.assertNotIn('OFFSET', qs)
+
+        # end() still gives the complete query
+        self.assertQuery(mq.end(), 'ORDER BY u.age DESC', 'OFFSET 10')
+
+        # === Test: errors
+        with self.assertRaises(InvalidQueryError):
+            u.mongoquery().query(count=True, exists=True)
+        with self.assertRaises(InvalidQueryError):
+            u.mongoquery().query(join={'articles': dict(exists=True)})
+        with self.assertRaises(DisabledError):
+            MongoQuery(u, MongoQuerySettingsDict(exists_enabled=False)).query(exists=True)
+
+    def test_sample(self):
+        """ Test query(sample) """
+        u = models.User
+        settings = MongoQuerySettingsDict(aggregate_columns=('age',), aggregate_labels=True)
+
+        # === Test: sample
+        mq = MongoQuery(u, settings).query(sample={'percent': 5})
+        self.assertQuery(mq.end(),
+                         'SELECT u.id, u.name, u.tags, u.age, u.master_id',
+                         'FROM u AS u TABLESAMPLE system(5)')
+
+        # === Test: method, seed
+        mq = MongoQuery(u, settings).query(sample={'percent': 1, 'method': 'bernoulli', 'seed': 42})
+        self.assertQuery(mq.end(),
+                         'FROM u AS u TABLESAMPLE bernoulli(1) REPEATABLE (42)')
+
+        # === Test: rows
+        mq = MongoQuery(u, settings).query(sample={'rows': 500})
+        self.assertQuery(mq.end(),
+                         'FROM u AS u TABLESAMPLE system_rows(500)')
+
+        # === Test: sample + filter + sort + limit; the initial criteria are kept
+        mq = MongoQuery(u, settings).from_query(Query(u).filter(u.id > 1))
+        mq = mq.query(sample={'percent': 0.5}, filter={'age': {'$gt': 16}}, sort=['age-'], limit=3)
+        qs = self.assertQuery(mq.end(),
+                              'FROM u AS u TABLESAMPLE system(0.5)',
+                              'WHERE u.id > 1 AND u.age > 16 ORDER BY u.age DESC',
+                              'LIMIT 3')
+        self.assertNotIn('FROM u, ', qs)
+
+        # === Test: sample + aggregate
+        mq = MongoQuery(u, settings).query(sample={'percent': 5},
+                                           aggregate={'age': 'age', 'n': {'$sum': 1}},
+                                           group=['age'],
+                                           having={'n': {'$gt': 1}})
+        self.assertQuery(mq.end(),
+                         'SELECT u.age AS age, count(*) AS n',
+                         'FROM u AS u TABLESAMPLE system(5)',
+                         'GROUP BY u.age',
+                         'HAVING count(*) > 1')
+
+        mq = MongoQuery(u, settings).query(sample={'percent': 5}, aggregate={'n': {'$sum': 1}})
+        self.assertQuery(mq.end(),
+                         'SELECT count(*) AS n',
+                         'FROM u AS u TABLESAMPLE system(5)')
+
+        # === Test: errors
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample=5)
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'percent': 0})
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'percent': 101})
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'pct': 1})
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'percent': 1, 'rows': 10})
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'rows': 0})
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'rows': 10, 'method': 'bernoulli'})
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'percent': 1, 'method': 'random'})
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(sample={'percent': 1, 'seed': 'abc'})
+        # Joined inheritance
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(models.CarArticle).query(sample={'percent': 1})
+        # Nested
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u).query(join={'articles': {'sample': {'percent': 1}}})
+        # Disabled
+        with self.assertRaises(DisabledError):
+            MongoQuery(u, MongoQuerySettingsDict(sample_enabled=False)).query(sample={'percent': 1})
+
+    def test_facets(self):
+        """ Test query(facets) """
+        u = models.User
+        settings = MongoQuerySettingsDict(facets_columns=('age', 'name'))
+
+        # === Test: filter facets only: no GROUP BY
+        mq = MongoQuery(u, settings).query(filter={'age': {'$gt': 10}},
+                                           sort=['age-'], limit=10,
+                                           facets={'total': {}, 'adults': {'age': {'$gte': 18}}})
+        qs = self.assertQuery(mq.end(),
+                              'SELECT count(*) AS count_1, '
+                              'count(*) AS count_2, '
+                              'count(*) FILTER (WHERE u.age >= 18) AS anon_1',
+                              'FROM u',
+                              'WHERE u.age > 10')
+        self.assertNotIn('GROUP BY', qs)
+        self.assertNotIn('ORDER BY', qs)
+        self.assertNotIn('LIMIT', qs)
+
+        # === Test: filter facets + group-key facets: GROUPING SETS
+        mq = MongoQuery(u, settings).query(facets={'adults': {'age': {'$gte': 18}},
+                                                   'by_age': 'age',
+                                                   'by_name': 'name'})
+        qs = self.assertQuery(mq.end(),
+                              'SELECT grouping(u.age) AS grouping_1, grouping(u.name) AS grouping_2, u.age, u.name, ',
+                              'count(*) FILTER (WHERE u.age >= 18)',
+                              'FROM u',
+                              'GROUP BY GROUPING SETS((), (u.age), (u.name))')
+
+        # === Test: group-key facets only: no empty grouping set
+        mq = MongoQuery(u, settings).query(facets={'by_age': 'age'})
+        qs = self.assertQuery(mq.end(),
+                              'GROUP BY GROUPING SETS((u.age))')
+
+        # === Test: errors
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u, settings).query(facets={'by_age': 'age'}, count=True)
+        with self.assertRaises(InvalidQueryError):
+            MongoQuery(u, settings).query(facets={'by_age': 1})
+        with self.assertRaises(InvalidColumnError):
+            MongoQuery(u, settings).query(facets={'by_age': 'missing'})
+        with self.assertRaises(DisabledError):
+            MongoQuery(u, settings).query(facets={'by_tags': 'tags'})
+        with self.assertRaises(InvalidQueryError):
+            u.mongoquery().query(join={'articles': dict(facets={'total': {}})})
+        with self.assertRaises(DisabledError):
+            MongoQuery(u, MongoQuerySettingsDict(facets_enabled=False)).query(facets={'total': {}})
+
     # ---------- DREADED JOIN LINE ----------
     # Everything below this line is about joins.
     # A lot of blood was spilled on these forgotten fields.
@@ -2029,6 +2326,316 @@ class QueryStatementsTest(unittest.TestCase, TestQueryStringsMixin):
                 {'id': 2, 'articles': [{'id': 21, 'uid': 2, 'user': {'id': 2}, 'comments': [{'aid': 21, 'id': 108}]}]},
             ])
 
+    def test_selectinquery_chunk_size(self):
+        """ Test join with selectinquery(), tuned with settings """
+        u = models.User
+
+        engine = self.engine
+        ssn = self.Session()
+
+        # Enable it, because setUp() has disabled it.
+        handlers.MongoJoin.ENABLED_EXPERIMENTAL_SELECTINQUERY = True
+
+        # Settings: per relationship
+        mq = Reusable(MongoQuery(u, MongoQuerySettingsDict(
+            selectinquery_chunk_size={'articles': 2},
+            selectinquery_concurrency={'*': 4},
+        )))
+
+        # === Test: 3 users, chunks of 2
+        with QueryLogger(engine) as ql:
+            mq_user = mq.with_session(ssn).query(project=['id'],
+                                                 join={'articles': dict(project=['id'], sort=['id+'])},
+                                                 sort=['id+'])
+            res = mq_user.end().all()
+
+            self.assertEqual(len(ql), 1 + 2)  # users + 2 chunks
+            self.assertQuery(ql[1], 'WHERE a.uid IN (1, 2)')
+            self.assertQuery(ql[2], 'WHERE a.uid IN (3)')
+            self.assertEqual([mq_user.pluck_instance(i) for i in res], [
+                {'id': 1, 'articles': [{'id': 10}, {'id': 11}, {'id': 12}]},
+                {'id': 2, 'articles': [{'id': 20}, {'id': 21}]},
+                {'id': 3, 'articles': [{'id': 30}]},
+            ])
+
+        # === Test: invalid relationship name
+        with self.assertRaises(InvalidRelationError):
+            MongoQuery(u, MongoQuerySettingsDict(selectinquery_chunk_size={'invalid': 2}))
+
+    def test_join_strategy_hints(self):
+        """ Test join with loading strategy hints """
+        u = models.User
+
+        engine = self.engine
+        ssn = self.Session()
+
+        # NOTE: selectinquery() is disabled by setUp(). Hints override it.
+
+        # === Test: settings: 'selectin'
+        mq = Reusable(MongoQuery(u, MongoQuerySettingsDict(
+            related={'articles': dict(join_strategy='selectin')},
+        )))
+
+        with QueryLogger(engine) as ql:
+            mq_user = mq.with_session(ssn).query(project=['id'],
+                                                 join={'articles': dict(project=['id'], sort=['id-'], limit=1)},
+                                                 sort=['id+'])
+            res = mq_user.end().all()
+
+            self.assertEqual(len(ql), 2)  # separate query
+            self.assertNotIn('JOIN', ql[0])
+            self.assertQuery(ql[1], 'WHERE group_row_n <= 1')
+            self.assertEqual([mq_user.pluck_instance(i) for i in res], [
+                {'id': 1, 'articles': [{'id': 12}]},
+                {'id': 2, 'articles': [{'id': 21}]},
+                {'id': 3, 'articles': [{'id': 30}]},
+            ])
+
+        # === Test: settings: 'selectin' does not support aggregation
+        with self.assertRaises(InvalidQueryError):
+            mq.with_session(ssn).query(join={'articles': dict(aggregate={'n': {'$sum': 1}})})
+
+        # === Test: settings: 'joined'
+        handlers.MongoJoin.ENABLED_EXPERIMENTAL_SELECTINQUERY = True
+        mq = Reusable(MongoQuery(u, MongoQuerySettingsDict(
+            related={'articles': dict(join_strategy='joined')},
+        )))
+
+        with QueryLogger(engine) as ql:
+            mq.with_session(ssn).query(project=['id'], join={'articles': dict(project=['id'])}).end().all()
+            self.assertEqual(len(ql), 1)
+            self.assertQuery(ql[0], 'LEFT OUTER JOIN a AS a_1 ON u.id = a_1.uid')
+
+        # === Test: settings: 'joined' requires no limit
+        with self.assertRaises(InvalidQueryError):
+            mq.with_session(ssn).query(join={'articles': dict(limit=1)})
+
+        # === Test: Query Object hint: disabled by default
+        with self.assertRaises(DisabledError):
+            u.mongoquery(ssn).query(join={'articles': dict(join_strategy='joined')})
+
+        # === Test: Query Object hint: enabled
+        mq = Reusable(MongoQuery(u, MongoQuerySettingsDict(join_strategy_hints=True)))
+
+        with QueryLogger(engine) as ql:
+            mq_user = mq.with_session(ssn).query(project=['id'], join={'articles': dict(project=['id'], join_strategy='joined')})
+            mq_user.end().all()
+            self.assertEqual(len(ql), 1)
+            self.assertQuery(ql[0], 'LEFT OUTER JOIN a AS a_1 ON u.id = a_1.uid')
+            # the hint is not an operation: not a part of the final Query Object
+            self.assertNotIn('join_strategy', mq_user.get_final_query_object()['join']['articles'])
+
+        with self.assertRaises(InvalidQueryError):
+            mq.with_session(ssn).query(join={'articles': dict(join_strategy='invalid')})
+
+        # === Test: invalid settings
+        with self.assertRaises(ValueError):
+            MongoQuery(u, MongoQuerySettingsDict(join_strategy='invalid'))
+
+    def test_join_recursive(self):
+        """ Test recursive join: self-referential relationships loaded with WITH RECURSIVE """
+        c = models.Category
+
+        engine = self.engine
+        ssn = self.Session()
+
+        # === Test: load the whole tree, 2 levels deep
+        with QueryLogger(engine) as ql:
+            mq = c.mongoquery(ssn).query(project=['title'],
+                                         filter={'pid': None},
+                                         sort=['id+'],
+                                         join={'children': dict(recursive={'maxDepth': 2},
+                                                                project=['title'],
+                                                                sort=['id+'])})
+            res = mq.end().all()
+
+            self.assertEqual(len(ql), 2)  # primary query + one recursive query
+            self.assertQuery(ql[1],
+                             'WITH RECURSIVE recursive_tree(pk_0, key, parent_key, depth) AS',
+                             'WHERE cat.pid IN (1, 6)',
+                             'UNION ALL',
+                             'WHERE cat.pid = recursive_tree.key AND recursive_tree.depth < 2',
+                             'FROM cat JOIN recursive_tree ON cat.id = recursive_tree.pk_0',
+                             )
+            self.assertEqual([mq.pluck_instance(i) for i in res], [
+                {'title': 'A', 'children': [
+                    {'title': 'A.1', 'children': [
+                        {'title': 'A.1.a'},  # maxDepth reached: no `children`
+                    ]},
+                    {'title': 'A.2', 'children': []},
+                ]},
+                {'title': 'B', 'children': [
+                    {'title': 'B.1', 'children': []},
+                ]},
+            ])
+
+        # === Test: nested filter applies to every level
+        ssn = self.Session()  # new session: entities in the identity map keep their loaded relationships
+
+        with QueryLogger(engine) as ql:
+            mq = c.mongoquery(ssn).query(project=['title'],
+                                         filter={'id': 1},
+                                         join={'children': dict(recursive={'maxDepth': 5},
+                                                                project=['title'],
+                                                                filter={'title': {'$nin': ['A.2', 'A.1.a']}})})
+            res = mq.end().all()
+
+            self.assertEqual(len(ql), 2)
+            self.assertEqual([mq.pluck_instance(i) for i in res], [
+                {'title': 'A', 'children': [
+                    {'title': 'A.1', 'children': []},  # A.1.a is filtered out, with its subtree
+                ]},
+            ])
+
+        # === Test: not a recursive relationship
+        with self.assertRaises(InvalidQueryError):
+            models.User.mongoquery(ssn).query(join={'articles': dict(recursive={'maxDepth': 2})})
+
+        # === Test: unsupported operations
+        with self.assertRaises(InvalidQueryError):
+            c.mongoquery(ssn).query(join={'children': dict(recursive={'maxDepth': 2}, limit=1)})
+
+        # === Test: invalid input
+        with self.assertRaises(InvalidQueryError):
+            c.mongoquery(ssn).query(join={'children': dict(recursive={'maxDepth': 0})})
+        with self.assertRaises(InvalidQueryError):
+            c.mongoquery(ssn).query(join={'children': dict(recursive=True)})
+
+        # === Test: joinf does not support it
+        with self.assertRaises(InvalidQueryError):
+            c.mongoquery(ssn).query(joinf={'children': dict(recursive={'maxDepth': 2})})
+
+    def test_join_aggregate(self):
+        """ Test join with aggregation: statistics per related entity """
+        a = models.Article
+
+        engine = self.engine
+        ssn = self.Session()
+
+        mq = Reusable(MongoQuery(a, MongoQuerySettingsDict(
+            related={'comments': dict(aggregate_columns=['uid'], aggregate_labels=True)},
+        )))
+
+        # === Test: aggregate
+        with QueryLogger(engine) as ql:
+            mq_article = mq.with_session(ssn).query(project=['title'],
+                                                    filter={'id': {'$in': [10, 20, 30]}},
+                                                    sort=['id+'],
+                                                    join={'comments': dict(filter={'uid': {'$ne': 3}},
+                                                                           aggregate={'n': {'$sum': 1},
+                                                                                      'max_uid': {'$max': 'uid'}})})
+            res = mq_article.end().all()
+
+            self.assertEqual(len(ql), 2)  # primary query + one aggregate query
+            self.assertQuery(ql[1],
+                             'FROM a AS a_1 JOIN LATERAL ',
+                             '(SELECT count(*) AS n, max(c.uid) AS max_uid',
+                             'WHERE c.aid = a_1.id AND c.uid IS DISTINCT FROM 3) AS aggregated ON true',
+                             'WHERE a_1.id IN (10, 20, 30)')
+            self.assertEqual([mq_article.pluck_instance(i) for i in res], [
+                {'title': '10', 'comments': {'n': 2, 'max_uid': 2}},
+                {'title': '20', 'comments': {'n': 2, 'max_uid': 1}},
+                {'title': '30', 'comments': {'n': 0, 'max_uid': None}},  # no comments: still aggregated
+            ])
+
+        # === Test: aggregate + group + sort + limit: per entity
+        with QueryLogger(engine) as ql:
+            mq_article = mq.with_session(ssn).query(project=['title'],
+                                                    filter={'id': {'$in': [10, 20, 30]}},
+                                                    sort=['id+'],
+                                                    join={'comments': dict(aggregate={'uid': 'uid', 'n': {'$sum': 1}},
+                                                                           group=['uid'],
+                                                                           sort=['uid-'],
+                                                                           limit=2)})
+            res = mq_article.end().all()
+
+            self.assertEqual(len(ql), 2)
+            self.assertQuery(ql[1],
+                             'WHERE c.aid = a_1.id GROUP BY c.uid ORDER BY c.uid DESC',
+                             'LIMIT 2) AS aggregated ON true')
+            self.assertEqual([mq_article.pluck_instance(i) for i in res], [
+                {'title': '10', 'comments': [{'uid': 3, 'n': 1}, {'uid': 2, 'n': 1}]},
+                {'title': '20', 'comments': [{'uid': 1, 'n': 2}]},
+                {'title': '30', 'comments': []},
+            ])
+
+        # === Test: unsupported
+        with self.assertRaises(InvalidQueryError):
+            mq.with_session(ssn).query(join={'comments': dict(aggregate={'n': {'$sum': 1}}, join=['user'])})
+        with self.assertRaises(InvalidQueryError):
+            models.GirlWatcher.mongoquery(ssn).query(join={'best': dict(aggregate={'n': {'$sum': 1}})})
+        # sort: columns only, not aggregate labels
+        with self.assertRaises(InvalidColumnError):
+            mq.with_session(ssn).query(join={'comments': dict(aggregate={'uid': 'uid', 'n': {'$sum': 1}},
+                                                              group=['uid'],
+                                                              sort=['n-'])})
+
+    def test_join_count(self):
+        """ Test join with a per-parent total count of related entities """
+        a = models.Article
+
+        engine = self.engine
+        ssn = self.Session()
+
+        # NOTE: selectinquery() is disabled by setUp(). `count` needs it anyway.
+
+        # === Test: limit + count
+        with QueryLogger(engine) as ql:
+            mq = a.mongoquery(ssn).query(project=['title'],
+                                         sort=['id+'],
+                                         join={'comments': dict(project=['text'], sort=['id+'], limit=1, count=True)})
+            res = mq.end().all()
+
+            self.assertEqual(len(ql), 2)  # no additional queries
+            self.assertSelectedColumns(ql[1],
+                                       'anon_1.c_aid', 'anon_1.c_id', 'anon_1.c_text',
+                                       'anon_1.group_total_n', 'anon_1.group_row_n')
+            self.assertQuery(ql[1],
+                             'count(*) OVER (PARTITION BY c.aid) AS group_total_n',
+                             'WHERE group_row_n <= 1')
+            self.assertEqual([mq.pluck_instance(i) for i in res], [
+                {'title': '10', 'comments': [{'text': '10-a'}], 'comments_count': 3},
+                {'title': '11', 'comments': [{'text': '11-a'}], 'comments_count': 2},
+                {'title': '12', 'comments': [{'text': '12-a'}], 'comments_count': 1},
+                {'title': '20', 'comments': [{'text': '20-a-ONE'}], 'comments_count': 2},
+                {'title': '21', 'comments': [{'text': '21-a'}], 'comments_count': 1},
+                {'title': '30', 'comments': [], 'comments_count': 0},
+            ])
+
+            # `count` is not the Count Operation of the nested query
+            self.assertIsNone(mq.get_final_query_object()['join']['comments']['count'])
+
+        # === Test: count, no limit
+        with QueryLogger(engine) as ql:
+            mq = a.mongoquery(ssn).query(project=['title'],
+                                         filter={'id': 10},
+                                         join={'comments': dict(filter={'uid': 1}, count=True)})
+            res = mq.end().all()
+
+            self.assertEqual(len(ql), 2)
+            self.assertNotIn('group_row_n', ql[1])
+            self.assertEqual([mq.pluck_instance(i) for i in res], [
+                {'title': '10', 'comments': [{'id': 100, 'aid': 10, 'uid': 1, 'text': '10-a'}], 'comments_count': 1},
+            ])
+
+        # === Test: totals stay with the query that has loaded them
+        mq = a.mongoquery(self.Session()).query(project=['title'],
+                                                filter={'id': 10},
+                                                join={'comments': dict(project=['text'], count=True)})
+        q = mq.end()
+        mq.end()  # another query, never executed
+        res = q.all()
+        self.assertEqual(mq.pluck_instance(res[0])['comments_count'], 3)
+        self.assertEqual(get_related_total(res[0], 'comments'), 3)
+
+        # === Test: unsupported
+        with self.assertRaises(InvalidQueryError):
+            models.Comment.mongoquery(ssn).query(join={'article': dict(count=True)})  # not a list
+        with self.assertRaises(InvalidQueryError):
+            a.mongoquery(ssn).query(joinf={'comments': dict(count=True)})  # joinf
+        with self.assertRaises(InvalidQueryError):
+            a.mongoquery(ssn).query(join={'comments': dict(count='yes')})  # invalid
+
     @unittest.skipIf(SA_12, TEST_QUERY_STRING_ONLY_MATCHES_SA13)
     def test_selectinquery_caching(self):
         """ Test how query caching works with selectinquery """
@@ -2502,6 +3109,43 @@ class QueryStatementsTest(unittest.TestCase, TestQueryStringsMixin):
                             "ON anon_1.u_id = a_1.uid AND a_1.title IS NOT NULL"
                          )
 
+    def test_limit_with_filtered_join__semijoin(self):
+        """ Test limited_join_strategy='semijoin' """
+        u = models.User
+        ssn = self.Session()
+
+        query_object = dict(project=['name'],
+                            sort=['age-', 'id+'],
+                            skip=1, limit=2,
+                            join={'articles': dict(project=['title'], filter={'id': {'$gt': 10}})})
+
+        # === Test: the query
+        mq = MongoQuery(u, MongoQuerySettingsDict(limited_join_strategy='semijoin')).with_session(ssn).query(**query_object)
+        q = mq.end()
+        self.assertQuery(q,
+                         # No subquery: select from the table
+                         "FROM u LEFT OUTER JOIN a AS a_1 ON u.id = a_1.uid AND a_1.id > 10",
+                         # Paginated primary keys
+                         "WHERE u.id IN (SELECT u.id",
+                         "ORDER BY u.age DESC, u.id",
+                         "LIMIT 2 OFFSET 1)",
+                         # Outer ordering
+                         ") ORDER BY u.age DESC, u.id",
+                         )
+        self.assertNotIn('anon_1', q2sql(q))
+
+        # === Test: same results as with from_self()
+        semijoin_results = [mq.pluck_instance(i) for i in q.all()]
+
+        mq = MongoQuery(u).with_session(ssn).query(**query_object)
+        subquery_results = [mq.pluck_instance(i) for i in mq.end().all()]
+
+        self.assertEqual(semijoin_results, subquery_results)
+        self.assertEqual(semijoin_results, [
+            {'name': 'b', 'articles': [{'title': '20'}, {'title': '21'}]},
+            {'name': 'c', 'articles': [{'title': '30'}]},
+        ])
+
     # endregion
 
 
@@ -1,9 +1,15 @@
+import json
 import unittest
+from datetime import datetime, date
+from decimal import Decimal
+from uuid import UUID
 
 import pytest
 from sqlalchemy import inspect
+from sqlalchemy.orm import Session, Query
 
-from mongosql import Reusable, MongoQuery, MongoQuerySettingsDict
+from mongosql import Reusable, MongoQuery, MongoQuerySettingsDict, InvalidQueryError, RawJSON, CountCache
+from mongosql.util import StreamJSONEncoder
 
 from . import t_raiseload_col_test
 from . import models
@@ -164,6 +170,140 @@ class QueryTest(t_raiseload_col_test.RaiseloadTesterMixin, TestQueryStringsMixin
         n = q.scalar()
         self.assertEqual(3, n)
 
+        # Test: count: {max}
+        with QueryLogger(self.engine) as ql:
+            self.assertEqual(models.Article.mongoquery(ssn).query(count={'max': 2}).end().scalar(), 3)  # more than 2
+        self.assertIn('LIMIT 3', ql[0])
+        self.assertEqual(models.Article.mongoquery(ssn).query(count={'max': 10}).end().scalar(), 6)
+        self.assertEqual(models.Article.mongoquery(ssn).query(count={'max': 10}, filter={'uid': 1}).end().scalar(), 3)
+
+        # Test: count: {approx}
+        # end() gives a Query that counts; collect_count() gives the estimate
+        ssn.execute('ANALYZE a')  # up-to-date statistics: exact estimates for a table this small
+        count = lambda mq: mq.collect_count(mq.end())
+        mq = models.Article.mongoquery(ssn).query(count={'approx': True})
+        self.assertIsInstance(mq.end(), Query)
+        self.assertEqual(mq.end().scalar(), 6)
+        with QueryLogger(self.engine) as ql:
+            self.assertEqual(count(models.Article.mongoquery(ssn).query(count={'approx': True})), 6)
+        self.assertIn('EXPLAIN (FORMAT JSON)', ql[0])
+        self.assertNotIn('count(*)', ql[0])
+        n = count(models.Article.mongoquery(ssn).query(count={'approx': True}, filter={'uid': 1}))
+        self.assertIsInstance(n, int)
+        self.assertEqual(count(models.Article.mongoquery(ssn).query(count={'approx': True, 'max': 2})), 3)
+        self.assertEqual(models.Article.mongoquery(ssn).query(count={'approx': True, 'max': 2}).end().scalar(), 3)
+
+        # Test: settings
+        mq = Reusable(MongoQuery(models.Article, MongoQuerySettingsDict(count_max=4)))
+        self.assertEqual(mq.with_session(ssn).query(count=True).end().scalar(), 5)
+        self.assertEqual(mq.with_session(ssn).query(count={'max': 100}).end().scalar(), 5)  # can't go higher
+        self.assertEqual(mq.with_session(ssn).query(count={'max': 1}).end().scalar(), 2)
+        self.assertEqual(count(mq.with_session(ssn).query(count={'max': 1})), 2)
+
+        mq = Reusable(MongoQuery(models.Article, MongoQuerySettingsDict(count_approx_threshold=5)))
+        with QueryLogger(self.engine) as ql:
+            self.assertEqual(count(mq.with_session(ssn).query(count=True)), 6)  # estimated
+        self.assertEqual(len(ql), 1)
+        with QueryLogger(self.engine) as ql:
+            self.assertEqual(count(mq.with_session(ssn).query(count=True, filter={'uid': 1})), 3)  # exact
+        self.assertEqual(len(ql), 2)
+        self.assertIn('count(*)', ql[1])
+        self.assertIsInstance(mq.with_session(ssn).query(count=True).end(), Query)
+        mq_exists = mq.with_session(ssn).query(exists=True)  # not counting: no estimates
+        self.assertEqual(json.loads(b''.join(mq_exists.stream_json('r'))), {'r': True})
+
+        # Test: the session can be replaced
+        mq = models.Article.mongoquery().query(count={'approx': True})
+        self.assertEqual(mq.collect_count(mq.end().with_session(ssn)), 6)
+
+        # Test: end_count()
+        mq = Reusable(MongoQuery(models.Article))
+        q = mq.with_session(ssn).query(sort=('id+',), limit=1).end_count(max_count=2)
+        self.assertEqual((q.count, [a.id for a in q]), (3, [10]))
+        q = mq.with_session(ssn).query(sort=('id+',), limit=1).end_count(approx=True)
+        self.assertEqual((q.count, [a.id for a in q]), (6, [10]))
+
+        # Test: errors
+        for count in ({'approx': 1}, {'max': 0}, {'max': '1'}, {'exact': True}, 'yes'):
+            with self.assertRaises(InvalidQueryError):
+                models.Article.mongoquery(ssn).query(count=count)
+
+    def test_exists(self):
+        """ Test exists """
+        ssn = self.db
+
+        # Test: exists
+        self.assertIs(models.User.mongoquery(ssn).query(exists=True, filter={'age': 18}).end().scalar(), True)
+        self.assertIs(models.User.mongoquery(ssn).query(exists=True, filter={'age': 99}).end().scalar(), False)
+
+        # Test: force_filter
+        mq = MongoQuery(models.User, MongoQuerySettingsDict(force_filter={'age': {'$gte': 18}})).with_session(ssn)
+        self.assertIs(mq.query(exists=True, filter={'age': 16}).end().scalar(), False)
+
+        # Test: end_exists()
+        mq = models.User.mongoquery(ssn).query(filter={'name': 'c'}, sort=('id+',), skip=1, limit=1)
+        self.assertIs(mq.end_exists().scalar(), True)
+
+        # Test: stream_json()
+        mq = models.User.mongoquery(ssn).query(exists=True, filter={'age': 99})
+        self.assertEqual(json.loads(b''.join(mq.stream_json('r'))), {'r': False})
+
+    def test_facets(self):
+        """ Test facets """
+        ssn = self.db
+
+        mq = Reusable(MongoQuery(models.Article, MongoQuerySettingsDict(
+            facets_columns=('uid',),
+            force_filter={'id': {'$ne': 30}},
+        )))
+
+        # Test: filter facets and group-key facets in one query
+        with QueryLogger(self.engine) as ql:
+            mqa = mq.with_session(ssn).query(facets={
+                'total': {},
+                'first_user': {'uid': 1},
+                'by_user': 'uid',
+            }, limit=1)
+            facets = mqa.collect_facets(mqa.end())
+        self.assertEqual(len(ql), 1)
+        self.assertEqual(facets, {
+            'total': 5,
+            'first_user': 3,
+            'by_user': [{'value': 1, 'count': 3}, {'value': 2, 'count': 2}],  # force_filter: no article #30
+        })
+
+        # Test: filter facets only, on top of a filter
+        mqa = mq.with_session(ssn).query(filter={'uid': 2}, facets={'total': {}, 'first_user': {'uid': 1}})
+        self.assertEqual(mqa.collect_facets(mqa.end()), {'total': 2, 'first_user': 0})
+
+        # Test: group-key facets only
+        mqa = mq.with_session(ssn).query(filter={'uid': {'$gt': 1}}, facets={'by_user': 'uid'})
+        self.assertEqual(mqa.collect_facets(mqa.end()), {'by_user': [{'value': 2, 'count': 2}]})
+
+    def test_sample(self):
+        """ Test sample """
+        ssn = self.db
+        mq = Reusable(MongoQuery(models.User, MongoQuerySettingsDict(aggregate_columns=('age',))))
+
+        # Test: the whole table
+        users = mq.with_session(ssn).query(sample={'percent': 100, 'method': 'bernoulli'}, sort=['id']).end().all()
+        self.assertEqual([u.id for u in users], [1, 2, 3])
+
+        # Test: sample + filter
+        users = mq.with_session(ssn).query(sample={'percent': 100, 'seed': 1}, filter={'age': 18}).end().all()
+        self.assertEqual({u.id for u in users}, {1, 2})
+
+        # Test: the same seed gives the same sample
+        q = dict(sample={'percent': 50, 'method': 'bernoulli', 'seed': 42}, sort=['id'])
+        samples = [[u.id for u in mq.with_session(ssn).query(**q).end().all()] for i in range(3)]
+        self.assertEqual(samples[0], samples[1])
+        self.assertEqual(samples[0], samples[2])
+
+        # Test: sample + aggregate
+        row = mq.with_session(ssn).query(sample={'percent': 100, 'method': 'bernoulli'},
+                                         aggregate={'n': {'$sum': 1}, 'max_age': {'$max': 'age'}}).end().one()
+        self.assertEqual(row2dict(row), {'n': 3, 'max_age': 18})
+
     def test_aggregate(self):
         """ Test aggregate() """
         ssn = self.db
@@ -192,6 +332,22 @@ class QueryTest(t_raiseload_col_test.RaiseloadTesterMixin, TestQueryStringsMixin
         row = mq_user().query(filter={'id': 1}, aggregate={'n': {'$sum': 10}}).end().one()
         self.assertEqual(row.n, 10)
 
+        # Test: statistics
+        q = {
+            'n': {'$countDistinct': 'age'},
+            'n_approx': {'$approxCountDistinct': 'age'},
+            'median_age': {'$median': 'age'},
+            'p10_age': {'$percentile': ['age', 0.1, 'disc']},
+        }
+        row = mq_user().query(aggregate=q).end().one()
+        self.assertEqual(row2dict(row), {'n': 2, 'n_approx': 2, 'median_age': 18, 'p10_age': 16})
+        row = mq_user().query(aggregate={'sd_age': {'$stddev': 'age'}}).end().one()
+        self.assertAlmostEqual(float(row.sd_age), 1.1547, places=4)
+
+        # Test: aggregate() & sample
+        row = mq_user().query(aggregate={'n': {'$sum': 1}}, sample={'percent': 100}).end().one()
+        self.assertEqual(row.n, 3)
+
         # Test: aggregate() & group()
         q = {
             'age': 'age',
@@ -200,6 +356,25 @@ class QueryTest(t_raiseload_col_test.RaiseloadTesterMixin, TestQueryStringsMixin
         rows = mq_user().query(aggregate=q, group=['age'], sort=['age-']).end().all()
         self.assertEqual([row2dict(r) for r in rows], [{'age': 18, 'n': 2}, {'age': 16, 'n': 1}])
 
+        # Test: aggregate() & group() & having()
+        rows = mq_user().query(aggregate=q, group=['age'], having={'n': {'$gt': 1}}).end().all()
+        self.assertEqual([row2dict(r) for r in rows], [{'age': 18, 'n': 2}])
+
+        # Test: aggregate() & group() with bucketing expressions
+        ages = {'$bucket': ['age', 15, 20, 5]}
+        rows = mq_user().query(aggregate={'ages': ages, 'n': {'$sum': 1}}, group=[ages], sort=[ages]).end().all()
+        self.assertEqual([row2dict(r) for r in rows], [{'ages': 2, 'n': 1}, {'ages': 4, 'n': 2}])
+
+        # Test: aggregate() & group() with subtotals: one scan, every level
+        mqa = mq_user().query(aggregate=q, group={'rollup': ['age']}, sort=['age+'])
+        self.assertEqual(mqa.get_tuple_keys(), ('age', 'n', 'grouping'))
+        rows = [dict(r) for r in mqa.compact_rows(mqa.end())]
+        self.assertEqual(rows, [
+            {'age': 16, 'n': 1, 'grouping': 0},
+            {'age': 18, 'n': 2, 'grouping': 0},
+            {'age': None, 'n': 3, 'grouping': 1},  # grand total
+        ])
+
     def test_json(self):
         """ Test operations on a JSON column """
         ssn = self.db
@@ -458,3 +633,509 @@ class QueryTest(t_raiseload_col_test.RaiseloadTesterMixin, TestQueryStringsMixin
         # LIMIT and OFFSET were removed from the second query
         self.assertNotIn('OFFSET', ql[1])
         self.assertNotIn('LIMIT', ql[1])
+
+    def test_stream_json(self):
+        """ Test MongoQuery.stream_json() """
+        m = models.Article
+        ssn = self.Session()
+
+        stream = lambda chunks: json.loads(b''.join(chunks).decode('utf-8'))
+
+        # === Test: entities, many chunks
+        mq = m.mongoquery(ssn).query(project=('id', 'title'), sort=('id+',), join={'user': dict(project=('name',))})
+        chunks = list(mq.stream_json('articles', buffer_size=10, batch_size=4))
+        self.assertGreater(len(chunks), 1)  # a small buffer: many chunks
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+
+        mq = m.mongoquery(ssn).query(project=('id', 'title'), sort=('id+',), join={'user': dict(project=('name',))})
+        expected = mq.pluck_many(mq.end().all())
+        self.assertEqual(len(expected), 6)
+        self.assertEqual(stream(chunks), {'articles': expected})
+
+        # === Test: entities, with count
+        mq = m.mongoquery(ssn).query(project=('id',), sort=('id+',), limit=2)
+        self.assertEqual(stream(mq.stream_json('articles', mq.end_count())),
+                         {'count': 6, 'articles': [{'id': 10}, {'id': 11}]})
+
+        # === Test: no results
+        mq = m.mongoquery(ssn).query(project=('id',), filter={'id': -1})
+        self.assertEqual(stream(mq.stream_json('articles', mq.end_count())),
+                         {'count': 0, 'articles': []})
+
+        # === Test: group
+        mq = MongoQuery(m, MongoQuerySettingsDict(aggregate_columns=('uid',), aggregate_labels=True)).with_session(ssn) \
+            .query(aggregate={'uid': 'uid', 'n': {'$sum': 1}}, group=('uid',), sort=('uid+',))
+        self.assertEqual(stream(mq.stream_json('groups', mq.end_count())),
+                         {'count': 3, 'groups': [{'uid': 1, 'n': 3}, {'uid': 2, 'n': 2}, {'uid': 3, 'n': 1}]})
+
+        # === Test: count
+        mq = m.mongoquery(ssn).query(count=1)
+        self.assertEqual(stream(mq.stream_json('articles')), {'articles': 6})
+
+        # === Test: Decimal values, with the default encoder
+        mq = MongoQuery(models.User, MongoQuerySettingsDict(aggregate_columns=('age',), aggregate_labels=True)) \
+            .with_session(ssn).query(aggregate={'avg_age': {'$avg': 'age'}, 'sd_age': {'$stddev': 'age'}})
+        groups = stream(mq.stream_json('groups'))['groups']
+        self.assertAlmostEqual(groups[0]['avg_age'], 17.3333, places=4)
+        self.assertAlmostEqual(groups[0]['sd_age'], 1.1547, places=4)
+
+        # === Test: dates, Decimal, UUID, __json__()
+        encoder = StreamJSONEncoder()
+        self.assertEqual(encoder.encode([datetime(2019, 1, 2, 3, 4, 5), date(2019, 1, 2), Decimal('1.5'),
+                                         UUID('12345678123456781234567812345678'), RawJSON('{"a":1}')]),
+                         '["2019-01-02T03:04:05", "2019-01-02", 1.5, "12345678-1234-5678-1234-567812345678", {"a": 1}]')
+
+    def test_end_stream(self):
+        """ Test MongoQuery.end_stream() """
+        m = models.Article
+        ssn = self.Session()
+
+        query_object = dict(project=('id',), sort=('id+',),
+                            join={'user': dict(project=('name',)),  # LEFT JOIN
+                                  'comments': dict(project=('text',), sort=('id+',))})  # selectinquery()
+        mq = m.mongoquery(ssn).query(**query_object)
+        articles = mq.end().all()
+        expected = mq.pluck_many(articles)
+        total_loaded = len(ssn.identity_map)
+        ssn.expunge_all()
+        del articles
+
+        # === Test: stream, batch by batch
+        mq = m.mongoquery(ssn).query(**query_object)
+        with QueryLogger(self.engine) as ql:
+            results = []
+            max_loaded = 0
+            for article in mq.end_stream(batch_size=2):
+                results.append(mq.pluck_instance(article))
+                max_loaded = max(max_loaded, len(ssn.identity_map))
+        self.assertEqual(results, expected)
+        self.assertLess(max_loaded, total_loaded / 2)  # only one batch is in the Session at a time
+        self.assertEqual(len(ql), 1 + 3)  # one query + selectinquery() for every batch
+        self.assertEqual(len(ssn.identity_map), 0)  # everything's expunged
+
+        # === Test: stream with json
+        mq = m.mongoquery(ssn).query(**query_object)
+        chunks = mq.stream_json('articles', mq.end_stream(batch_size=4))
+        self.assertEqual(json.loads(b''.join(chunks)), {'articles': expected})
+
+        # === Test: instances that were in the Session before are left alone
+        article = ssn.query(m).get(10)
+        list(m.mongoquery(ssn).query(project=('id',)).end_stream(batch_size=2))
+        self.assertIn(article, ssn)
+        self.assertEqual(len(ssn.identity_map), 1)
+
+        # === Test: collections loaded with a JOIN can't be streamed
+        joined_articles = dict(related={'articles': dict(join_strategy='joined')})
+        mq = MongoQuery(models.User, MongoQuerySettingsDict(**joined_articles)).with_session(ssn) \
+            .query(join=('articles',))
+        with self.assertRaises(InvalidQueryError):
+            mq.end_stream()
+
+        mq = MongoQuery(m, MongoQuerySettingsDict(related={'user': joined_articles})).with_session(ssn) \
+            .query(join={'user': dict(join=('articles',))})
+        with self.assertRaises(InvalidQueryError) as e:
+            mq.end_stream()
+        self.assertIn('user.articles', str(e.exception))
+
+        mq = models.User.mongoquery(ssn).query(joinf={'articles': dict(filter={'id': 10})})
+        with self.assertRaises(InvalidQueryError):
+            mq.end_stream()
+
+    def test_end_stream_join(self):
+        """ Test MongoQuery.end_stream() with relationships loaded per batch """
+        ssn = self.Session()
+
+        mq = models.User.mongoquery(ssn).query(
+            project=('name',), sort=('id+',),
+            join={'articles': dict(project=('id',), sort=('id-',), limit=1, count=True)})
+
+        with QueryLogger(self.engine) as ql:
+            results = []
+            for user in mq.end_stream(batch_size=2):
+                results.append(mq.pluck_instance(user))
+
+        self.assertEqual(results, [
+            {'name': 'a', 'articles': [{'id': 12}], 'articles_count': 3},
+            {'name': 'b', 'articles': [{'id': 21}], 'articles_count': 2},
+            {'name': 'c', 'articles': [{'id': 30}], 'articles_count': 1},
+        ])
+
+        # One query for users, one query for every batch of users
+        self.assertEqual(len(ql), 1 + 2)
+        self.assertIn('IN (1, 2)', ql[1])
+        self.assertIn('IN (3)', ql[2])
+
+        # === Test: stream_json(): every batch is plucked before it's forgotten
+        mq = models.User.mongoquery(ssn).query(
+            project=('name',), sort=('id+',),
+            join={'articles': dict(project=('id',), sort=('id-',), limit=1, count=True)})
+        self.assertEqual(json.loads(b''.join(mq.stream_json('users', mq.end_stream(batch_size=2)))), {'users': [
+            {'name': 'a', 'articles': [{'id': 12}], 'articles_count': 3},
+            {'name': 'b', 'articles': [{'id': 21}], 'articles_count': 2},
+            {'name': 'c', 'articles': [{'id': 30}], 'articles_count': 1},
+        ]})
+
+        mq = MongoQuery(models.User, MongoQuerySettingsDict(related={'articles': dict(aggregate_columns=('id',))})) \
+            .with_session(ssn) \
+            .query(project=('name',), sort=('id+',),
+                   join={'articles': dict(aggregate={'n': {'$sum': 1}, 'max_id': {'$max': 'id'}})})
+        self.assertEqual(json.loads(b''.join(mq.stream_json('users', mq.end_stream(batch_size=2)))), {'users': [
+            {'name': 'a', 'articles': {'n': 3, 'max_id': 12}},
+            {'name': 'b', 'articles': {'n': 2, 'max_id': 21}},
+            {'name': 'c', 'articles': {'n': 1, 'max_id': 30}},
+        ]})
+
+    def test_raw_json_columns(self):
+        """ Test `raw_json_columns`: JSON passthrough """
+        m = models.Article
+        ssn = self.Session()
+
+        mq_raw = Reusable(MongoQuery(m, MongoQuerySettingsDict(raw_json_columns=('data',))))
+
+        # === Test: the column is loaded as text
+        mq = mq_raw.with_session(ssn).query(project=('id', 'data'), sort=('id+',), limit=1)
+        with QueryLogger(self.engine) as ql:
+            article = mq.end().one()
+        self.assertIn('CAST(a.data AS TEXT)', ql[0])
+        self.assertEqual(article.data, RawJSON('{"rating": 5, "o": {"a": true}}'))
+        self.assertEqual(mq.pluck_instance(article), {'id': 10, 'data': RawJSON('{"rating": 5, "o": {"a": true}}')})
+        ssn.expunge(article)  # loaded with end(): expunge it yourself
+
+        # === Test: streamed verbatim
+        mq = mq_raw.with_session(ssn).query(project=('id', 'data'), sort=('id+',), limit=2)
+        output = b''.join(mq.stream_json('articles'))
+        self.assertIn(b'"data":{"rating": 5, "o": {"a": true}}', output)  # as is: even the spaces
+        self.assertIn(b'"data":{"rating": 5.5, "o": {"a": true}}', output)
+        self.assertEqual(json.loads(output), {'articles': [
+            {'id': 10, 'data': {'rating': 5, 'o': {'a': True}}},
+            {'id': 11, 'data': {'rating': 5.5, 'o': {'a': True}}},
+        ]})
+
+        # === Test: streamed instances are expunged: RawJSON values do not stay in the Session
+        self.assertEqual(len(ssn.identity_map), 0)
+        self.assertEqual(ssn.query(m).get(10).data, {'rating': 5, 'o': {'a': True}})
+        ssn.expunge_all()
+
+        # === Test: instances that were in the Session before are left alone
+        article = ssn.query(m).get(11)
+        mq = mq_raw.with_session(ssn).query(project=('id', 'data'), sort=('id+',), limit=2)
+        b''.join(mq.stream_json('articles'))
+        self.assertIn(article, ssn)
+        self.assertEqual(len(ssn.identity_map), 1)
+        self.assertEqual(article.data, {'rating': 5.5, 'o': {'a': True}})
+        ssn.expunge_all()
+
+        # === Test: nested
+        mq = MongoQuery(models.User, MongoQuerySettingsDict(related={'articles': dict(raw_json_columns=('data',))})) \
+            .with_session(ssn) \
+            .query(project=('name',), filter={'id': 1},
+                   join={'articles': dict(project=('data',), sort=('id+',), limit=1)})
+        self.assertTrue(mq._has_raw_json_columns())
+        self.assertIn(b'"articles":[{"data":{"rating": 5, "o": {"a": true}}}]', b''.join(mq.stream_json('users')))
+        self.assertEqual(len(ssn.identity_map), 0)  # related instances too
+
+        # === Test: not included: not loaded
+        mq = mq_raw.with_session(ssn).query(project=('id',), sort=('id+',), limit=1)
+        with QueryLogger(self.engine) as ql:
+            mq.end().one()
+        self.assertNotIn('a.data', ql[0])
+        self.assertFalse(mq._has_raw_json_columns())
+
+        # === Test: decoded by other encoders
+        self.assertEqual(RawJSON('{"a": 1}').__json__(), {'a': 1})
+
+    def test_heavy_columns(self):
+        """ Test `heavy_columns`: deferred by default, loaded with a separate query """
+        m = models.Article
+        ssn = self.Session()
+
+        mq_heavy = Reusable(MongoQuery(m, MongoQuerySettingsDict(heavy_columns=True)))  # detected: `data`
+
+        # === Test: excluded by default
+        mq = mq_heavy.with_session(ssn).query(sort=('id+',), limit=2)
+        with QueryLogger(self.engine) as ql:
+            articles = mq.end().all()
+        self.assertEqual(len(ql), 1)
+        self.assertNotIn('a.data', ql[0])
+        self.assertNotIn('data', mq.pluck_instance(articles[0]))
+
+        # === Test: requested: loaded with a separate query, for the page only
+        ssn.expunge_all()
+        mq = mq_heavy.with_session(ssn).query(project=('id', 'data'), sort=('id+',), limit=2)
+        with QueryLogger(self.engine) as ql:
+            articles = mq.end().all()
+            self.assertEqual(mq.pluck_many(articles), [
+                {'id': 10, 'data': {'rating': 5, 'o': {'a': True}}},
+                {'id': 11, 'data': {'rating': 5.5, 'o': {'a': True}}},
+            ])
+        self.assertEqual(len(ql), 2)  # no lazy loads
+        self.assertNotIn('a.data', ql[0])
+        self.assertQuery(ql[1],
+                         'SELECT a.id AS a_id, a.data AS a_data',
+                         'FROM a',
+                         'WHERE a.id IN (10, 11)')
+
+        # === Test: nested
+        ssn.expunge_all()
+        mq = MongoQuery(models.User, MongoQuerySettingsDict(related={'articles': dict(heavy_columns=('data',))})) \
+            .with_session(ssn) \
+            .query(project=('name',), filter={'id': 3},
+                   join={'articles': dict(project=('data',))})
+        with QueryLogger(self.engine) as ql:
+            user = mq.end().one()
+            self.assertEqual(mq.pluck_instance(user), {'name': 'c', 'articles': [{'data': {'o': {'z': False}}}]})
+        self.assertEqual(len(ql), 3)  # users, articles, articles.data
+
+    def test_project_partial(self):
+        """ Test JSON sub-path and $slice projections """
+        ssn = self.Session()
+
+        # === Test: JSON sub-paths
+        mq = models.Article.mongoquery(ssn).query(project={'id': 1, 'data.rating': 1, 'data.o.a': 1}, sort=('id+',))
+        with QueryLogger(self.engine) as ql:
+            results = mq.pluck_many(mq.end().all())
+        self.assertEqual(len(ql), 1)
+        self.assertIn('a.data -> rating', ql[0])
+        self.assertIn('a.data #> {o, a}', ql[0])
+        self.assertNotIn('a.data AS', ql[0])
+        self.assertEqual(results[0], {'id': 10, 'data': {'rating': 5, 'o': {'a': True}}})
+        self.assertEqual(results[-1], {'id': 30, 'data': {'rating': None, 'o': {'a': None}}})
+        self.assertEqual(mq.get_final_query_object()['project'], {'id': 1, 'data.rating': 1, 'data.o.a': 1})
+
+        # === Test: the Query Object is not modified, and can be reused
+        ssn.expunge_all()
+        project = {'id': 1, 'data.rating': 1}
+        for i in range(2):
+            mq = models.Article.mongoquery(ssn).query(project=project, filter={'id': 10})
+            with QueryLogger(self.engine) as ql:
+                self.assertEqual(mq.pluck_instance(mq.end().one()), {'id': 10, 'data': {'rating': 5}})
+            self.assertIn('a.data -> rating', ql[0])
+            self.assertNotIn('a.data AS', ql[0])
+            self.assertEqual(project, {'id': 1, 'data.rating': 1})
+            ssn.expunge_all()
+
+        # === Test: ARRAY $slice
+        ssn.expunge_all()
+        mq = models.User.mongoquery(ssn).query(project={'name': 1, 'tags': {'$slice': 2}}, sort=('id+',))
+        with QueryLogger(self.engine) as ql:
+            results = mq.pluck_many(mq.end().all())
+        self.assertIn('u.tags[', ql[0])
+        self.assertEqual(results, [
+            {'name': 'a', 'tags': ['1', 'a']},
+            {'name': 'b', 'tags': ['2', 'a']},
+            {'name': 'c', 'tags': ['3', 'a']},
+        ])
+
+        ssn.expunge_all()
+        mq = models.User.mongoquery(ssn).query(project={'tags': {'$slice': [1, 2]}}, sort=('id+',))
+        self.assertEqual([u.tags for u in mq.end()], [['a'], ['a', 'b'], ['a', 'b']])
+
+        # === Test: JSON $slice
+        ssn.expunge_all()
+        mq = models.Article.mongoquery(ssn).query(project={'id': 1, 'data.o': {'$slice': 1}}, filter={'id': 10})
+        with QueryLogger(self.engine) as ql:
+            self.assertEqual(mq.pluck_instance(mq.end().one()), {'id': 10, 'data': {'o': [{'a': True}]}})
+        self.assertIn('jsonb_path_query_array', ql[0])
+
+        # === Test: errors
+        mq = Reusable(MongoQuery(models.Article))
+        with self.assertRaises(InvalidQueryError):
+            mq.query(project={'title.x': 1})  # not JSON
+        with self.assertRaises(InvalidQueryError):
+            mq.query(project={'title': {'$slice': 1}})  # not JSON, not ARRAY
+        with self.assertRaises(InvalidQueryError):
+            mq.query(project={'data.rating': 0})  # exclusion
+        with self.assertRaises(InvalidQueryError):
+            mq.query(project={'data': 1, 'data.rating': 1})  # collision
+        with self.assertRaises(InvalidQueryError):
+            mq.query(project={'data.o': 1, 'data.o.a': 1})  # collision
+        with self.assertRaises(InvalidQueryError):
+            mq.query(project={'data': {'$slice': -1}})
+        with self.assertRaises(InvalidQueryError):
+            mq.query(project={'data': {'$slice': 1, '$elemMatch': 1}})
+
+    def test_columns_only(self):
+        """ Test options(columns_only=True): plain columns are selected without entities """
+        ssn = self.Session()
+        mq_user = Reusable(MongoQuery(models.User))
+
+        # === Test: columns and column properties: rows, plucked just like entities
+        query_object = dict(project=('id', 'name', 'age_in_10'), filter={'age': {'$gte': 16}}, sort=('id+',), limit=2)
+        mq = mq_user.with_session(ssn).query(**query_object)
+        expected = mq.pluck_many(mq.end().all())
+        ssn.expunge_all()
+
+        mq = mq_user.with_session(ssn).query(**query_object).options(columns_only=True)
+        self.assertTrue(mq.result_contains_rows())
+        with QueryLogger(self.engine) as ql:
+            rows = mq.end().all()
+        self.assertEqual(len(ql), 1)
+        self.assertIn('u.age + 10 AS anon_1', ql[0])
+        self.assertIn('u.name AS u_name', ql[0])
+        self.assertNotIn('u.tags', ql[0])
+        self.assertFalse(isinstance(rows[0], models.User))
+        self.assertEqual(len(ssn.identity_map), 0)
+        self.assertEqual(rows[0].name, 'a')
+        self.assertEqual(mq.pluck_many(rows), expected)
+        self.assertEqual(mq.pluck_instance(rows[0]), expected[0])
+
+        # === Test: with count
+        mq = mq_user.with_session(ssn).query(**query_object).options(columns_only=True)
+        q = mq.end_count()
+        self.assertEqual(mq.pluck_many(q), expected)
+        self.assertEqual(q.count, 3)
+
+        # === Test: quietly included columns are selected, but not plucked
+        mq = mq_user.with_session(ssn).query(project=('name',), sort=('id+',)).options(columns_only=True)
+        mq.ensure_loaded('age')
+        rows = mq.end().all()
+        self.assertEqual(rows[0].age, 18)
+        self.assertEqual(mq.pluck_instance(rows[0]), {'name': 'a'})
+
+        # === Test: entities are still needed
+        for query_object in (
+                dict(project=('id', 'user_calculated')),  # @property
+                dict(project=('id',), join=('articles',)),  # relationship
+                dict(count=1),  # not entities at all
+        ):
+            mq = mq_user.with_session(ssn).query(**query_object).options(columns_only=True)
+            self.assertFalse(mq.result_contains_rows(), query_object)
+
+    def test_compact_rows(self):
+        """ Test compact_rows() and columnar() for tuple results """
+        ssn = self.Session()
+        mq_agg = Reusable(MongoQuery(models.Article, MongoQuerySettingsDict(aggregate_columns=('uid',), aggregate_labels=True)))
+        query_object = dict(aggregate={'uid': 'uid', 'n': {'$sum': 1}}, group=('uid',), sort=('uid+',))
+
+        # === Test: compact rows
+        mq = mq_agg.with_session(ssn).query(**query_object)
+        self.assertEqual(mq.get_tuple_keys(), ('uid', 'n'))
+        rows = list(mq.compact_rows(mq.end()))
+        self.assertEqual(rows, [{'uid': 1, 'n': 3}, {'uid': 2, 'n': 2}, {'uid': 3, 'n': 1}])
+        self.assertIs(type(rows[0]), type(rows[1]))  # shared key schema
+        self.assertEqual(rows[0]['n'], 3)
+        self.assertEqual(list(rows[0]), ['uid', 'n'])
+        self.assertEqual(rows[0].__json__(), {'uid': 1, 'n': 3})
+        self.assertFalse(hasattr(rows[0], '__dict__'))
+
+        # === Test: JSON: encoders that support __json__(), or dict()
+        self.assertEqual(json.loads(StreamJSONEncoder().encode(rows)),
+                         [{'uid': 1, 'n': 3}, {'uid': 2, 'n': 2}, {'uid': 3, 'n': 1}])
+        self.assertEqual(json.loads(json.dumps(dict(rows[0]))), {'uid': 1, 'n': 3})
+
+        # === Test: with count
+        mq = mq_agg.with_session(ssn).query(**query_object)
+        q = mq.end_count()
+        self.assertEqual(list(mq.compact_rows(q))[0], {'uid': 1, 'n': 3})
+        self.assertEqual(q.count, 3)
+
+        # === Test: columnar
+        mq = mq_agg.with_session(ssn).query(**query_object)
+        self.assertEqual(mq.columnar(mq.end()), {'uid': [1, 2, 3], 'n': [3, 2, 1]})
+
+        mq = mq_agg.with_session(ssn).query(**query_object, filter={'id': -1})
+        self.assertEqual(mq.columnar(mq.end()), {'uid': [], 'n': []})
+
+    def test_end_count_concurrent(self):
+        """ Test end_count(concurrent=True) """
+        ssn = self.Session()
+        mq_article = Reusable(MongoQuery(models.Article))
+
+        # === Test: same results as with the window function
+        query_object = dict(project=('id', 'uid'), filter={'uid': {'$in': [1, 2]}}, sort=('id-',), limit=2)
+        mq = mq_article.with_session(ssn).query(**query_object)
+        q = mq.end_count()
+        expected = (q.count, mq.pluck_many(q))
+
+        ssn.expunge_all()
+        mq = mq_article.with_session(ssn).query(**query_object)
+        with QueryLogger(self.engine) as ql:
+            q = mq.end_count(concurrent=True)
+            self.assertEqual((q.count, mq.pluck_many(q)), expected)
+        self.assertEqual(expected[0], 5)
+
+        # The page query has no window function; the count has no ORDER BY, no LIMIT, no projection
+        self.assertEqual(len(ql), 2)
+        self.assertNotIn('OVER ()', '\n'.join(ql))
+        count_query, = [query for query in ql if query.startswith('SELECT count(*)')]
+        self.assertIn('SELECT 1', count_query)
+        self.assertNotIn('ORDER BY', count_query)
+        self.assertNotIn('LIMIT', count_query)
+
+        # === Test: a Session with a transaction: the count runs in its snapshot
+        ssn_tx = Session(bind=self.engine)
+        try:
+            mq = mq_article.with_session(ssn_tx).query(**query_object)
+            with QueryLogger(self.engine) as ql:
+                q = mq.end_count(concurrent=True)
+                self.assertEqual((q.count, mq.pluck_many(q)), expected)
+            queries = '\n'.join(ql)
+            self.assertIn('pg_export_snapshot', queries)
+            self.assertIn('SET TRANSACTION SNAPSHOT', queries)
+        finally:
+            ssn_tx.close()
+
+        # === Test: with a join
+        query_object = dict(project=('id',), sort=('id-',), join={'user': dict(project=('name',))})
+        mq = mq_article.with_session(ssn).query(**query_object)
+        q = mq.end_count(concurrent=True)
+        self.assertEqual(q.count, 6)
+        self.assertEqual(mq.pluck_many(q)[0], {'id': 30, 'user': {'name': 'c'}})
+
+        # === Test: OFFSET past the end
+        mq = mq_article.with_session(ssn).query(sort=('id-',), skip=100)
+        q = mq.end_count(concurrent=True)
+        self.assertEqual(list(q), [])
+        self.assertEqual(q.count, 6)
+
+        # === Test: group
+        mq = MongoQuery(models.Article, MongoQuerySettingsDict(aggregate_columns=('uid',), aggregate_labels=True)) \
+            .with_session(ssn).query(aggregate={'uid': 'uid', 'n': {'$sum': 1}}, group=('uid',), sort=('uid+',), limit=1)
+        q = mq.end_count(concurrent=True)
+        self.assertEqual(list(mq.compact_rows(q)), [{'uid': 1, 'n': 3}])
+        self.assertEqual(q.count, 3)
+
+    def test_end_count_cache(self):
+        """ Test end_count() with a CountCache """
+        ssn = self.Session()
+        count_cache = CountCache(ttl=60)
+        mq_article = Reusable(MongoQuery(models.Article, MongoQuerySettingsDict(count_cache=count_cache)))
+
+        # === Test: the first page is counted
+        with QueryLogger(self.engine) as ql:
+            q = mq_article.with_session(ssn).query(filter={'uid': 1}, sort=('id+',), limit=2).end_count()
+            self.assertEqual((q.count, [a.id for a in q]), (3, [10, 11]))
+        self.assertIn('count(*) OVER ()', ql[0])
+
+        # === Test: next pages are not
+        with QueryLogger(self.engine) as ql:
+            q = mq_article.with_session(ssn).query(filter={'uid': 1}, sort=('id+',), skip=2, limit=2,
+                                                   project=('id',)).end_count()
+            self.assertEqual((q.count, [a.id for a in q]), (3, [12]))
+        self.assertEqual(len(ql), 1)
+        self.assertNotIn('count(*)', ql[0])
+
+        # === Test: another filter, another scope: counted
+        q = mq_article.with_session(ssn).query(filter={'uid': 2}, limit=1).end_count()
+        self.assertEqual(q.count, 2)
+        with QueryLogger(self.engine) as ql:
+            q = mq_article.with_session(ssn).query(filter={'uid': 1}, limit=1).end_count(cache_scope='tenant-2')
+            self.assertEqual(q.count, 3)
+        self.assertIn('count(*) OVER ()', ql[0])
+
+        # === Test: invalidated on flush
+        ssn_tx = self.Session(autocommit=False)
+        count_cache.listen(ssn_tx)
+        try:
+            ssn_tx.add(models.Article(id=13, uid=1, title='new'))
+            ssn_tx.flush()
+            q = mq_article.with_session(ssn_tx).query(filter={'uid': 1}, limit=1).end_count()
+            self.assertEqual(q.count, 4)
+        finally:
+            ssn_tx.rollback()
+            ssn_tx.close()
+
+        # === Test: expired
+        count_cache.ttl = -1
+        count_cache.set('key', 1, ['a'])
+        self.assertIsNone(count_cache.get('key'))
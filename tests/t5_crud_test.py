@@ -1,5 +1,6 @@
 
 import unittest
+from unittest import mock
 from typing import Callable
 
 from flask import Flask, g
@@ -9,6 +10,7 @@ from sqlalchemy.orm.exc import NoResultFound
 from . import models
 from .crud_view import ArticleView, GirlWatcherView
 from mongosql import StrictCrudHelper, StrictCrudHelperSettingsDict, saves_relations, ABSENT
+from mongosql.util import CompactRow
 
 
 class CrudTestBase(unittest.TestCase):
@@ -215,6 +217,34 @@ class ArticleViewTest(CrudTestBase):
                 }})
             self.assertEqual(rv['articles'], 6)  # `max_rows` shouldn't apply here; therefore, we don't get a '2'
 
+    def test_list_compact_group_rows(self):
+        """ Test list(): rows that _method_list_result__groups() gets """
+        rows_seen = []
+
+        def _method_list_result__groups(view, rows):
+            rows = list(rows)
+            rows_seen.extend(rows)
+            return rows
+
+        def query_groups():
+            rows_seen.clear()
+            with self.app.test_client() as c:
+                rv = c.get('/article/', json={
+                    'query': {
+                        'aggregate': {'n': {'$sum': 1}},
+                        'sort': None,
+                    }})
+                self.assertEqual(rv['articles'], [{'n': 6}])
+            return rows_seen
+
+        with mock.patch.object(ArticleView, '_method_list_result__groups', _method_list_result__groups):
+            # Dicts by default
+            self.assertIs(type(query_groups()[0]), dict)
+
+            # CompactRow when enabled
+            with mock.patch.object(ArticleView, 'compact_group_rows', True):
+                self.assertIsInstance(query_groups()[0], CompactRow)
+
     def test_create(self):
         """ Test create() """
         article_json = {
@@ -1,6 +1,8 @@
 import unittest
 from random import shuffle
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import defaultload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from . import models
 from .util import QueryLogger, TestQueryStringsMixin
@@ -190,6 +192,133 @@ class SelectInQueryLoadTest(unittest.TestCase, TestQueryStringsMixin):
             # Test results
             self.assert_users_articles_comments(res, 3, 5, 1)  # 3 users, 5 articles, 1 comment
 
+    def test_chunk_size_concurrency(self):
+        """ selectinquery() + chunk_size + concurrency """
+        engine, ssn = self.engine, self.ssn
+
+        # Test: chunk_size=1: one query per user
+        with QueryLogger(engine) as ql:
+            q = ssn.query(models.User).options(selectinquery(
+                models.User.articles,
+                lambda q, **kw: q.filter(models.Article.id > 10),
+                chunk_size=1
+            ))
+            res = q.all()
+
+            # Test queries
+            self.assertEqual(len(ql), 1 + 3)  # users + 3 chunks
+            self.assertQuery(ql[1], 'WHERE a.uid IN (1) AND a.id > 10')
+
+            # Test results
+            self.assert_users_articles_comments(res, 3, 5, None)  # 3 users, 5 articles
+
+        # Test: concurrency, no transaction: falls back to sequential loading
+        with QueryLogger(engine) as ql:
+            q = ssn.query(models.User).options(selectinquery(
+                models.User.articles,
+                lambda q, **kw: q.filter(models.Article.id > 10),
+                chunk_size=1, concurrency=3
+            ))
+            res = q.all()
+
+            self.assertEqual(len(ql), 1 + 3)  # users + 3 chunks
+            self.assert_users_articles_comments(res, 3, 5, None)
+
+        # Test: concurrency within a transaction: chunks are loaded on other connections, within the same snapshot
+        ssn = self.Session()
+        ssn.begin()
+        try:
+            with QueryLogger(engine) as ql:
+                q = ssn.query(models.User).options(selectinquery(
+                    models.User.articles,
+                    lambda q, **kw: q.filter(models.Article.id > 10),
+                    chunk_size=1, concurrency=3
+                ).selectinload(models.Article.comments))
+                res = q.all()
+
+                # Snapshot exported
+                self.assertIn('pg_export_snapshot()', '\n'.join(ql))
+
+                # Test results
+                self.assert_users_articles_comments(res, 3, 5, 6)  # 3 users, 5 articles, 6 comments
+                self.assertTrue(all(article in ssn for user in res for article in user.articles))
+                self.assertEqual(sorted(a.id for u in res for a in u.articles), [11, 12, 20, 21, 30])
+        finally:
+            ssn.rollback()
+            ssn.close()
+
+        # Test: concurrency from a thread other than the one that has imported the module (e.g. a WSGI worker)
+        def load_in_thread():
+            ssn = self.Session()
+            ssn.begin()
+            try:
+                q = ssn.query(models.User).options(selectinquery(
+                    models.User.articles,
+                    lambda q, **kw: q.filter(models.Article.id > 10),
+                    chunk_size=1, concurrency=3
+                ))
+                return sorted(a.id for u in q.all() for a in u.articles)
+            finally:
+                ssn.rollback()
+                ssn.close()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            self.assertEqual(pool.submit(load_in_thread).result(), [11, 12, 20, 21, 30])
+
+        def load_users_articles(ssn):
+            return ssn.query(models.User).options(selectinquery(
+                models.User.articles,
+                lambda q, **kw: q.filter(models.Article.id > 10),
+                chunk_size=1, concurrency=3
+            )).all()
+
+        # Test: concurrency with pending changes: falls back to sequential loading, changes are kept
+        ssn = self.Session(autoflush=False)
+        ssn.begin()
+        try:
+            article = ssn.query(models.Article).get(11)
+            article.title = 'MODIFIED'
+
+            with QueryLogger(engine) as ql:
+                res = load_users_articles(ssn)
+                self.assertNotIn('pg_export_snapshot()', '\n'.join(ql))
+
+            self.assertEqual(sorted(a.id for u in res for a in u.articles), [11, 12, 20, 21, 30])
+            self.assertIn(article, res[0].articles)
+            self.assertEqual(article.title, 'MODIFIED')
+            self.assertIn(article, ssn.dirty)
+        finally:
+            ssn.rollback()
+            ssn.close()
+
+        # Test: concurrency with flushed changes: falls back to sequential loading, changes are visible
+        ssn = self.Session()
+        ssn.begin()
+        try:
+            ssn.add(models.Article(id=99, uid=1, title='new'))
+            ssn.flush()
+
+            res = load_users_articles(ssn)
+            self.assertEqual(sorted(a.id for u in res for a in u.articles), [11, 12, 20, 21, 30, 99])
+        finally:
+            ssn.rollback()
+            ssn.close()
+
+        # Test: concurrency with entities that are already in the session: they are not overwritten
+        ssn = self.Session()
+        ssn.begin()
+        try:
+            article = ssn.query(models.Article).get(11)
+            set_committed_value(article, 'title', 'loaded differently')
+
+            res = load_users_articles(ssn)
+            self.assertEqual(sorted(a.id for u in res for a in u.articles), [11, 12, 20, 21, 30])
+            self.assertIn(article, res[0].articles)
+            self.assertEqual(article.title, 'loaded differently')
+        finally:
+            ssn.rollback()
+            ssn.close()
+
     # Re-run all tests in wild combinations
     def test_all_tests_interference(self):
         """ Repeat all tests by randomly mixing them and running them in different order